@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网页解码性能对比 - response.apparent_encoding（整页编码检测）与 CharsetResolver（声明优先）
+
+使用方法:
+    python3 benchmarks/charset_bench.py                 # 使用生成的GBK帖子页面
+    python3 benchmarks/charset_bench.py page1.html ...  # 使用保存下来的网页（原始字节）
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.charset import CharsetResolver  # noqa: E402
+
+URL = 'https://t66y.com/htm_data/2310/16/1234567.html'
+
+
+def generate_page(posts=1500):
+    """生成GBK编码、带meta声明的帖子页面"""
+    parts = ['<html><head><meta http-equiv="Content-Type" content="text/html; charset=gbk">']
+    parts.append('<title>测试帖子 - 草榴社區</title></head><body>')
+    for post in range(posts):
+        parts.append(f'<div class="tpc_content">第{post}楼：今天天气不错，发几张图片给大家看看。'
+                     f'<img src="https://img.example.com/{post}.jpg"><br>签名档：潜水多年，第一次发帖。</div>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('gbk')
+
+
+def make_response(content, content_type='text/html'):
+    response = requests.Response()
+    response._content = content
+    response.status_code = 200
+    response.headers['Content-Type'] = content_type
+    response.url = URL
+    return response
+
+
+def bench(name, func, pages, min_time=2.0):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for content in pages:
+            func(content)
+        count += len(pages)
+    rate = count / (time.perf_counter() - start)
+    print(f"{name:<36}{rate:10.1f} 页/秒")
+    return rate
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+    else:
+        pages = [generate_page()]
+    size = sum(len(content) for content in pages) / len(pages)
+    print(f"页面数: {len(pages)}，平均大小: {size / 1024:.0f} KB")
+
+    def apparent(content):
+        response = make_response(content)
+        response.encoding = response.apparent_encoding
+        return response.text
+
+    resolver = CharsetResolver()
+
+    def resolved(content):
+        response = make_response(content)
+        response.encoding = resolver.resolve(URL, response.headers, content)
+        return response.text
+
+    baseline = bench("apparent_encoding + 解码", apparent, pages)
+    rate = bench("CharsetResolver + 解码", resolved, pages)
+    print(f"加速: {rate / baseline:.1f}x，识别方式统计: {resolver.get_stats()}")
+
+    # 没有声明编码的页面：第一次检测后使用主机记录的编码
+    undeclared = [content.replace(b'charset=gbk', b'') for content in pages]
+    resolver = CharsetResolver()
+    rate = bench("CharsetResolver（无声明）+ 解码", resolved, undeclared)
+    print(f"识别方式统计: {resolver.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
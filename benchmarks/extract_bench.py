@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片链接提取性能对比 - 原有的 html.parser + 五个正则、lxml单次遍历提取器，
+以及只解析帖子正文区域的提取器
+
+使用方法:
+    python3 benchmarks/extract_bench.py                 # 使用生成的帖子页面
+    python3 benchmarks/extract_bench.py page1.html ...  # 使用保存下来的网页
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.extractor import (  # noqa: E402
+    extract_page, extract_page_legacy, etree, DEFAULT_CONTENT_SELECTOR
+)
+from crawler.image_crawler import ImageCrawler  # noqa: E402
+
+BASE_URL = 'https://t66y.com/htm_data/2310/16/1234567.html'
+
+
+def generate_page(posts=60, images_per_post=8, seed=0):
+    """
+    生成一个类似论坛帖子的网页：多个楼层、懒加载图片、内联脚本，
+    以及很长的不含图片的引号字符串（原有正则在这类内容上回溯严重）
+    """
+    rng = random.Random(seed)
+    parts = ['<html><head><meta charset="utf-8"><title>测试帖子 - 草榴社區</title>',
+             '<script>var cfg = {"cdn": "https://cdn.example.com/static/", "logo": "/images/logo.png"};</script>',
+             '</head><body><h1>测试帖子</h1>']
+    for post in range(posts):
+        parts.append(f'<div class="t t2"><table><tr><td class="tr1"><div class="tpc_content do_not_catch" id="cont{post}">')
+        parts.append('回复内容 ' * rng.randint(20, 80))
+        for i in range(images_per_post):
+            name = f'{post:03d}{i:02d}{rng.randint(0, 10 ** 8):08d}'
+            kind = i % 4
+            if kind == 0:
+                parts.append(f'<img ess-data="https://img.example.com/i/2023/10/{name}.jpg" src="/images/loading.gif">')
+            elif kind == 1:
+                parts.append(f'<img src="https://pic.example.org/{name}.png" data-original="https://pic.example.org/{name}.png">')
+            elif kind == 2:
+                parts.append(f'<a href="https://66img.cc/view/{name}" target="_blank">[图片]</a>')
+            else:
+                parts.append(f'<div style="background-image: url(\'//bg.example.net/{name}.webp\')"></div>')
+        parts.append('<br>' * 5)
+        parts.append(f'<span title="{"x" * rng.randint(200, 2000)}">签名</span>')
+        parts.append('</div></td></tr></table></div>')
+    parts.append('<div class="footer"><img src="/images/banner.jpg"><a href="/ad/sponsor.png">广告</a></div>')
+    parts.append('<script>var ads = [' + ','.join(f'"/ad/{n}.gif"' for n in range(200)) + '];</script>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def bench(func, pages, is_valid, min_time=2.0):
+    """
+    重复提取直到超过min_time秒
+
+    Returns:
+        tuple: (每秒页面数, 最后一次的结果列表)
+    """
+    count = 0
+    results = []
+    start = time.perf_counter()
+    while True:
+        results = [func(html, BASE_URL, is_valid) for html in pages]
+        count += len(pages)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed, results
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                pages.append(f.read().decode('utf-8', errors='replace'))
+    else:
+        pages = [generate_page(seed=seed) for seed in range(3)]
+
+    is_valid = ImageCrawler()._is_valid_image_url
+    size = sum(len(html) for html in pages) / len(pages)
+    print(f"页面数: {len(pages)}，平均大小: {size / 1024:.0f} KB，lxml: {'是' if etree is not None else '否'}")
+
+    legacy_rate, legacy_results = bench(extract_page_legacy, pages, is_valid)
+    print(f"原有提取 (html.parser + 正则): {legacy_rate:8.1f} 页/秒")
+    rate, results = bench(extract_page, pages, is_valid)
+    print(f"单次遍历提取 (lxml):          {rate:8.1f} 页/秒  ({rate / legacy_rate:.1f}x)")
+
+    def scoped(html, base_url, is_valid):
+        return extract_page(html, base_url, is_valid, DEFAULT_CONTENT_SELECTOR)
+
+    scoped_rate, scoped_results = bench(scoped, pages, is_valid)
+    print(f"单次遍历 + 正文区域:          {scoped_rate:8.1f} 页/秒  ({scoped_rate / legacy_rate:.1f}x)")
+
+    for old, new, region in zip(legacy_results, results, scoped_results):
+        missing = set(old.image_urls) - set(new.image_urls)
+        extra = set(new.image_urls) - set(old.image_urls)
+        print(f"图片链接: 原有 {len(old.image_urls)}，新 {len(new.image_urls)}，"
+              f"缺少 {len(missing)}，新增 {len(extra)}")
+        for url in sorted(missing)[:5]:
+            print(f"  缺少: {url}")
+        for url in sorted(extra)[:5]:
+            print(f"  新增: {url}")
+        print(f"正文区域: {len(region.image_urls)} 个，排除页面框架图片 {len(set(new.image_urls) - set(region.image_urls))} 个")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+版块爬虫 - 遍历论坛版块列表页，提取帖子链接写入Redis待爬队列（frontier）
+队列处理器在手动提交的任务处理完后，按优先级（最新、回复最多）从待爬队列中取帖子爬取
+配合青龙面板定时任务使用，可以持续镜像整个版块
+"""
+
+import os
+import sys
+import json
+import redis
+import logging
+
+from crawler.board import extract_threads
+from crawler.charset import get_shared_resolver
+from crawler.download_pool import DownloadPool
+from crawler.frontier import UrlFrontier
+from crawler.pagination import thread_page_urls
+from crawler.rate_limiter import get_shared_limiter
+from crawler.retry_policy import RetryPolicy, get_shared_breaker
+from crawler.session_pool import get_shared_session
+from crawler.url_utils import normalize_url
+
+class BoardCrawler:
+    """版块爬虫"""
+
+    def __init__(self):
+        self.setup_logging()
+        self.load_config()
+        self.setup_redis()
+        self.frontier = UrlFrontier(self.redis_client, self.config['FRONTIER_KEY'], self.config['REPLY_WEIGHT'])
+
+        # 与帖子爬虫共用连接池、限速、熔断和编码识别
+        self.session = get_shared_session(self.config['PER_HOST_LIMIT'])
+        self.rate_limiter = get_shared_limiter()
+        self.charset_resolver = get_shared_resolver()
+        self.retry_policy = RetryPolicy(max_attempts=self.config['MAX_ATTEMPTS'], breaker=get_shared_breaker())
+        self.timeout = (min(5, self.config['TIMEOUT']), self.config['TIMEOUT'])
+
+        # 并行获取版块的各个列表页
+        self.page_pool = DownloadPool(self.config['PER_HOST_LIMIT'], self.config['PER_HOST_LIMIT'])
+
+    def setup_logging(self):
+        """设置日志"""
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.StreamHandler(sys.stdout)
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def load_config(self):
+        """加载配置"""
+        self.config = {
+            # 版块列表页URL，多个用逗号或换行分隔
+            'BOARD_URLS': [url.strip() for url in os.getenv('BOARD_URLS', '').replace('\n', ',').split(',') if url.strip()],
+            # 每个版块最多遍历的列表页数（含第一页）
+            'BOARD_PAGES': int(os.getenv('BOARD_PAGES', '5')),
+
+            # 待爬队列配置，每个回复折算的优先级（秒）
+            'FRONTIER_KEY': os.getenv('FRONTIER_KEY', 'bbs_crawler_frontier'),
+            'REPLY_WEIGHT': int(os.getenv('FRONTIER_REPLY_WEIGHT', '60')),
+
+            # 请求配置，与帖子爬虫一致
+            'TIMEOUT': int(os.getenv('BBS_TIMEOUT', '30')),
+            'PER_HOST_LIMIT': int(os.getenv('BBS_PER_HOST_LIMIT', '8')),
+            'MAX_ATTEMPTS': int(os.getenv('BBS_MAX_ATTEMPTS', '3')),
+
+            # Redis配置
+            'REDIS_HOST': os.getenv('REDIS_HOST', 'localhost'),
+            'REDIS_PORT': int(os.getenv('REDIS_PORT', '6379')),
+            'REDIS_PASSWORD': os.getenv('REDIS_PASSWORD', ''),
+            'REDIS_DB': int(os.getenv('REDIS_DB', '0')),
+        }
+
+    def setup_redis(self):
+        """设置Redis连接"""
+        try:
+            self.redis_client = redis.Redis(
+                host=self.config['REDIS_HOST'],
+                port=self.config['REDIS_PORT'],
+                password=self.config['REDIS_PASSWORD'] if self.config['REDIS_PASSWORD'] else None,
+                db=self.config['REDIS_DB'],
+                decode_responses=True
+            )
+            # 测试连接
+            self.redis_client.ping()
+            self.logger.info("Redis连接成功")
+        except Exception as e:
+            self.logger.error(f"Redis连接失败: {e}")
+            sys.exit(1)
+
+    def crawl_board(self, board_url):
+        """
+        遍历一个版块，将帖子加入待爬队列
+
+        Args:
+            board_url: 版块第一页URL
+
+        Returns:
+            dict: 爬取结果
+        """
+        self.logger.info(f"开始遍历版块: {board_url}")
+        try:
+            first_page = self._fetch_board_page(board_url)
+        except Exception as e:
+            self.logger.error(f"获取版块页面失败: {board_url} - {str(e)}")
+            return {'success': False, 'message': f'获取版块页面失败: {str(e)}', 'url': board_url}
+
+        pages = [first_page]
+        key = normalize_url(board_url)
+        page_urls = [page_url for page_url in thread_page_urls(first_page.page_links, self.config['BOARD_PAGES'])
+                     if normalize_url(page_url) != key]
+        if page_urls:
+            self.logger.info(f"版块共遍历 {len(page_urls) + 1} 页，正在并行获取其余页面...")
+            for index, page_url, page, error in self.page_pool.run(self._fetch_board_page, page_urls):
+                if error is not None:
+                    self.logger.warning(f"获取版块页面失败: {page_url} - {str(error)}")
+                    continue
+                pages.append(page)
+
+        threads = {}
+        for page in pages:
+            for thread in page.threads:
+                threads.setdefault(thread.url, thread)
+        added = self.frontier.push_many((thread.url, thread.replies, thread.posted) for thread in threads.values())
+
+        message = f'发现 {len(threads)} 个帖子，新加入待爬队列 {added} 个'
+        self.logger.info(f"版块遍历完成: {message}")
+        return {
+            'success': True,
+            'message': message,
+            'url': board_url,
+            'pages': len(pages),
+            'thread_count': len(threads),
+            'added_count': added,
+        }
+
+    def crawl_all(self, board_urls=None):
+        """
+        遍历所有配置的版块
+
+        Args:
+            board_urls: 版块URL列表，默认使用 BOARD_URLS
+
+        Returns:
+            list: 每个版块的爬取结果
+        """
+        return [self.crawl_board(url) for url in (board_urls or self.config['BOARD_URLS'])]
+
+    def _fetch_board_page(self, page_url):
+        """
+        获取并解析一个版块列表页
+
+        Args:
+            page_url: 列表页URL
+
+        Returns:
+            BoardPage: 帖子列表和分页链接
+        """
+        def request(verify):
+            self.rate_limiter.acquire(page_url)
+            response = self.session.get(page_url, timeout=self.timeout, verify=verify)
+            self.rate_limiter.observe(page_url, response.status_code, response.headers)
+            response.raise_for_status()
+            return response
+
+        response = self.retry_policy.call(page_url, request)
+        response.encoding = self.charset_resolver.resolve(page_url, response.headers, response.content)
+        return extract_threads(response.text, page_url)
+
+    def get_frontier_status(self):
+        """获取待爬队列状态"""
+        return {
+            'frontier_size': self.frontier.size(),
+            'seen_count': self.frontier.seen_count(),
+        }
+
+def main():
+    """主函数"""
+    board_urls = sys.argv[1:]
+    crawler = BoardCrawler()
+
+    if board_urls == ['status']:
+        print(json.dumps(crawler.get_frontier_status(), ensure_ascii=False, indent=2))
+        return
+
+    if not board_urls and not crawler.config['BOARD_URLS']:
+        print("错误: 请设置环境变量 BOARD_URLS 或传入版块URL参数")
+        print("使用方法:")
+        print("  export BOARD_URLS='https://example.com/thread0806.php?fid=16'")
+        print("  python3 board_crawler.py")
+        print("或者:")
+        print("  python3 board_crawler.py 'https://example.com/thread0806.php?fid=16'")
+        print("  python3 board_crawler.py status   - 查看待爬队列状态")
+        sys.exit(1)
+
+    results = crawler.crawl_all(board_urls)
+    results.append(crawler.get_frontier_status())
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    sys.exit(0 if all(result['success'] for result in results[:-1]) else 1)
+
+if __name__ == "__main__":
+    main()
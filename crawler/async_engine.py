@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio抓取引擎 - 在单个事件循环中获取帖子页面并并发下载全部图片
+依赖aiohttp（可选），未安装时调用方应回退到requests引擎
+页面解析、文件写入和SQLite索引读写都是阻塞操作，放到线程池中执行，不阻塞其他下载
+"""
+
+import os
+import asyncio
+import functools
+
+from crawler.http_cache import PageResponse
+from crawler.charset import get_shared_resolver
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def get_fetch_engine_name(default='requests'):
+    """
+    获取抓取引擎名称，环境变量 BBS_FETCH_ENGINE 优先
+
+    Returns:
+        str: 'requests' 或 'async'
+    """
+    name = (os.getenv('BBS_FETCH_ENGINE') or default or 'requests').strip().lower()
+    return 'async' if name in ('async', 'asyncio', 'aiohttp') else 'requests'
+
+
+class AsyncFetchEngine:
+    """asyncio抓取引擎"""
+
+    def __init__(self, headers, timeout=15, limit=200, limit_per_host=8, rate_limiter=None,
+                 retry_policy=None, retry_budget=None):
+        """
+        Args:
+            headers: 默认请求头
+            timeout: 连接后单次读取的超时时间（秒），与requests引擎一致，不限制整个下载的总时长
+            limit: 同时进行的连接总数
+            limit_per_host: 单个主机的最大连接数
+            rate_limiter: 按主机限速调度器（HostRateLimiter），为None时不限速
+            retry_policy: 统一重试策略（RetryPolicy），为None时只请求一次
+            retry_budget: 当前任务的重试预算（RetryBudget）
+        """
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.retry_budget = retry_budget
+
+    @staticmethod
+    def available():
+        """aiohttp是否可用"""
+        return aiohttp is not None
+
+    def crawl(self, page_url, prepare, save_image, on_result=None, page_headers=None):
+        """
+        获取页面并下载图片（同步入口）
+
+        Args:
+            page_url: 帖子网址
+            prepare: 页面解析函数 prepare(PageResponse) -> (图片URL列表, 保存目录, ...)，
+                     返回None表示无需下载，多余的元素原样返回给调用方
+            save_image: 图片保存函数集合，见 _download_image
+            on_result: 单张图片完成回调 on_result(索引, URL, 路径, 异常)
+            page_headers: 获取页面时附加的请求头（如条件请求头）
+
+        Returns:
+            tuple: (prepare的返回值, 按文档顺序排列的下载结果列表)
+        """
+        if aiohttp is None:
+            raise RuntimeError("未安装aiohttp，无法使用async抓取引擎")
+        return asyncio.run(self._crawl(page_url, prepare, save_image, on_result, page_headers))
+
+    async def _crawl(self, page_url, prepare, save_image, on_result, page_headers):
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        # 连接超时较短，失效主机可以尽快触发熔断；不设总时长，慢速链路上的大图片只要持续有数据就不会被取消
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=min(5, self.timeout), sock_read=self.timeout)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                         timeout=timeout) as session:
+            page = await self._fetch_page(session, page_url, page_headers)
+            # 解析和分页获取（requests同步请求）在线程池中执行
+            prepared = await _blocking(prepare, page)
+            if not prepared:
+                return prepared, []
+
+            image_urls, save_dir = prepared[0], prepared[1]
+            results = [None] * len(image_urls)
+
+            async def download(index, img_url):
+                try:
+                    results[index] = await self._download_image(session, img_url, save_dir, save_image)
+                    error = None
+                except Exception as e:
+                    error = e
+                if on_result:
+                    on_result(index, img_url, results[index], error)
+
+            await asyncio.gather(*(download(i, u) for i, u in enumerate(image_urls)))
+            return prepared, results
+
+    async def _request(self, session, url, headers=None):
+        """发起GET请求，SSL错误、重试和熔断由统一重试策略处理"""
+        async def attempt(verify):
+            if self.rate_limiter:
+                wait = self.rate_limiter.reserve(url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            response = await session.get(url, headers=headers, ssl=verify)
+            if self.rate_limiter:
+                self.rate_limiter.observe(url, response.status, response.headers)
+            if response.status >= 400:
+                response.release()
+                response.raise_for_status()
+            return response
+
+        if self.retry_policy:
+            return await self.retry_policy.acall(url, attempt, self.retry_budget)
+        return await attempt(True)
+
+    async def _fetch_page(self, session, url, headers=None):
+        """
+        获取网页，编码识别方式与requests引擎一致
+
+        Returns:
+            PageResponse: 304时text为None
+        """
+        response = await self._request(session, url, headers=headers)
+        async with response:
+            body = await response.read()
+        if response.status == 304:
+            return PageResponse(url, 304, None, None, body, response.headers)
+        encoding = await _blocking(get_shared_resolver().resolve, url, response.headers, body)
+        return PageResponse(url, response.status, body.decode(encoding, errors='replace'),
+                            encoding, body, response.headers)
+
+    async def _download_image(self, session, url, save_dir, save_image):
+        """
+        下载单张图片
+
+        Args:
+            save_image: (lookup, resolve, open_writer, finalize) 四元组，
+                        lookup(url, save_dir) -> 当前目录中已下载的文件路径或None，命中时不发起请求，
+                        resolve(url, content_type, save_dir) -> 文件路径或None，
+                        open_writer(file_path) -> 写入器（write/abort/commit），
+                        finalize(url, file_path, digest) -> 最终路径或None
+
+        Returns:
+            str: 保存的文件路径，失败返回None
+        """
+        lookup, resolve, open_writer, finalize = save_image
+        seen_path = await _blocking(lookup, url, save_dir)
+        if seen_path:
+            return seen_path
+
+        headers = {
+            'Referer': url,
+            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
+        }
+        response = await self._request(session, url, headers=headers)
+        async with response:
+            content_type = response.headers.get('content-type', '').lower()
+            file_path = resolve(url, content_type, save_dir)
+            if not file_path:
+                return None
+            if await _blocking(os.path.exists, file_path):
+                return await _blocking(finalize, url, file_path)
+
+            writer = await _blocking(open_writer, file_path)
+            try:
+                # 较大的块减少线程池调度次数
+                async for chunk in response.content.iter_chunked(65536):
+                    if chunk:
+                        await _blocking(writer.write, chunk)
+            except BaseException:
+                await _blocking(writer.abort)
+                raise
+            digest = await _blocking(writer.commit)
+        return await _blocking(finalize, url, file_path, digest)
+
+
+def _blocking(func, *args):
+    """在默认线程池中执行阻塞函数"""
+    return asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
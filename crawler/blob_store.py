@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址存储 - 图片按SHA-256保存为唯一的blob，帖子目录中的文件是指向blob的硬链接
+（不支持时依次回退到符号链接、复制），引用计数为零的blob可以被回收
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import uuid
+import hashlib
+import tempfile
+import threading
+
+
+class BlobWriter:
+    """边下载边计算哈希的blob写入器"""
+
+    def __init__(self, store, dest_path):
+        """
+        Args:
+            store: BlobStore对象
+            dest_path: 帖子目录中的目标文件路径
+        """
+        self.store = store
+        self.dest_path = dest_path
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        """写入数据块并更新哈希"""
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def commit(self):
+        """
+        完成写入：内容已存在时丢弃临时文件，然后把blob链接到目标路径
+
+        Returns:
+            str: 内容的SHA-256
+        """
+        self._file.close()
+        digest = self._hasher.hexdigest()
+        self.store._commit(self._tmp_path, digest, self.size, self.dest_path)
+        return digest
+
+
+class FileWriter:
+    """
+    不使用内容寻址存储时的写入器，同样边写边计算哈希；先写同目录下的临时文件，
+    提交时再替换到目标路径，并发下载时其他线程不会看到写了一半的文件
+    """
+
+    def __init__(self, dest_path):
+        """
+        Args:
+            dest_path: 目标文件路径
+        """
+        self.dest_path = dest_path
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(dest_path) or '.', prefix='.', suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        """写入数据块并更新哈希"""
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def commit(self):
+        """
+        完成写入，把临时文件替换到目标路径
+
+        Returns:
+            str: 内容的SHA-256
+        """
+        self._file.close()
+        os.replace(self._tmp_path, self.dest_path)
+        return self._hasher.hexdigest()
+
+
+class BlobStore:
+    """内容寻址存储"""
+
+    def __init__(self, root):
+        """
+        Args:
+            root: 保存根目录，blob存放在 root/.blobs 下
+        """
+        self.root = root
+        self.blob_dir = os.path.join(root, '.blobs')
+        self.tmp_dir = os.path.join(self.blob_dir, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.blob_dir, 'index.db'), check_same_thread=False)
+        self._db.execute('PRAGMA busy_timeout=5000')
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER, refcount INTEGER)'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS links (path TEXT PRIMARY KEY, digest TEXT)')
+        self._db.commit()
+
+    def blob_path(self, digest):
+        """blob文件路径，按哈希前两级分目录"""
+        return os.path.join(self.blob_dir, digest[:2], digest[2:4], digest)
+
+    def open_writer(self, dest_path):
+        """
+        创建写入器
+
+        Args:
+            dest_path: 帖子目录中的目标文件路径
+
+        Returns:
+            BlobWriter对象
+        """
+        return BlobWriter(self, dest_path)
+
+    def _commit(self, tmp_path, digest, size, dest_path):
+        blob_path = self.blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob_path):
+                # 相同内容已存在，丢弃本次写入的数据
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+            self._link(blob_path, dest_path)
+            self._db.execute('INSERT OR IGNORE INTO blobs VALUES (?, ?, 0)', (digest, size))
+            self._set_link(dest_path, digest)
+            self._db.commit()
+
+    def _set_link(self, dest_path, digest):
+        """记录目标路径指向的blob并调整引用计数，调用方持有锁并负责提交"""
+        row = self._db.execute('SELECT digest FROM links WHERE path = ?', (dest_path,)).fetchone()
+        if row is None:
+            self._db.execute('INSERT INTO links VALUES (?, ?)', (dest_path, digest))
+        elif row[0] != digest:
+            # 目标路径原来指向其他内容：改为新的blob，原blob的引用减一
+            self._db.execute('UPDATE links SET digest = ? WHERE path = ?', (digest, dest_path))
+            self._db.execute('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', (row[0],))
+        else:
+            return
+        self._db.execute('UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?', (digest,))
+
+    def link_existing(self, src_path, dest_path):
+        """
+        把已保存在存储中的文件链接到另一个路径（如另一个帖子目录）
+
+        Args:
+            src_path: 已有的帖子文件路径
+            dest_path: 新的目标路径
+
+        Returns:
+            str: 内容的SHA-256，src_path不在存储中时返回None
+        """
+        with self._lock:
+            row = self._db.execute('SELECT digest FROM links WHERE path = ?', (src_path,)).fetchone()
+            if row is None or not os.path.exists(self.blob_path(row[0])):
+                return None
+            self._link(self.blob_path(row[0]), dest_path)
+            self._set_link(dest_path, row[0])
+            self._db.commit()
+        return row[0]
+
+    @staticmethod
+    def _link(blob_path, dest_path):
+        """
+        把blob链接到目标路径：硬链接 -> 符号链接 -> 复制；
+        先在同目录下创建临时名称再替换，目标路径不会出现缺失或不完整的中间状态
+        """
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            try:
+                os.link(blob_path, tmp_path)
+                method = 'hardlink'
+            except OSError:
+                try:
+                    os.symlink(blob_path, tmp_path)
+                    method = 'symlink'
+                except OSError:
+                    shutil.copy2(blob_path, tmp_path)
+                    method = 'copy'
+            os.replace(tmp_path, dest_path)
+        except Exception:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return method
+
+    def release(self, dest_path):
+        """
+        删除帖子目录中的文件并减少blob引用计数
+
+        Args:
+            dest_path: 帖子目录中的文件路径
+        """
+        with self._lock:
+            row = self._db.execute('SELECT digest FROM links WHERE path = ?', (dest_path,)).fetchone()
+            if os.path.lexists(dest_path):
+                os.remove(dest_path)
+            if row:
+                self._db.execute('DELETE FROM links WHERE path = ?', (dest_path,))
+                self._db.execute('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', (row[0],))
+                self._db.commit()
+
+    def gc(self):
+        """
+        回收垃圾：清理已被删除的帖子文件的引用，删除引用计数为零的blob
+
+        Returns:
+            dict: removed为删除的blob数，freed为释放的字节数
+        """
+        removed = 0
+        freed = 0
+        with self._lock:
+            for path, digest in self._db.execute('SELECT path, digest FROM links').fetchall():
+                if not os.path.lexists(path):
+                    self._db.execute('DELETE FROM links WHERE path = ?', (path,))
+                    self._db.execute('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', (digest,))
+            for digest, size in self._db.execute(
+                    'SELECT digest, size FROM blobs WHERE refcount <= 0').fetchall():
+                try:
+                    os.remove(self.blob_path(digest))
+                except OSError:
+                    pass
+                self._db.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+                removed += 1
+                freed += size
+            self._db.commit()
+            # 清理中断下载留下的临时文件（一小时前的，避免影响正在进行的下载）
+            for name in os.listdir(self.tmp_dir):
+                tmp_path = os.path.join(self.tmp_dir, name)
+                try:
+                    if time.time() - os.path.getmtime(tmp_path) > 3600:
+                        os.remove(tmp_path)
+                except OSError:
+                    pass
+        return {'removed': removed, 'freed': freed}
+
+    def get_stats(self):
+        """
+        获取存储统计
+
+        Returns:
+            dict: blobs为blob数，bytes为实际占用字节数，links为帖子目录中的文件数
+        """
+        with self._lock:
+            blobs, total = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            links = self._db.execute('SELECT COUNT(*) FROM links').fetchone()[0]
+        return {'blobs': blobs, 'bytes': total, 'links': links}
+
+
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_store(root):
+    """
+    获取进程内共享的内容寻址存储，同一保存目录只打开一个连接，多个爬虫实例共用一把锁
+
+    Args:
+        root: 保存根目录
+
+    Returns:
+        BlobStore对象
+    """
+    root = os.path.abspath(root)
+    with _shared_lock:
+        store = _shared_stores.get(root)
+        if store is None:
+            store = _shared_stores[root] = BlobStore(root)
+        return store
+
+
+def main():
+    """回收指定保存目录下的无用blob"""
+    if len(sys.argv) < 2:
+        print("使用方法: python3 -m crawler.blob_store <保存目录>")
+        sys.exit(1)
+    store = BlobStore(sys.argv[1])
+    result = store.gc()
+    print(f"已删除 {result['removed']} 个blob，释放 {result['freed']} 字节")
+    print(store.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+版块列表解析 - 从论坛版块（帖子列表）页面中提取帖子链接、标题、回复数和发帖时间
+支持草榴（htm_data/.../tid.html、read.php?tid=）和Discuz（thread-tid-1-1.html、viewthread&tid=）
+"""
+
+import re
+import time
+from collections import namedtuple
+from urllib.parse import urljoin
+
+from lxml import etree
+
+from crawler.pagination import is_page_link
+from crawler.url_utils import normalize_url
+
+# 列表中的一个帖子，posted为行内最晚的时间（最后回复或发帖时间戳，秒），无法识别时为None
+ThreadLink = namedtuple('ThreadLink', 'url title replies posted')
+
+# 版块页面解析结果
+BoardPage = namedtuple('BoardPage', 'threads page_links')
+
+# 帖子链接
+_THREAD_LINK = re.compile(
+    r'htm_data/[\w/]*?\d+\.html|read\.php\?tid=\d+|thread-\d+-1-\d+\.html|[?&]mod=viewthread&tid=\d+',
+    re.IGNORECASE
+)
+
+# 帖子内分页链接（列表中帖子标题后面的 1 2 3 ... 页码）
+_THREAD_PAGE = re.compile(r'[?&]page=(?!1\b)\d+|thread-\d+-(?!1-)\d+-\d+\.html', re.IGNORECASE)
+
+_INTEGER = re.compile(r'^\d+$')
+_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?:\s+(\d{1,2}):(\d{2}))?')
+
+
+def is_thread_link(url):
+    """是否为帖子链接（不含帖子内第2页以后的分页链接）"""
+    return bool(_THREAD_LINK.search(url)) and not _THREAD_PAGE.search(url)
+
+
+def _parse_date(text):
+    match = _DATE.search(text)
+    if not match:
+        return None
+    year, month, day, hour, minute = (int(value) if value else 0 for value in match.groups())
+    try:
+        return time.mktime((year, month, day, hour, minute, 0, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+class _BoardTarget:
+    """lxml解析目标：以表格行（tr/tbody）为单位收集帖子链接和行内的数字、日期"""
+
+    ROW_TAGS = ('tr', 'tbody')
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.threads = {}
+        self.page_links = {}
+        # 行栈，每行为 {'url', 'title', 'texts'}
+        self._rows = []
+        self._link = None
+        # 分页链接中的页码不能当作回复数
+        self._in_page_link = False
+
+    def start(self, tag, attrib):
+        if tag in self.ROW_TAGS:
+            self._rows.append({'url': None, 'title': [], 'texts': []})
+        elif tag == 'a':
+            href = attrib.get('href')
+            if not href:
+                return
+            url = urljoin(self.base_url, href)
+            if is_thread_link(url):
+                if not self._rows:
+                    # 不在表格中的帖子链接，没有回复数和时间
+                    self._link = {'url': url, 'title': [], 'standalone': True}
+                elif self._rows[-1]['url'] is None:
+                    # 行内第一个帖子链接为标题链接
+                    self._rows[-1]['url'] = url
+                    self._link = self._rows[-1]
+            elif is_page_link(url):
+                self._in_page_link = True
+                if not _THREAD_LINK.search(url):
+                    # 只记录版块的分页，不记录帖子内的分页
+                    self.page_links[url] = None
+
+    def end(self, tag):
+        if tag == 'a':
+            if self._link is not None and self._link.get('standalone'):
+                self._add(self._link['url'], ''.join(self._link['title']).strip(), 0, None)
+            self._link = None
+            self._in_page_link = False
+        elif tag in self.ROW_TAGS and self._rows:
+            row = self._rows.pop()
+            if row['url']:
+                texts = [text.strip() for text in row['texts'] if text.strip()]
+                # 行内第一个纯数字视为回复数，最晚的日期视为最后活跃时间
+                replies = next((int(text) for text in texts if _INTEGER.match(text)), 0)
+                posted = max(filter(None, map(_parse_date, texts)), default=None)
+                self._add(row['url'], ''.join(row['title']).strip(), replies, posted)
+
+    def data(self, data):
+        if self._link is not None:
+            self._link['title'].append(data)
+        elif self._rows and not self._in_page_link:
+            self._rows[-1]['texts'].append(data)
+
+    def _add(self, url, title, replies, posted):
+        key = normalize_url(url)
+        if key not in self.threads:
+            self.threads[key] = ThreadLink(key, title, replies, posted)
+
+    def close(self):
+        return BoardPage(list(self.threads.values()), list(self.page_links))
+
+
+def extract_threads(html, base_url):
+    """
+    解析版块页面
+
+    Args:
+        html: 版块页面内容
+        base_url: 版块页面URL
+
+    Returns:
+        BoardPage: 帖子列表（按页面顺序）和版块分页链接
+    """
+    target = _BoardTarget(base_url)
+    if not html:
+        # 没有喂入任何内容时lxml会抛出 XMLSyntaxError
+        return target.close()
+    parser = etree.HTMLParser(target=target)
+    parser.feed(html)
+    return parser.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网页编码识别 - 依次使用响应头的charset、网页开头的<meta>声明、同一主机上次识别的编码，
+都没有时才对整个正文做编码检测，替代每个页面都执行的 response.apparent_encoding
+"""
+
+import re
+import codecs
+import threading
+
+from requests.compat import chardet
+
+from crawler.rate_limiter import host_of
+
+# Content-Type中的charset
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 网页开头的 <meta charset="..."> 或 <meta http-equiv content="...; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 查找meta声明时检查的字节数
+SNIFF_BYTES = 4096
+
+# 与浏览器一致，gb2312声明按GBK解码，避免GBK扩展字符变成乱码
+_ALIASES = {'gb2312': 'gbk'}
+
+
+def normalize_encoding(encoding):
+    """
+    规范化编码名称
+
+    Returns:
+        str: Python编码名称，未知编码返回None
+    """
+    if not encoding:
+        return None
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    return _ALIASES.get(name, name)
+
+
+def header_charset(headers):
+    """
+    响应头中声明的编码
+
+    Args:
+        headers: 响应头
+
+    Returns:
+        str: 编码名称，没有声明返回None
+    """
+    match = _HEADER_CHARSET.search(headers.get('Content-Type', '') if headers else '')
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def meta_charset(head):
+    """
+    网页开头<meta>标签声明的编码
+
+    Args:
+        head: 网页开头的字节
+
+    Returns:
+        str: 编码名称，没有声明返回None
+    """
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    return normalize_encoding(match.group(1).decode('ascii')) if match else None
+
+
+class CharsetResolver:
+    """网页编码识别，记住每个主机最近使用的编码"""
+
+    def __init__(self):
+        self._host_encodings = {}
+        self._stats = {'header': 0, 'meta': 0, 'host': 0, 'detect': 0}
+        self._lock = threading.Lock()
+
+    def declared(self, url, headers, head):
+        """
+        不做编码检测，只根据声明和主机记录识别编码
+
+        Args:
+            url: 网页URL
+            headers: 响应头
+            head: 网页开头的字节（至少SNIFF_BYTES，页面更短时为整个页面）
+
+        Returns:
+            str: 编码名称，无法确定返回None
+        """
+        encoding = header_charset(headers)
+        source = 'header'
+        if encoding is None:
+            encoding = meta_charset(head)
+            source = 'meta'
+        if encoding is None:
+            with self._lock:
+                encoding = self._host_encodings.get(host_of(url))
+            source = 'host'
+        if encoding is None:
+            return None
+        self._record(url, encoding, source)
+        return encoding
+
+    def detect(self, url, content):
+        """
+        对整个正文做编码检测，结果记录为该主机的编码
+
+        Returns:
+            str: 编码名称，检测失败返回utf-8
+        """
+        encoding = normalize_encoding(chardet.detect(content)['encoding']) or 'utf-8'
+        self._record(url, encoding, 'detect')
+        return encoding
+
+    def resolve(self, url, headers, content):
+        """
+        识别网页编码
+
+        Args:
+            url: 网页URL
+            headers: 响应头
+            content: 网页正文字节
+
+        Returns:
+            str: 编码名称
+        """
+        return self.declared(url, headers, content[:SNIFF_BYTES]) or self.detect(url, content)
+
+    def _record(self, url, encoding, source):
+        with self._lock:
+            self._stats[source] += 1
+            if source != 'host':
+                self._host_encodings[host_of(url)] = encoding
+
+    def get_stats(self):
+        """
+        获取各识别方式的使用次数
+
+        Returns:
+            dict: header/meta/host/detect 的次数
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+_shared_resolver = CharsetResolver()
+
+
+def get_shared_resolver():
+    """获取进程内共享的编码识别器"""
+    return _shared_resolver
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫公共常量 - 不依赖第三方库，配置管理等模块可以直接导入
+"""
+
+# 默认的正文区域：草榴的楼层内容、Discuz的帖子内容
+DEFAULT_CONTENT_SELECTOR = 'div.tpc_content, td.t_f, div.t_msgfont'
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻爬虫进程 - 在本地TCP端口接收任务，由常驻的工作线程执行，
+每个任务不再需要启动新的Python解释器，会话、缓存和已下载索引保持加载状态
+
+协议：每行一个JSON
+- 提交任务：{"url": "...", "source": "webhook"} -> {"accepted": true, "pending": 3}
+- 查询状态：{"cmd": "status"} -> {"pending": 0, "completed": 12, ...}
+"""
+
+import json
+import queue
+import socket
+import logging
+import threading
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDR = '127.0.0.1:5710'
+
+
+def parse_address(address):
+    """
+    解析 host:port 地址
+
+    Args:
+        address: 如 127.0.0.1:5710，只写端口时使用 127.0.0.1
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def submit_to_daemon(address, url, source='webhook', timeout=1.0):
+    """
+    把任务交给常驻爬虫进程
+
+    Args:
+        address: 常驻进程地址 host:port
+        url: 任务URL
+        source: 提交来源
+        timeout: 连接和等待回复的超时（秒），常驻进程未运行时很快失败
+
+    Returns:
+        dict: 常驻进程的回复
+
+    Raises:
+        OSError: 无法连接或回复超时
+        ValueError: 回复格式错误
+    """
+    return _request(address, {'url': url, 'source': source}, timeout)
+
+
+def get_daemon_status(address, timeout=1.0):
+    """查询常驻爬虫进程状态，参数和异常同 submit_to_daemon"""
+    return _request(address, {'cmd': 'status'}, timeout)
+
+
+def _request(address, message, timeout):
+    with socket.create_connection(parse_address(address), timeout=timeout) as conn:
+        conn.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        with conn.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ValueError('常驻爬虫进程未返回结果')
+    return json.loads(line)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CrawlDaemon:
+    """常驻爬虫进程的任务接收与调度"""
+
+    def __init__(self, make_handler, address=DEFAULT_ADDR, workers=2, max_queue=1000):
+        """
+        Args:
+            make_handler: 在每个工作线程中调用一次，返回处理函数，处理函数参数为任务字典
+            address: 监听地址 host:port，建议只监听本机
+            workers: 工作线程数
+            max_queue: 待处理任务上限，超过时拒绝新任务
+        """
+        self.make_handler = make_handler
+        self.address = parse_address(address)
+        self.workers = workers
+        self._tasks = queue.Queue(maxsize=max_queue)
+        self._stats = {'accepted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def submit(self, task):
+        """
+        加入一个任务
+
+        Args:
+            task: 任务字典，至少包含 url
+
+        Returns:
+            bool: 已加入返回True，队列满返回False
+        """
+        try:
+            self._tasks.put_nowait(task)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        self._count('accepted')
+        return True
+
+    def _worker(self):
+        handle = self.make_handler()
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                self._tasks.task_done()
+                return
+            try:
+                handle(task)
+                self._count('completed')
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"处理任务失败 {task.get('url')}: {e}")
+            finally:
+                self._tasks.task_done()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        """
+        获取任务统计
+
+        Returns:
+            dict: accepted/rejected/completed/failed 次数和待处理任务数
+        """
+        with self._lock:
+            return dict(self._stats, pending=self._tasks.unfinished_tasks, workers=self.workers)
+
+    def _reply(self, message):
+        if not isinstance(message, dict):
+            return {'accepted': False, 'error': '无效的JSON数据'}
+        if message.get('cmd') == 'status':
+            return self.get_stats()
+        url = message.get('url')
+        if not url:
+            return {'accepted': False, 'error': '缺少URL参数'}
+        task = {'url': url, 'source': message.get('source', 'unknown')}
+        if not self.submit(task):
+            return {'accepted': False, 'error': '任务队列已满'}
+        return {'accepted': True, 'pending': self._tasks.unfinished_tasks}
+
+    def serve_forever(self, drain_timeout=60):
+        """
+        启动工作线程并开始接收任务，直到 shutdown 被调用或收到 KeyboardInterrupt；
+        退出前等待已接收的任务处理完成
+
+        Args:
+            drain_timeout: 退出时每个工作线程最多等待的秒数
+        """
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = daemon._reply(json.loads(line))
+                    except ValueError:
+                        reply = {'accepted': False, 'error': '无效的JSON数据'}
+                    self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        threads = [threading.Thread(target=self._worker, name=f"daemon-worker-{index}", daemon=True)
+                   for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        self._server = _Server(self.address, Handler)
+        logger.info(f"常驻爬虫进程已启动: {self.address[0]}:{self.address[1]}，工作线程 {self.workers} 个")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("收到停止信号")
+        finally:
+            self._server.server_close()
+            logger.info(f"等待 {self._tasks.unfinished_tasks} 个任务处理完成")
+            for _ in threads:
+                self._tasks.put(None)
+            for thread in threads:
+                thread.join(drain_timeout)
+
+    def shutdown(self):
+        """停止接收任务（在其他线程中调用），serve_forever 随后返回"""
+        if self._server:
+            self._server.shutdown()
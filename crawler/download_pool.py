@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发下载池 - 有界线程池，支持总并发数和单主机并发数限制
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class DownloadBatch:
+    """可以边提交边取结果的下载批次，用于一边解析网页一边下载图片"""
+
+    def __init__(self, pool, func, args):
+        """
+        Args:
+            pool: 所属的DownloadPool
+            func: 下载函数，调用方式为 func(url, *args)
+            args: 传给下载函数的其他参数
+        """
+        self._pool = pool
+        self._func = func
+        self._args = args
+        self._executor = ThreadPoolExecutor(max_workers=pool.max_workers)
+        self._futures = {}
+        self._done = queue.Queue()
+        # map() 等待期间完成、尚未取走的下载任务
+        self._ready = deque()
+        self.count = 0
+
+    def submit(self, url, *args):
+        """
+        提交一个下载任务
+
+        Args:
+            url: 下载URL
+            *args: 追加在批次参数后面的其他参数
+
+        Returns:
+            int: 任务索引，按提交顺序递增
+        """
+        index = self.count
+        self.count += 1
+        future = self._executor.submit(self._pool._run_one, self._func, url, self._args + args)
+        self._futures[future] = (index, url)
+        future.add_done_callback(self._done.put)
+        return index
+
+    def _result(self, future):
+        index, url = self._futures.pop(future)
+        try:
+            return index, url, future.result(), None
+        except Exception as e:
+            return index, url, None, e
+
+    def completed(self):
+        """
+        产出已经完成的任务结果，不等待
+
+        Yields:
+            tuple: (索引, URL, 结果, 异常)
+        """
+        while True:
+            if self._ready:
+                future = self._ready.popleft()
+            else:
+                try:
+                    future = self._done.get_nowait()
+                except queue.Empty:
+                    return
+            yield self._result(future)
+
+    def wait(self):
+        """
+        等待剩余任务，按完成顺序产出结果
+
+        Yields:
+            tuple: (索引, URL, 结果, 异常)
+        """
+        while self._futures:
+            future = self._ready.popleft() if self._ready else self._done.get()
+            yield self._result(future)
+
+    def map(self, func, urls, *args, on_completed=None):
+        """
+        在本批次的线程池中执行另一组任务（如获取帖子分页），与下载任务共用总并发数和单主机并发数限制
+
+        Args:
+            func: 任务函数，调用方式为 func(url, *args)
+            urls: URL列表
+            *args: 传给任务函数的其他参数
+            on_completed: 等待期间下载任务完成时的回调 on_completed(索引, URL, 结果, 异常)，
+                          为None时留给 completed() 和 wait()
+
+        Yields:
+            tuple: (索引, URL, 结果, 异常)，索引对应urls中的位置
+        """
+        calls = {}
+        for index, url in enumerate(urls):
+            future = self._executor.submit(self._pool._run_one, func, url, args)
+            calls[future] = (index, url)
+            future.add_done_callback(self._done.put)
+
+        while calls:
+            future = self._done.get()
+            if future not in calls:
+                if on_completed is None:
+                    self._ready.append(future)
+                else:
+                    on_completed(*self._result(future))
+                continue
+            index, url = calls.pop(future)
+            try:
+                yield index, url, future.result(), None
+            except Exception as e:
+                yield index, url, None, e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 出错时取消还没开始的任务
+        self._executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+
+class DownloadPool:
+    """并发下载池"""
+
+    def __init__(self, max_workers=8, per_host_limit=4):
+        """
+        Args:
+            max_workers: 总并发数
+            per_host_limit: 单个主机的最大并发数
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        """获取主机对应的信号量"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def _run_one(self, func, url, args):
+        """在主机并发限制内执行单个任务"""
+        with self._host_semaphore(url):
+            return func(url, *args)
+
+    def run(self, func, urls, *args):
+        """
+        并发执行下载任务，按完成顺序逐个产出结果
+
+        Args:
+            func: 下载函数，调用方式为 func(url, *args)
+            urls: URL列表
+            *args: 传给下载函数的其他参数
+
+        Yields:
+            tuple: (索引, URL, 结果, 异常)，索引对应urls中的位置
+        """
+        if not urls:
+            return
+
+        with self.batch(func, *args) as batch:
+            for url in urls:
+                batch.submit(url)
+            yield from batch.wait()
+
+    def batch(self, func, *args):
+        """
+        创建下载批次，任务可以陆续提交
+
+        Args:
+            func: 下载函数，调用方式为 func(url, *args)
+            *args: 传给下载函数的其他参数
+
+        Returns:
+            DownloadBatch对象，需要在with语句中使用
+        """
+        return DownloadBatch(self, func, args)
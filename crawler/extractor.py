@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网页解析 - 基于lxml的单次遍历提取器，一次解析同时得到标题和图片链接
+（img/a/style/data-* 属性以及脚本和文本中的图片URL），未安装lxml时回退到BeautifulSoup
+"""
+
+import re
+from collections import namedtuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from crawler.pagination import is_page_link
+from crawler.constants import DEFAULT_CONTENT_SELECTOR
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# 解析结果，image_urls按文档顺序去重，page_links为带页码的分页链接
+ParsedPage = namedtuple('ParsedPage', 'title h1 image_urls page_links')
+
+_IMAGE_EXT = r'\.(?:jpe?g|png|gif|bmp|webp|svg)'
+
+# 脚本和文本中的图片URL：完整的http(s)链接，或引号中的相对路径。
+# 字符类不含引号和空白，每个起点最多扫描到下一个引号/空白，整体为线性时间
+_URL_SCANNER = re.compile(
+    r'https?://[^\s"\'<>()\\]*?' + _IMAGE_EXT + r'(?![\w])'
+    r'|(?<=["\'])[^\s"\'<>()\\]*?' + _IMAGE_EXT + r'(?=["\'])',
+    re.IGNORECASE
+)
+
+# 属性值本身是图片地址（可带查询参数）
+_IMAGE_VALUE = re.compile(_IMAGE_EXT + r'(?:[?#][^\s"\'<>]*)?$', re.IGNORECASE)
+
+# style属性中的 url(...)
+_CSS_URL = re.compile(r'url\(\s*["\']?([^"\')\s]+)', re.IGNORECASE)
+
+# img标签中按优先级取一个作为图片地址的属性
+_IMG_SRC_ATTRS = ('src', 'data-src', 'data-original', 'data-lazy')
+
+
+def parse_selector(selector):
+    """
+    解析简单的CSS选择器列表，支持 tag、.class、#id 及其组合，用逗号分隔
+
+    Args:
+        selector: 选择器字符串，如 'div.tpc_content, td.t_f'
+
+    Returns:
+        list: [(标签名或None, id或None, class集合), ...]，空字符串返回空列表
+    """
+    rules = []
+    for part in (selector or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        tokens = re.findall(r'([.#]?)([\w-]+)', part)
+        tag = next((name.lower() for prefix, name in tokens if not prefix), None)
+        element_id = next((name for prefix, name in tokens if prefix == '#'), None)
+        classes = frozenset(name for prefix, name in tokens if prefix == '.')
+        rules.append((tag, element_id, classes))
+    return rules
+
+
+def _matches(rules, tag, attrib):
+    for rule_tag, rule_id, rule_classes in rules:
+        if rule_tag and rule_tag != tag:
+            continue
+        if rule_id and attrib.get('id') != rule_id:
+            continue
+        if rule_classes and not rule_classes.issubset((attrib.get('class') or '').split()):
+            continue
+        return True
+    return False
+
+
+class _PageTarget:
+    """
+    lxml解析目标，在解析事件中直接收集标题和图片候选，不构建文档树
+
+    指定正文区域时只收集区域内的图片；第一次进入区域后丢弃并不再收集区域外的内容，
+    整个页面都没有匹配的区域时使用全文的结果。
+    设置on_image时，确定有效的图片链接在解析过程中立即回调，其余的在close时回调
+    """
+
+    def __init__(self, base_url, is_valid_image_url, content_rules=None, on_image=None):
+        self.base_url = base_url
+        self.is_valid_image_url = is_valid_image_url
+        self.content_rules = content_rules or []
+        self.on_image = on_image
+        self._emitted = 0
+        self._title = []
+        self._h1 = []
+        self._in_title = False
+        self._h1_depth = 0
+        self._h1_done = False
+        self._region_depth = 0
+        self._region_seen = False
+        # 当前收集的图片和文本：进入正文区域前为全文，之后只有区域内
+        self._image_urls = {}
+        self._text = []
+        # 分页链接在正文区域外，始终收集
+        self._page_links = {}
+
+    def _collecting(self):
+        return self._region_depth > 0 or not self._region_seen
+
+    def _add(self, url):
+        url = url.strip()
+        if not url:
+            return
+        if not url.startswith(('http://', 'https://')):
+            url = urljoin(self.base_url, url)
+        if url not in self._image_urls and self.is_valid_image_url(url):
+            self._image_urls[url] = None
+            if self.on_image is not None and (self._region_depth or not self.content_rules):
+                # 正文区域内（或不限区域）的链接不会被丢弃，可以立即交给下载
+                self._emitted += 1
+                self.on_image(url)
+
+    def start(self, tag, attrib):
+        if tag == 'title':
+            self._in_title = True
+        elif tag == 'h1' and not self._h1_done:
+            self._h1_depth += 1
+        elif self._h1_depth:
+            self._h1_depth += 1
+
+        if tag == 'a' and attrib.get('href') and is_page_link(attrib['href']):
+            self._page_links[urljoin(self.base_url, attrib['href'])] = None
+
+        if self._region_depth:
+            self._region_depth += 1
+        elif self.content_rules and _matches(self.content_rules, tag, attrib):
+            if not self._region_seen:
+                # 找到正文区域，丢弃之前收集的页面框架内容
+                self._region_seen = True
+                self._image_urls = {}
+                self._text = []
+            self._region_depth = 1
+
+        if not self._collecting():
+            return
+        # 文本只在元素边界处分隔；同一文本节点分块喂入时会被拆成多段 data，不能插入分隔符
+        self._text.append('\n')
+        if not attrib:
+            return
+        skip = None
+        if tag == 'img':
+            skip = next((name for name in _IMG_SRC_ATTRS if attrib.get(name)), None)
+            if skip:
+                self._add(attrib[skip])
+        elif tag == 'a':
+            skip = 'href'
+            if attrib.get('href'):
+                self._add(attrib['href'])
+        for name, value in attrib.items():
+            if name == skip or not value:
+                continue
+            if name == 'style':
+                for css_url in _CSS_URL.findall(value):
+                    self._add(css_url)
+            elif _IMAGE_VALUE.search(value):
+                self._add(value)
+
+    def end(self, tag):
+        if self._collecting():
+            self._text.append('\n')
+        if tag == 'title':
+            self._in_title = False
+        elif self._h1_depth:
+            self._h1_depth -= 1
+            if not self._h1_depth:
+                self._h1_done = True
+        if self._region_depth:
+            self._region_depth -= 1
+
+    def data(self, data):
+        if self._in_title:
+            self._title.append(data)
+        elif self._h1_depth:
+            self._h1.append(data)
+        if self._collecting():
+            self._text.append(data)
+
+    def snapshot(self):
+        """当前已解析到的标题、h1和图片链接"""
+        return ParsedPage(''.join(self._title).strip(), ''.join(self._h1).strip(),
+                          list(self._image_urls), list(self._page_links))
+
+    def close(self):
+        # 脚本和文本内容只用一个编译好的正则扫描一次
+        for match in _URL_SCANNER.findall(''.join(self._text)):
+            self._add(match)
+        parsed = self.snapshot()
+        if self.on_image is not None:
+            for url in parsed.image_urls[self._emitted:]:
+                self.on_image(url)
+        return parsed
+
+
+class PageExtractor:
+    """
+    增量网页提取器，可以分块喂入HTML
+
+    未安装lxml时先缓存内容，close时用BeautifulSoup解析
+    """
+
+    def __init__(self, base_url, is_valid_image_url, content_selector=None, on_image=None):
+        """
+        Args:
+            base_url: 网页URL，用于转换相对链接
+            is_valid_image_url: 判断图片URL是否有效的函数
+            content_selector: 正文区域选择器，为空时解析整个页面
+            on_image: 找到图片链接时的回调 on_image(url)，按文档顺序调用
+        """
+        self.base_url = base_url
+        self.is_valid_image_url = is_valid_image_url
+        self.content_selector = content_selector
+        self.on_image = on_image
+        if etree is not None:
+            self._target = _PageTarget(base_url, is_valid_image_url, parse_selector(content_selector), on_image)
+            self._parser = etree.HTMLParser(target=self._target)
+            self._fed = False
+        else:
+            self._parser = None
+            self._chunks = []
+
+    def feed(self, html):
+        """喂入一段HTML文本"""
+        if self._parser is not None:
+            if html:
+                self._parser.feed(html)
+                self._fed = True
+        else:
+            self._chunks.append(html)
+
+    def snapshot(self):
+        """
+        获取目前已解析到的内容，用于在解析完成前取得标题
+
+        Returns:
+            ParsedPage: 未安装lxml时为空结果
+        """
+        if self._parser is not None:
+            return self._target.snapshot()
+        return ParsedPage('', '', [], [])
+
+    def close(self):
+        """
+        结束解析
+
+        Returns:
+            ParsedPage: 标题、第一个h1和图片URL列表
+        """
+        if self._parser is not None:
+            # 没有喂入任何内容时lxml会抛出 XMLSyntaxError，空页面直接返回空结果
+            return self._parser.close() if self._fed else self._target.close()
+        parsed = extract_page_legacy(''.join(self._chunks), self.base_url, self.is_valid_image_url,
+                                     self.content_selector)
+        if self.on_image is not None:
+            for url in parsed.image_urls:
+                self.on_image(url)
+        return parsed
+
+
+def extract_page(html, base_url, is_valid_image_url, content_selector=None):
+    """
+    单次遍历解析网页，提取标题和图片链接
+
+    Args:
+        html: 网页内容
+        base_url: 网页URL
+        is_valid_image_url: 判断图片URL是否有效的函数
+        content_selector: 正文区域选择器，只提取区域内的图片；没有匹配时使用整个页面
+
+    Returns:
+        ParsedPage: 标题、第一个h1和图片URL列表
+    """
+    extractor = PageExtractor(base_url, is_valid_image_url, content_selector)
+    if html:
+        extractor.feed(html)
+    return extractor.close()
+
+
+def extract_page_legacy(html, base_url, is_valid_image_url, content_selector=None):
+    """
+    原有的提取方式：html.parser + 多次find_all + 全文多个正则，
+    未安装lxml时使用，也用于性能对比
+
+    Args:
+        html: 网页内容
+        base_url: 网页URL
+        is_valid_image_url: 判断图片URL是否有效的函数
+        content_selector: 正文区域选择器，没有匹配时使用整个页面
+
+    Returns:
+        ParsedPage: 标题、第一个h1和图片URL列表
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = ''
+    title_tag = soup.find('title')
+    if title_tag and title_tag.string:
+        title = title_tag.string.strip()
+    h1 = ''
+    h1_tag = soup.find('h1')
+    if h1_tag:
+        h1 = h1_tag.get_text().strip()
+
+    # 只在正文区域内查找，没有匹配的区域时使用整个页面
+    scopes = soup.select(content_selector) if content_selector else []
+    if scopes:
+        html = ''.join(str(scope) for scope in scopes)
+    else:
+        scopes = [soup]
+
+    def find_all(*args, **kwargs):
+        return [tag for scope in scopes for tag in scope.find_all(*args, **kwargs)]
+
+    # 使用dict去重并保持顺序
+    image_urls = {}
+
+    # 方法1: 查找img标签
+    for img in find_all('img'):
+        src = img.get('src') or img.get('data-src') or img.get('data-original') or img.get('data-lazy')
+        if src:
+            absolute_url = urljoin(base_url, src)
+            if is_valid_image_url(absolute_url):
+                image_urls[absolute_url] = None
+
+    # 方法2: 查找a标签中的图片链接
+    for a in find_all('a', href=True):
+        absolute_url = urljoin(base_url, a['href'])
+        if is_valid_image_url(absolute_url):
+            image_urls[absolute_url] = None
+
+    # 方法3: 查找CSS背景图片
+    for tag in find_all(['div', 'span', 'section'], style=True):
+        style = tag.get('style', '')
+        for bg_img in re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style):
+            absolute_url = urljoin(base_url, bg_img)
+            if is_valid_image_url(absolute_url):
+                image_urls[absolute_url] = None
+
+    # 方法4: 使用正则表达式在整个页面内容中搜索图片URL
+    image_patterns = [
+        r'https?://[^\s"\'<>]+\.(?:jpg|jpeg|png|gif|bmp|webp|svg)',
+        r'src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
+        r'data-src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
+        r'data-original\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
+        r'["\']([^"\']*(?:https?://)?[^"\']*\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']'
+    ]
+    for pattern in image_patterns:
+        for match in re.findall(pattern, html, re.IGNORECASE):
+            if isinstance(match, tuple):
+                match = next((m for m in match if m), '')
+            if match:
+                if match.startswith(('http://', 'https://')):
+                    absolute_url = match
+                else:
+                    absolute_url = urljoin(base_url, match)
+                if is_valid_image_url(absolute_url):
+                    image_urls[absolute_url] = None
+
+    page_links = {urljoin(base_url, a['href']): None
+                  for a in soup.find_all('a', href=True) if is_page_link(a['href'])}
+
+    return ParsedPage(title, h1, list(image_urls), list(page_links))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+待爬帖子队列（frontier）- 保存在Redis中，持久化、去重、按优先级出队
+版块爬虫发现的帖子写入这里，队列处理器在手动提交的任务处理完后从这里取帖子
+"""
+
+import time
+
+from crawler.url_utils import normalize_url
+
+
+class UrlFrontier:
+    """
+    基于Redis的待爬帖子队列
+
+    - <key>        有序集合，成员为规范化的帖子URL，分数为优先级，分数高的先出队
+    - <key>:seen   哈希表，规范化URL -> 上次入队时的回复数，用于去重；
+                   回复数增加的帖子会重新入队，保持版块镜像为最新
+    """
+
+    def __init__(self, redis_client, key='bbs_crawler_frontier', reply_weight=60):
+        """
+        Args:
+            redis_client: Redis客户端（decode_responses=True）
+            key: 队列键名
+            reply_weight: 每个回复折算的优先级（秒），优先级 = 最后活跃时间 + 回复数 * reply_weight
+        """
+        self.redis = redis_client
+        self.queue_key = key
+        self.seen_key = f"{key}:seen"
+        self.reply_weight = reply_weight
+
+    def priority(self, replies=0, posted=None):
+        """
+        计算优先级：越新、回复越多的帖子越先处理
+
+        Args:
+            replies: 回复数
+            posted: 最后活跃时间戳，未知时使用当前时间
+
+        Returns:
+            float: 优先级
+        """
+        return (posted or time.time()) + replies * self.reply_weight
+
+    def push_many(self, threads):
+        """
+        批量加入帖子，已入队且回复数没有增加的帖子会被跳过
+
+        Args:
+            threads: 可迭代的 (url, replies, posted)
+
+        Returns:
+            int: 新加入（或重新加入）的帖子数
+        """
+        threads = [(normalize_url(url), replies or 0, posted) for url, replies, posted in threads]
+        if not threads:
+            return 0
+
+        known = self.redis.hmget(self.seen_key, [url for url, _, _ in threads])
+        pipe = self.redis.pipeline(transaction=False)
+        added = 0
+        for (url, replies, posted), seen_replies in zip(threads, known):
+            if seen_replies is not None and replies <= int(seen_replies):
+                continue
+            pipe.hset(self.seen_key, url, replies)
+            pipe.zadd(self.queue_key, {url: self.priority(replies, posted)})
+            added += 1
+        if added:
+            pipe.execute()
+        return added
+
+    def push(self, url, replies=0, posted=None):
+        """
+        加入单个帖子
+
+        Returns:
+            bool: 是否加入
+        """
+        return self.push_many([(url, replies, posted)]) > 0
+
+    def pop(self):
+        """
+        取出优先级最高的帖子
+
+        Returns:
+            str: 帖子URL，队列为空返回None
+        """
+        result = self.redis.zpopmax(self.queue_key)
+        return result[0][0] if result else None
+
+    def pop_into(self, task_queue, make_task):
+        """
+        取出优先级最高的帖子并在同一事务中放入任务队列
+
+        Args:
+            task_queue: 任务队列（ReliableQueue / StreamQueue）
+            make_task: 将帖子URL转换为任务JSON的函数
+
+        Returns:
+            str: 帖子URL，队列为空返回None
+        """
+        return task_queue.push_from(self.queue_key, make_task)
+
+    def size(self):
+        """队列中的帖子数"""
+        return self.redis.zcard(self.queue_key)
+
+    def seen_count(self):
+        """已发现的帖子总数"""
+        return self.redis.hlen(self.seen_key)
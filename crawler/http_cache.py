@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帖子页面的磁盘HTTP缓存 - 按规范化URL保存正文、编码、ETag、Last-Modified和正文哈希，
+通过 If-None-Match / If-Modified-Since 条件请求重新验证，按大小做LRU淘汰
+
+论坛的动态页面通常不返回ETag和Last-Modified，无法发送条件请求，仍需下载完整页面；
+此时比较正文哈希，内容未变化时跳过解析，直接使用缓存的解析结果
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+
+from crawler.url_utils import normalize_url
+
+# 抓取到的页面，status为304时text/content来自缓存
+PageResponse = namedtuple('PageResponse', 'url status text encoding content headers')
+
+# 缓存条目，meta保存解析结果（标题、图片链接等），304或正文哈希相同时可以跳过解析
+CacheEntry = namedtuple('CacheEntry', 'url etag last_modified encoding content meta digest')
+
+
+def content_digest(content):
+    """正文的SHA-256"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class HttpCache:
+    """磁盘HTTP缓存"""
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 正文总大小上限，超出后淘汰最久未使用的条目
+        """
+        self.cache_dir = cache_dir
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        self.max_bytes = max_bytes
+        os.makedirs(self.body_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self._db.execute('PRAGMA busy_timeout=5000')
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT,'
+            ' encoding TEXT, size INTEGER, accessed REAL, meta TEXT, digest TEXT)'
+        )
+        # 旧版本的缓存数据库没有正文哈希列
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(entries)')]
+        if 'digest' not in columns:
+            self._db.execute('ALTER TABLE entries ADD COLUMN digest TEXT')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._db.commit()
+
+    def _body_path(self, key):
+        return os.path.join(self.body_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, url):
+        """
+        读取缓存
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            CacheEntry: 未命中返回None
+        """
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, etag, last_modified, encoding, meta, digest FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._body_path(key), 'rb') as f:
+                    content = f.read()
+            except OSError:
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        return CacheEntry(row[0], row[1], row[2], row[3], content, json.loads(row[4] or '{}'), row[5])
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        生成条件请求头
+
+        Args:
+            entry: 缓存条目，可以为None
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since 请求头
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    @staticmethod
+    def not_modified(page, entry):
+        """
+        判断页面是否与缓存相同，相同时可以直接使用缓存的解析结果
+
+        Args:
+            page: 抓取到的页面（PageResponse）
+            entry: 缓存条目，可以为None
+
+        Returns:
+            bool: 304，或者正文哈希与缓存相同（没有ETag/Last-Modified的页面）
+        """
+        if entry is None:
+            return False
+        if page.status == 304:
+            return True
+        return bool(entry.digest and page.content and content_digest(page.content) == entry.digest)
+
+    def put(self, url, content, encoding, etag=None, last_modified=None, meta=None):
+        """
+        写入缓存；没有ETag和Last-Modified的页面同样缓存，下次通过正文哈希判断是否变化
+
+        Args:
+            url: 页面URL
+            content: 正文字节
+            encoding: 正文编码
+            etag: ETag响应头
+            last_modified: Last-Modified响应头
+            meta: 解析结果
+        """
+        key = normalize_url(url)
+        body_path = self._body_path(key)
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, body_path)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries'
+                ' (key, url, etag, last_modified, encoding, size, accessed, meta, digest)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, etag, last_modified, encoding, len(content), time.time(),
+                 json.dumps(meta or {}, ensure_ascii=False), content_digest(content))
+            )
+            self._db.commit()
+            self._evict()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过上限"""
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            total -= size
+        self._db.commit()
+
+    def get_stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: entries为条目数，bytes为正文总大小
+        """
+        with self._lock:
+            count, total = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(cache_dir, max_bytes=200 * 1024 * 1024):
+    """
+    获取进程内共享的HTTP缓存，同一缓存目录只打开一个连接，多个爬虫实例共用一把锁
+
+    Args:
+        cache_dir: 缓存目录
+        max_bytes: 正文总大小上限，只在第一次调用时使用
+
+    Returns:
+        HttpCache对象
+    """
+    cache_dir = os.path.abspath(cache_dir)
+    with _shared_lock:
+        cache = _shared_caches.get(cache_dir)
+        if cache is None:
+            cache = _shared_caches[cache_dir] = HttpCache(cache_dir, max_bytes)
+        return cache
@@ -6,15 +6,25 @@
 
 import os
 import re
+import shutil
 import time
-import requests
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+import itertools
+from urllib.parse import urlparse
 from utils.file_manager import FileManager
-import ssl
+from crawler.download_pool import DownloadPool
+from crawler.async_engine import AsyncFetchEngine, get_fetch_engine_name
+from crawler.rate_limiter import get_shared_limiter
+from crawler.charset import get_shared_resolver
+from crawler.session_pool import get_shared_session
+from crawler.http_cache import HttpCache, PageResponse, get_shared_cache
+from crawler.seen_index import get_shared_index
+from crawler.extractor import extract_page, PageExtractor, ParsedPage, DEFAULT_CONTENT_SELECTOR
+from crawler.pagination import thread_page_urls
+from crawler.url_utils import normalize_url
+from crawler.page_stream import PageStream
+from crawler.blob_store import get_shared_store, FileWriter
+from crawler.retry_policy import RetryPolicy, RetryBudget, get_shared_breaker
 import urllib3
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -22,30 +32,66 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 class ImageCrawler:
     """图片爬虫类"""
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, max_workers=8, per_host_limit=4, host_rate=4.0, host_rates=None,
+                 engine='requests', async_limit=200, retry_budget=10,
+                 http_cache_dir=None, http_cache_mb=200, content_dedupe=True,
+                 content_selector=DEFAULT_CONTENT_SELECTOR, streaming=False,
+                 paginate=False, max_pages=50):
+        """
+        Args:
+            max_workers: 图片下载总并发数
+            per_host_limit: 单个图片主机的最大并发数
+            host_rate: 默认每个主机每秒请求数
+            host_rates: 指定主机的速率 {主机名: 每秒请求数}
+            engine: 抓取引擎，'requests' 或 'async'，环境变量 BBS_FETCH_ENGINE 优先
+            async_limit: asyncio引擎同时进行的连接总数
+            retry_budget: 单个帖子任务允许的重试总次数
+            http_cache_dir: 帖子页面HTTP缓存目录，为None时不缓存
+            http_cache_mb: HTTP缓存大小上限（MB）
+            content_dedupe: 是否使用内容寻址存储，相同图片只保存一份
+            content_selector: 帖子正文区域选择器，只提取区域内的图片，为空时使用整个页面
+            streaming: 流式解析，边接收网页边解析，找到图片链接立即开始下载（requests引擎）
+            paginate: 分页模式，从第一页找出帖子的其余分页并行获取，所有图片保存到同一目录
+            max_pages: 分页模式下最多获取的页数
+        """
         self.file_manager = FileManager()
-        
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        
-        # 设置请求头，模拟浏览器
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        self.download_pool = DownloadPool(max_workers, per_host_limit)
+        # 进程内共享的Session，连接池大小与下载并发数保持一致，任务之间复用连接
+        self.session = get_shared_session(self.download_pool.max_workers)
+        # 进程内共享的网页编码识别器，记住每个主机的编码
+        self.charset_resolver = get_shared_resolver()
+        # 进程内共享的按主机限速调度器
+        self.rate_limiter = get_shared_limiter()
+        self.rate_limiter.configure(default_rate=host_rate, host_rates=host_rates)
+        self._name_counter = itertools.count()
+        self.engine = get_fetch_engine_name(engine)
+        self.async_limit = async_limit
+        self.retry_budget = retry_budget
+        # 连接超时较短，失效主机可以尽快触发熔断
+        self.timeout = (5, 15)
+        
+        # 统一重试策略：单任务重试预算 + 进程内共享的按主机熔断器
+        self.retry_policy = RetryPolicy(max_attempts=3, breaker=get_shared_breaker())
+        self._retry_budget = None
+        
+        # 已下载图片索引，每个保存路径一个，进程内共享
+        self._seen_index = None
+        self._seen_hits = set()
+        
+        # 内容寻址存储，每个保存路径一个，进程内共享
+        self.content_dedupe = content_dedupe
+        self._blob_store = None
+        
+        # 进程内共享的帖子页面磁盘HTTP缓存
+        self.http_cache = None
+        if http_cache_dir and http_cache_mb > 0:
+            self.http_cache = get_shared_cache(http_cache_dir, http_cache_mb * 1024 * 1024)
+        
+        # 帖子正文区域，跳过导航、广告、签名等页面框架中的图片
+        self.content_selector = content_selector
+        self.streaming = streaming
+        self.paginate = paginate
+        self.max_pages = max_pages
         
         # 支持的图片格式
         self.image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'}
@@ -63,150 +109,399 @@ class ImageCrawler:
             list: 下载的图片路径列表
         """
         downloaded_images = []
+        # 每个任务使用独立的重试预算
+        self._retry_budget = RetryBudget(self.retry_budget)
+        self._seen_index = self._get_seen_index(save_path)
+        self._seen_hits = set()
+        if self.content_dedupe:
+            self._blob_store = self._get_blob_store(save_path)
         
         try:
             if progress_callback:
                 progress_callback("正在获取网页内容...")
             
-            # 获取网页内容，添加SSL和重试处理
-            response = self._safe_request(url)
+            def on_result(index, img_url, image_path, error):
+                """单张图片完成回调"""
+                if error is not None:
+                    if progress_callback:
+                        progress_callback(f"下载图片失败: {str(error)}")
+                elif image_path and progress_callback:
+                    progress_callback(f"已下载: {os.path.basename(image_path)}", image_path)
             
-            if progress_callback:
-                progress_callback("正在解析网页...")
+            # 有缓存时发送条件请求，页面未修改只需一次很小的往返
+            cached = self.http_cache.get(url) if self.http_cache else None
+            page_headers = HttpCache.conditional_headers(cached)
             
-            # 解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
+            def prepare(page):
+                """解析网页并创建保存目录"""
+                return self._prepare_download(url, page, cached, save_path, progress_callback)
             
-            # 查找所有图片链接
-            image_urls = self._extract_image_urls(soup, url, response.text)
+            if self._use_async_engine():
+                # asyncio引擎：页面和图片在同一个事件循环中获取
+                save_image = (self._lookup_seen, self._resolve_image_path,
+                              self._open_image_writer, self._finalize_image)
+                prepared, results = self._create_async_engine().crawl(
+                    url, prepare, save_image, on_result, page_headers=page_headers)
+            else:
+                # 获取网页内容，添加SSL和重试处理
+                response = self._safe_request(url, page_headers, stream=self.streaming)
+                if self.streaming and response.status_code != 304:
+                    prepared, results = self._crawl_streaming(
+                        url, response, save_path, on_result, progress_callback)
+                else:
+                    prepared = prepare(PageResponse(
+                        url, response.status_code, response.text, response.encoding,
+                        response.content, response.headers))
+                    results = []
+                    if prepared:
+                        # 并发下载图片，结果按文档顺序保存
+                        image_urls, save_dir = prepared
+                        results = [None] * len(image_urls)
+                        for index, img_url, image_path, error in self.download_pool.run(
+                                self._download_image, image_urls, save_dir):
+                            results[index] = image_path
+                            on_result(index, img_url, image_path, error)
             
-            if not image_urls:
-                if progress_callback:
-                    progress_callback("未找到图片链接")
+            if not prepared:
                 return downloaded_images
             
-            if progress_callback:
-                progress_callback(f"找到 {len(image_urls)} 个图片链接，开始下载...")
-            
-            # 创建保存目录 - 使用网页标题作为文件夹名
-            folder_name = self._generate_folder_name(soup, url)
-            save_dir = os.path.join(save_path, folder_name)
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # 下载图片
-            for i, img_url in enumerate(image_urls, 1):
-                try:
-                    if progress_callback:
-                        progress_callback(f"正在下载第 {i}/{len(image_urls)} 张图片...")
-                    
-                    image_path = self._download_image(img_url, save_dir)
-                    if image_path:
-                        downloaded_images.append(image_path)
-                        if progress_callback:
-                            progress_callback(f"已下载: {os.path.basename(image_path)}", image_path)
-                    
-                    # 添加延时，避免请求过快
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    if progress_callback:
-                        progress_callback(f"下载图片失败: {str(e)}")
-                    continue
+            downloaded_images = [path for path in results if path]
             
             if progress_callback:
-                progress_callback(f"下载完成，共保存 {len(downloaded_images)} 张图片到: {save_dir}")
+                if self._seen_hits:
+                    progress_callback(f"跳过 {len(self._seen_hits)} 张已下载的图片")
+                progress_callback(f"下载完成，共保存 {len(downloaded_images)} 张图片到: {prepared[1]}")
                 
         except Exception as e:
             raise Exception(f"爬取失败: {str(e)}")
         
         return downloaded_images
     
-    def _safe_request(self, url, max_retries=3):
+    def _prepare_download(self, url, page, cached, save_path, progress_callback=None):
+        """
+        解析网页，提取图片链接并创建保存目录
+        
+        Args:
+            url: 目标网址
+            page: 抓取到的页面（PageResponse）
+            cached: 页面的缓存条目（CacheEntry），没有缓存为None
+            save_path: 保存路径
+            progress_callback: 进度回调函数
+            
+        Returns:
+            tuple: (图片URL列表, 保存目录)，未找到图片返回None
+        """
+        if progress_callback:
+            if HttpCache.not_modified(page, cached):
+                progress_callback("页面未修改，使用缓存的解析结果")
+            else:
+                progress_callback("正在解析网页...")
+        parsed = self._parse_page(url, page, cached)
+        title = self._page_title(parsed)
+        image_urls = parsed.image_urls
+        
+        if self.paginate:
+            image_urls = self._merge_thread_pages(url, image_urls, parsed.page_links, progress_callback)
+        
+        if not image_urls:
+            if progress_callback:
+                progress_callback("未找到图片链接")
+            return None
+        
+        if progress_callback:
+            progress_callback(f"找到 {len(image_urls)} 个图片链接，开始下载...")
+        
+        save_dir = self._thread_save_dir(url, title, save_path)
+        return image_urls, save_dir
+    
+    def _parse_page(self, url, page, cached):
+        """
+        解析网页，页面未修改时直接使用缓存的解析结果
+        
+        Args:
+            url: 网页URL
+            page: 抓取到的页面（PageResponse）
+            cached: 页面的缓存条目（CacheEntry），没有缓存为None
+            
+        Returns:
+            ParsedPage: 解析结果
+        """
+        if HttpCache.not_modified(page, cached):
+            meta = cached.meta
+            return ParsedPage(meta.get('title', ''), '', meta.get('image_urls', []), meta.get('page_links', []))
+        
+        # 解析HTML，一次遍历得到标题和所有图片链接
+        parsed = extract_page(page.text, url, self._is_valid_image_url, self.content_selector)
+        self._cache_page(url, page.content, page.encoding, page.headers, parsed)
+        return parsed
+    
+    def _cache_page(self, url, content, encoding, headers, parsed):
+        """保存网页和解析结果到HTTP缓存"""
+        if self.http_cache:
+            self.http_cache.put(
+                url, content, encoding,
+                etag=headers.get('ETag'),
+                last_modified=headers.get('Last-Modified'),
+                meta={'title': self._page_title(parsed), 'image_urls': parsed.image_urls,
+                      'page_links': parsed.page_links},
+            )
+    
+    def _merge_thread_pages(self, url, image_urls, page_links, progress_callback=None, batch=None, on_result=None):
+        """
+        并行获取帖子的其余分页，按页码顺序合并图片链接
+        
+        Args:
+            url: 帖子第一页URL
+            image_urls: 第一页的图片链接
+            page_links: 第一页中的分页链接
+            progress_callback: 进度回调函数
+            batch: 正在下载的批次，提供时分页在同一个线程池中获取，不额外占用并发数
+            on_result: 获取分页期间批次中图片完成的回调 on_result(索引, URL, 文件路径, 异常)
+            
+        Returns:
+            list: 整个帖子的图片链接，按页码和文档顺序去重
+        """
+        key = normalize_url(url)
+        page_urls = [page_url for page_url in thread_page_urls(page_links, self.max_pages)
+                     if normalize_url(page_url) != key]
+        if not page_urls:
+            return image_urls
+        
+        if progress_callback:
+            progress_callback(f"帖子共 {len(page_urls) + 1} 页，正在并行获取其余页面...")
+        
+        pages = [[] for _ in page_urls]
+        if batch is not None:
+            fetched = batch.map(self._fetch_thread_page, page_urls, on_completed=on_result)
+        else:
+            fetched = self.download_pool.run(self._fetch_thread_page, page_urls)
+        for index, page_url, page_images, error in fetched:
+            if error is not None:
+                if progress_callback:
+                    progress_callback(f"获取分页失败: {page_url} - {str(error)}")
+                continue
+            pages[index] = page_images
+        
+        merged = dict.fromkeys(image_urls)
+        for page_images in pages:
+            merged.update(dict.fromkeys(page_images))
+        return list(merged)
+    
+    def _fetch_thread_page(self, page_url):
+        """
+        获取并解析帖子的一个分页
+        
+        Args:
+            page_url: 分页URL
+            
+        Returns:
+            list: 分页中的图片链接
+        """
+        cached = self.http_cache.get(page_url) if self.http_cache else None
+        response = self._safe_request(page_url, HttpCache.conditional_headers(cached))
+        page = PageResponse(page_url, response.status_code, response.text, response.encoding,
+                            response.content, response.headers)
+        return self._parse_page(page_url, page, cached).image_urls
+    
+    def _crawl_streaming(self, url, response, save_path, on_result, progress_callback=None):
+        """
+        流式解析网页：边接收边解析，找到图片链接立即提交下载
+        
+        Args:
+            url: 目标网址
+            response: 以stream=True获取的网页响应
+            save_path: 保存路径
+            on_result: 单张图片完成回调 on_result(索引, URL, 文件路径, 异常)
+            progress_callback: 进度回调函数
+            
+        Returns:
+            tuple: ((图片URL列表, 保存目录), 按文档顺序的下载结果)，未找到图片时为 (None, [])
+        """
+        if progress_callback:
+            progress_callback("正在边接收边解析网页...")
+        
+        stream = PageStream(response, resolver=self.charset_resolver)
+        results = {}
+        save_dir = None
+        
+        with self.download_pool.batch(self._download_image) as batch:
+            def on_done(index, img_url, image_path, error):
+                """单张图片完成"""
+                results[index] = image_path
+                on_result(index, img_url, image_path, error)
+            
+            def on_image(img_url):
+                """找到图片链接，第一张图片时创建保存目录"""
+                nonlocal save_dir
+                if save_dir is None:
+                    title = self._page_title(extractor.snapshot())
+                    save_dir = self._thread_save_dir(url, title, save_path)
+                batch.submit(img_url, save_dir)
+            
+            extractor = PageExtractor(url, self._is_valid_image_url, self.content_selector, on_image)
+            try:
+                for text in stream:
+                    extractor.feed(text)
+                    for item in batch.completed():
+                        on_done(*item)
+            finally:
+                stream.close()
+            parsed = extractor.close()
+            self._cache_page(url, stream.content, stream.encoding, response.headers, parsed)
+            image_urls = parsed.image_urls
+            
+            if self.paginate:
+                # 第一页的图片已经在下载，其余分页的图片按页码顺序追加
+                image_urls = self._merge_thread_pages(url, image_urls, parsed.page_links, progress_callback,
+                                                      batch=batch, on_result=on_done)
+                for img_url in image_urls[len(parsed.image_urls):]:
+                    on_image(img_url)
+            
+            if image_urls and progress_callback:
+                progress_callback(f"网页解析完成，共找到 {len(image_urls)} 个图片链接")
+            
+            for item in batch.wait():
+                on_done(*item)
+        
+        if not image_urls:
+            if progress_callback:
+                progress_callback("未找到图片链接")
+            return None, []
+        return (image_urls, save_dir), [results.get(i) for i in range(len(image_urls))]
+    
+    def _thread_save_dir(self, url, title, save_path):
+        """
+        创建帖子的保存目录 - 使用网页标题作为文件夹名，重新爬取时沿用上次的目录
+        
+        Args:
+            url: 帖子URL
+            title: 网页标题
+            save_path: 保存路径
+            
+        Returns:
+            str: 保存目录
+        """
+        folder_name = self._seen_index.thread_folder(url)
+        if not folder_name:
+            folder_name = self._generate_folder_name(title, url)
+            self._seen_index.set_thread_folder(url, folder_name)
+        save_dir = os.path.join(save_path, folder_name)
+        os.makedirs(save_dir, exist_ok=True)
+        return save_dir
+    
+    def _get_seen_index(self, save_path):
+        """
+        获取保存路径对应的已下载图片索引
+        
+        Args:
+            save_path: 保存路径
+            
+        Returns:
+            SeenIndex对象
+        """
+        os.makedirs(save_path, exist_ok=True)
+        return get_shared_index(os.path.join(save_path, '.seen_index.db'))
+    
+    def _get_blob_store(self, save_path):
+        """
+        获取保存路径对应的内容寻址存储
+        
+        Args:
+            save_path: 保存路径
+            
+        Returns:
+            BlobStore对象
+        """
+        return get_shared_store(save_path)
+    
+    def _use_async_engine(self):
+        """是否使用asyncio抓取引擎"""
+        if self.engine != 'async':
+            return False
+        if not AsyncFetchEngine.available():
+            print("未安装aiohttp，回退到requests抓取引擎")
+            return False
+        return True
+    
+    def _create_async_engine(self):
+        """创建asyncio抓取引擎"""
+        return AsyncFetchEngine(
+            self.session.headers,
+            timeout=15,
+            limit=self.async_limit,
+            limit_per_host=self.download_pool.per_host_limit,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+            retry_budget=self._retry_budget,
+        )
+    
+    def _get(self, url, **kwargs):
         """
-        安全的网络请求，处理SSL错误和重试
+        经过主机限速调度器的GET请求
         
         Args:
             url: 请求URL
-            max_retries: 最大重试次数
+            **kwargs: 传给session.get的参数
             
         Returns:
             Response对象
         """
-        for attempt in range(max_retries):
+        self.rate_limiter.acquire(url)
+        response = self.session.get(url, **kwargs)
+        self.rate_limiter.observe(url, response.status_code, response.headers)
+        return response
+    
+    def _safe_request(self, url, headers=None, stream=False):
+        """
+        安全的网络请求，由统一重试策略处理SSL错误、重试和主机熔断
+        
+        Args:
+            url: 请求URL
+            headers: 额外的请求头（如条件请求头）
+            stream: 是否流式读取，为True时不读取正文、不检测编码
+            
+        Returns:
+            Response对象
+        """
+        def request(verify):
+            response = self._get(url, timeout=self.timeout, headers=headers, verify=verify, stream=stream)
             try:
-                # 尝试正常请求
-                response = self.session.get(url, timeout=15, verify=True)
                 response.raise_for_status()
-                response.encoding = response.apparent_encoding
-                return response
-                
-            except requests.exceptions.SSLError as e:
-                if attempt < max_retries - 1:
-                    print(f"SSL错误，尝试使用不验证SSL的方式 (尝试 {attempt + 1}/{max_retries})")
-                    try:
-                        # 尝试不验证SSL
-                        response = self.session.get(url, timeout=15, verify=False)
-                        response.raise_for_status()
-                        response.encoding = response.apparent_encoding
-                        return response
-                    except Exception as e2:
-                        print(f"不验证SSL也失败: {e2}")
-                        if attempt < max_retries - 1:
-                            time.sleep(2 ** attempt)  # 指数退避
-                            continue
-                        else:
-                            raise e2
-                else:
-                    raise e
-                    
-            except requests.exceptions.ConnectionError as e:
-                if attempt < max_retries - 1:
-                    print(f"连接错误，重试中 (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(2 ** attempt)  # 指数退避
-                    continue
-                else:
-                    raise e
-                    
-            except requests.exceptions.Timeout as e:
-                if attempt < max_retries - 1:
-                    print(f"请求超时，重试中 (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise e
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"其他错误，重试中 (尝试 {attempt + 1}/{max_retries}): {e}")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise e
+            except Exception:
+                response.close()
+                raise
+            return response
+        
+        response = self.retry_policy.call(url, request, self._retry_budget)
+        if not stream and response.status_code != 304:
+            # 优先使用声明的编码，只有无法确定时才做编码检测
+            response.encoding = self.charset_resolver.resolve(url, response.headers, response.content)
+        return response
     
-    def _generate_folder_name(self, soup, url):
+    def _page_title(self, parsed):
+        """
+        获取网页标题，没有title标签时使用h1标签
+        
+        Args:
+            parsed: 网页解析结果（ParsedPage）
+            
+        Returns:
+            str: 网页标题，找不到返回空字符串
+        """
+        return parsed.title or parsed.h1
+    
+    def _generate_folder_name(self, title, url):
         """
         生成文件夹名称，基于网页标题
         
         Args:
-            soup: BeautifulSoup对象
+            title: 网页标题
             url: 网页URL
             
         Returns:
             str: 清理后的文件夹名称
         """
-        # 尝试获取网页标题
-        title = ""
-        title_tag = soup.find('title')
-        if title_tag and title_tag.string:
-            title = title_tag.string.strip()
-        
-        # 如果没有标题，尝试获取h1标签
-        if not title:
-            h1_tag = soup.find('h1')
-            if h1_tag:
-                title = h1_tag.get_text().strip()
-        
-        # 如果还是没有标题，使用域名作为备选
+        # 如果没有标题，使用域名作为备选
         if not title:
             domain = urlparse(url).netloc
             title = f"images_from_{domain}"
@@ -274,81 +569,6 @@ class ImageCrawler:
         
         return cleaned
     
-    def _extract_image_urls(self, soup, base_url, page_content):
-        """
-        提取图片URL
-        
-        Args:
-            soup: BeautifulSoup对象
-            base_url: 基础URL
-            page_content: 网页原始内容
-            
-        Returns:
-            list: 图片URL列表
-        """
-        image_urls = set()
-        
-        # 方法1: 查找img标签
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            src = img.get('src') or img.get('data-src') or img.get('data-original') or img.get('data-lazy')
-            if src:
-                # 转换为绝对URL
-                absolute_url = urljoin(base_url, src)
-                if self._is_valid_image_url(absolute_url):
-                    image_urls.add(absolute_url)
-        
-        # 方法2: 查找a标签中的图片链接
-        a_tags = soup.find_all('a', href=True)
-        for a in a_tags:
-            href = a['href']
-            absolute_url = urljoin(base_url, href)
-            if self._is_valid_image_url(absolute_url):
-                image_urls.add(absolute_url)
-        
-        # 方法3: 查找CSS背景图片
-        style_tags = soup.find_all(['div', 'span', 'section'], style=True)
-        for tag in style_tags:
-            style = tag.get('style', '')
-            bg_images = re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style)
-            for bg_img in bg_images:
-                absolute_url = urljoin(base_url, bg_img)
-                if self._is_valid_image_url(absolute_url):
-                    image_urls.add(absolute_url)
-        
-        # 方法4: 使用正则表达式在整个页面内容中搜索图片URL（新增）
-        image_patterns = [
-            # 匹配完整的HTTP/HTTPS图片URL
-            r'https?://[^\s"\'<>]+\.(?:jpg|jpeg|png|gif|bmp|webp|svg)',
-            # 匹配src属性中的图片
-            r'src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配data-src属性中的图片
-            r'data-src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配data-original属性中的图片
-            r'data-original\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配JavaScript中的图片URL
-            r'["\']([^"\']*(?:https?://)?[^"\']*\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']'
-        ]
-        
-        for pattern in image_patterns:
-            matches = re.findall(pattern, page_content, re.IGNORECASE)
-            for match in matches:
-                # 处理元组结果（某些正则表达式会返回元组）
-                if isinstance(match, tuple):
-                    match = next((m for m in match if m), '')
-                
-                if match:
-                    # 转换为绝对URL
-                    if match.startswith(('http://', 'https://')):
-                        absolute_url = match
-                    else:
-                        absolute_url = urljoin(base_url, match)
-                    
-                    if self._is_valid_image_url(absolute_url):
-                        image_urls.add(absolute_url)
-        
-        return list(image_urls)
-    
     def _is_valid_image_url(self, url):
         """
         检查是否为有效的图片URL
@@ -396,87 +616,174 @@ class ImageCrawler:
             save_dir: 保存目录
             
         Returns:
-            str: 保存的文件路径，失败返回None
+            str: 保存的文件路径，不是有效图片返回None
+            
+        Raises:
+            Exception: 请求或写入失败，由下载池交给 on_result 报告
         """
+        # 已下载过的图片直接返回，不发起网络请求
+        seen_path = self._lookup_seen(url, save_dir)
+        if seen_path:
+            return seen_path
+        
+        # 设置特殊的请求头，某些图片服务器需要Referer
+        headers = self.session.headers.copy()
+        headers.update({
+            'Referer': url,
+            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
+        })
+        
+        # 获取图片，使用安全请求方法
+        response = self._safe_image_request(url, headers)
+        
+        content_type = response.headers.get('content-type', '').lower()
+        file_path = self._resolve_image_path(url, content_type, save_dir)
+        if not file_path:
+            response.close()
+            return None
+        
+        # 避免重复下载
+        if os.path.exists(file_path):
+            response.close()
+            return self._finalize_image(url, file_path)
+        
+        # 保存图片，边下载边计算哈希
+        writer = self._open_image_writer(file_path)
         try:
-            # 设置特殊的请求头，某些图片服务器需要Referer
-            headers = self.session.headers.copy()
-            headers.update({
-                'Referer': url,
-                'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
-            })
-            
-            # 获取图片，使用安全请求方法
-            response = self._safe_image_request(url, headers)
-            
-            # 检查内容类型
-            content_type = response.headers.get('content-type', '').lower()
-            if not (content_type.startswith('image/') or 'image' in content_type):
-                # 如果Content-Type不是图片，但URL看起来像图片，仍然尝试下载
-                if not any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']):
-                    return None
-            
-            # 生成文件名
-            filename = self._generate_filename(url, content_type)
-            file_path = os.path.join(save_dir, filename)
-            
-            # 避免重复下载
-            if os.path.exists(file_path):
-                return file_path
-            
-            # 保存图片
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            # 验证文件大小
-            if os.path.getsize(file_path) < 500:  # 小于500字节的文件可能不是有效图片
-                os.remove(file_path)
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    writer.write(chunk)
+        except Exception:
+            writer.abort()
+            raise
+        digest = writer.commit()
+        
+        return self._finalize_image(url, file_path, digest)
+    
+    def _resolve_image_path(self, url, content_type, save_dir):
+        """
+        根据内容类型确定图片保存路径
+        
+        Args:
+            url: 图片URL
+            content_type: 响应的Content-Type（小写）
+            save_dir: 保存目录
+            
+        Returns:
+            str: 文件路径，不是图片返回None
+        """
+        # 检查内容类型
+        if not (content_type.startswith('image/') or 'image' in content_type):
+            # 如果Content-Type不是图片，但URL看起来像图片，仍然尝试下载
+            if not any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']):
                 return None
+        
+        # 生成文件名
+        filename = self._generate_filename(url, content_type)
+        return os.path.join(save_dir, filename)
+    
+    def _open_image_writer(self, file_path):
+        """
+        创建图片写入器，启用内容寻址存储时写入blob并硬链接到帖子目录
+        
+        Args:
+            file_path: 帖子目录中的文件路径
             
-            return file_path
+        Returns:
+            BlobWriter或FileWriter对象
+        """
+        if self._blob_store is not None:
+            return self._blob_store.open_writer(file_path)
+        return FileWriter(file_path)
+    
+    def _finalize_image(self, url, file_path, digest=None):
+        """
+        校验已写入的图片文件，有效则记录到已下载图片索引
+        
+        Args:
+            url: 图片URL
+            file_path: 文件路径
+            digest: 文件内容的SHA-256
             
-        except Exception as e:
+        Returns:
+            str: 有效则返回文件路径，否则删除文件并返回None
+        """
+        # 验证文件大小
+        if os.path.getsize(file_path) < 500:  # 小于500字节的文件可能不是有效图片
+            if self._blob_store is not None:
+                self._blob_store.release(file_path)
+            else:
+                os.remove(file_path)
+            return None
+        
+        if self._seen_index is not None:
+            self._seen_index.record(url, file_path, digest)
+        return file_path
+    
+    def _lookup_seen(self, url, save_dir):
+        """
+        在已下载图片索引中查找图片，图片在其他帖子目录中时链接（或复制）到当前目录
+        
+        Args:
+            url: 图片URL
+            save_dir: 当前帖子的保存目录
+            
+        Returns:
+            str: 当前目录中已下载的文件路径，没有返回None
+        """
+        if self._seen_index is None:
+            return None
+        path = self._seen_index.lookup(url)
+        if not path:
             return None
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(save_dir):
+            path = self._link_seen(path, save_dir)
+        self._seen_hits.add(url)
+        return path
     
-    def _safe_image_request(self, url, headers, max_retries=2):
+    def _link_seen(self, path, save_dir):
         """
-        安全的图片请求
+        把其他帖子目录中已下载的图片放入当前帖子目录：优先通过内容寻址存储硬链接，否则硬链接或复制
+        
+        Args:
+            path: 已下载的文件路径
+            save_dir: 当前帖子的保存目录
+            
+        Returns:
+            str: 当前目录中的文件路径
+        """
+        dest_path = os.path.join(save_dir, os.path.basename(path))
+        if os.path.exists(dest_path):
+            return dest_path
+        if self._blob_store is not None and self._blob_store.link_existing(path, dest_path):
+            return dest_path
+        try:
+            os.link(path, dest_path)
+        except OSError:
+            shutil.copy2(path, dest_path)
+        return dest_path
+    
+    def _safe_image_request(self, url, headers):
+        """
+        安全的图片请求，由统一重试策略处理SSL错误、重试和主机熔断
         
         Args:
             url: 图片URL
             headers: 请求头
-            max_retries: 最大重试次数
             
         Returns:
             Response对象
         """
-        for attempt in range(max_retries):
+        def request(verify):
+            response = self._get(url, timeout=self.timeout, stream=True, headers=headers, verify=verify)
             try:
-                response = self.session.get(url, timeout=15, stream=True, headers=headers, verify=True)
                 response.raise_for_status()
-                return response
-                
-            except requests.exceptions.SSLError:
-                if attempt < max_retries - 1:
-                    try:
-                        # 尝试不验证SSL
-                        response = self.session.get(url, timeout=15, stream=True, headers=headers, verify=False)
-                        response.raise_for_status()
-                        return response
-                    except Exception:
-                        time.sleep(1)
-                        continue
-                else:
-                    raise
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    raise e
+            except Exception:
+                response.close()
+                raise
+            return response
+        
+        return self.retry_policy.call(url, request, self._retry_budget)
     
     def _generate_filename(self, url, content_type):
         """
@@ -509,7 +816,8 @@ class ImageCrawler:
                 'image/svg+xml': '.svg'
             }
             ext = ext_map.get(content_type, '.jpg')
-            filename = f"image_{int(time.time() * 1000)}{ext}"
+            # 并发下载时追加序号，避免同一毫秒内文件名冲突
+            filename = f"image_{int(time.time() * 1000)}_{next(self._name_counter)}{ext}"
         
         # 清理文件名
         filename = self._clean_filename(filename)
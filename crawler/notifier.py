@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台通知发送 - 推送请求放入有界队列，由后台线程使用独立的连接池发送，
+调用方不等待第三方推送服务；失败时重试，队列满时丢弃并计数
+通知汇总 - 批量任务的结果按时间窗口或数量合并为一条通知，减少推送次数
+"""
+
+import time
+import queue
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """后台通知发送器"""
+
+    def __init__(self, max_queue=100, workers=2, max_attempts=3, retry_delay=1.0, timeout=10):
+        """
+        Args:
+            max_queue: 队列容量，队列满时新通知被丢弃
+            workers: 发送线程数
+            max_attempts: 每条通知最多发送次数
+            retry_delay: 首次重试的等待秒数，之后每次翻倍
+            timeout: 单次请求超时（秒）
+        """
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats = {'queued': 0, 'sent': 0, 'failed': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # 推送服务专用的连接池，与爬虫的连接池分开
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def submit(self, channel, method, url, **kwargs):
+        """
+        提交一条通知，立即返回
+
+        Args:
+            channel: 渠道名称（用于日志和统计）
+            method: HTTP方法
+            url: 请求URL
+            **kwargs: 传给 session.request 的参数（json、data等）
+
+        Returns:
+            bool: 已加入队列返回True，队列满被丢弃返回False
+        """
+        self._start()
+        try:
+            self._queue.put_nowait((channel, method, url, kwargs))
+        except queue.Full:
+            self._count('dropped')
+            logger.warning(f"通知队列已满，丢弃{channel}通知")
+            return False
+        self._count('queued')
+        return True
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"notifier-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            channel, method, url, kwargs = self._queue.get()
+            try:
+                self._send(channel, method, url, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, channel, method, url, kwargs):
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                # 429和5xx可以重试，其他状态码视为已送达（4xx重试也不会成功）
+                if response.status_code != 429 and response.status_code < 500:
+                    self._count('sent')
+                    logger.info(f"{channel}通知发送成功")
+                    return
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt < self.max_attempts:
+                time.sleep(delay)
+                delay *= 2
+        self._count('failed')
+        logger.error(f"{channel}通知发送失败: {error}")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def wait(self, timeout=None):
+        """
+        等待队列中的通知发送完成（进程退出前调用）
+
+        Args:
+            timeout: 最多等待的秒数，None表示一直等待
+
+        Returns:
+            bool: 全部发送完成返回True
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def get_stats(self):
+        """
+        获取发送统计
+
+        Returns:
+            dict: queued/sent/failed/dropped 次数和当前队列长度
+        """
+        with self._lock:
+            return dict(self._stats, pending=self._queue.unfinished_tasks)
+
+
+class DigestNotifier:
+    """
+    通知汇总：距上次发送超过时间窗口的结果立即单独发送；窗口内陆续到达的结果
+    在窗口结束或数量达到上限时合并为一条通知发送，单个任务的通知不会被延迟
+    """
+
+    def __init__(self, send, window=30, max_items=20):
+        """
+        Args:
+            send: 发送函数，参数为结果列表
+            window: 发送后多少秒内到达的结果合并到下一条汇总，0表示每条结果立即发送
+            max_items: 累积多少条结果时立即发送
+        """
+        self.send = send
+        self.window = window
+        self.max_items = max_items
+        self._items = []
+        self._timer = None
+        self._last_sent = float('-inf')
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        """
+        加入一条结果
+
+        Args:
+            item: 任务结果
+        """
+        with self._lock:
+            self._items.append(item)
+            wait = self._last_sent + self.window - time.monotonic()
+            full = wait <= 0 or len(self._items) >= self.max_items
+            if not full and self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        立即发送已收集的结果
+
+        Returns:
+            int: 发送的结果数
+        """
+        with self._lock:
+            items, self._items = self._items, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if items:
+                self._last_sent = time.monotonic()
+        if items:
+            try:
+                self.send(items)
+            except Exception as e:
+                logger.error(f"发送汇总通知失败: {e}")
+        return len(items)
+
+
+_shared_dispatcher = None
+_shared_digest = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_dispatcher():
+    """获取进程内共享的通知发送器，各推送渠道并发发送，共用一个连接池"""
+    global _shared_dispatcher
+    with _shared_lock:
+        if _shared_dispatcher is None:
+            _shared_dispatcher = NotificationDispatcher(workers=4)
+        return _shared_dispatcher
+
+
+def get_shared_digest(send, window=30, max_items=20):
+    """
+    获取进程内共享的通知汇总，同一进程内多个爬虫实例的结果合并发送
+
+    Args:
+        send: 发送函数，只在第一次调用时使用
+        window: 汇总时间窗口（秒）
+        max_items: 汇总数量上限
+
+    Returns:
+        DigestNotifier
+    """
+    global _shared_digest
+    with _shared_lock:
+        if _shared_digest is None:
+            _shared_digest = DigestNotifier(send, window, max_items)
+        return _shared_digest
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式读取网页 - 边接收边解码，供增量解析器使用，不必等整个页面下载完成
+"""
+
+import codecs
+
+from crawler.charset import SNIFF_BYTES, get_shared_resolver
+
+
+class PageStream:
+    """
+    流式网页读取器
+
+    编码依次取自响应头、网页开头的meta标签、同一主机上次识别的编码；
+    都没有时读完整个页面再检测编码，这种情况下不能提前开始解析
+    """
+
+    def __init__(self, response, chunk_size=16 * 1024, resolver=None):
+        """
+        Args:
+            response: 以stream=True发起的requests响应
+            chunk_size: 每次读取的字节数
+            resolver: 编码识别器（CharsetResolver），默认使用进程内共享的
+        """
+        self.response = response
+        self.chunk_size = chunk_size
+        self.resolver = resolver or get_shared_resolver()
+        self.encoding = None
+        self._chunks = []
+
+    @property
+    def content(self):
+        """已读取的原始字节，读取完成后为整个页面"""
+        return b''.join(self._chunks)
+
+    def __iter__(self):
+        """
+        逐块产出解码后的文本
+
+        Yields:
+            str: 文本块
+        """
+        raw = self.response.iter_content(chunk_size=self.chunk_size)
+        url = self.response.url
+
+        # 缓存开头的内容用于查找meta编码
+        pending = []
+        pending_size = 0
+        for chunk in raw:
+            self._chunks.append(chunk)
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= SNIFF_BYTES:
+                break
+        self.encoding = self.resolver.declared(url, self.response.headers, b''.join(pending))
+
+        if self.encoding is None:
+            # 无法确定编码，只能读完整个页面后检测
+            for chunk in raw:
+                self._chunks.append(chunk)
+            content = self.content
+            self.encoding = self.resolver.detect(url, content)
+            yield content.decode(self.encoding, errors='replace')
+            return
+
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        for chunk in pending:
+            yield decoder.decode(chunk)
+        for chunk in raw:
+            self._chunks.append(chunk)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    def close(self):
+        """关闭响应，释放连接"""
+        self.response.close()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帖子分页 - 从第一页的分页链接推算整个帖子的页数，生成其余各页的URL
+支持 read.php?tid=...&page=N（草榴）、forum.php?...&page=N 和 thread-TID-N-1.html（Discuz）
+"""
+
+import re
+from urllib.parse import urldefrag
+
+# 分页链接中的页码，第二个分组为页码
+PAGE_LINK_PATTERNS = (
+    re.compile(r'([?&]page=)(\d+)', re.IGNORECASE),
+    re.compile(r'(thread-\d+-)(\d+)(?=-\d+\.html)', re.IGNORECASE),
+)
+
+
+def is_page_link(url):
+    """是否为带页码的链接"""
+    return any(pattern.search(url) for pattern in PAGE_LINK_PATTERNS)
+
+
+def thread_page_urls(page_links, max_pages=50):
+    """
+    根据第一页中的分页链接生成第2页到最后一页的URL
+
+    分页链接按去掉页码后的URL分组，取页码最多的一组作为帖子的分页，
+    中间省略的页码也会补全
+
+    Args:
+        page_links: 第一页中带页码的链接（绝对URL）
+        max_pages: 最多抓取的页数（含第一页）
+
+    Returns:
+        list: 第2页起的URL列表，按页码顺序，没有分页返回空列表
+    """
+    groups = {}
+    for link in page_links:
+        link = urldefrag(link)[0]
+        for pattern in PAGE_LINK_PATTERNS:
+            match = pattern.search(link)
+            if match:
+                key = (link[:match.start(2)], link[match.end(2):])
+                groups.setdefault(key, set()).add(int(match.group(2)))
+                break
+    if not groups:
+        return []
+
+    (prefix, suffix), numbers = max(groups.items(), key=lambda item: (len(item[1]), max(item[1])))
+    last = min(max(numbers), max_pages)
+    return [f"{prefix}{number}{suffix}" for number in range(2, last + 1)]
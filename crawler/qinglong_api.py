@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+青龙面板开放API客户端 - 缓存访问令牌直到过期前，令牌失效（401）时刷新并重试一次
+多个线程同时需要刷新令牌时只发起一次 /open/auth/token 请求
+"""
+
+import time
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class QinglongAuthError(Exception):
+    """无法获取青龙面板访问令牌"""
+
+
+class QinglongClient:
+    """青龙面板开放API客户端"""
+
+    # 令牌在过期前多少秒视为已过期，提前刷新
+    EXPIRY_MARGIN = 60
+
+    # 响应中没有过期时间时令牌的缓存时间（秒）
+    DEFAULT_TTL = 86400
+
+    def __init__(self, base_url, client_id, client_secret, timeout=10, session=None):
+        """
+        Args:
+            base_url: 青龙面板地址，如 http://localhost:5700
+            client_id: 应用 Client ID
+            client_secret: 应用 Client Secret
+            timeout: 请求超时（秒）
+            session: requests会话，默认新建
+        """
+        self.base_url = base_url.rstrip('/')
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'token_requests': 0, 'cache_hits': 0, 'unauthorized': 0}
+
+    def get_token(self):
+        """
+        获取访问令牌，缓存未过期时直接返回
+
+        Returns:
+            str: 访问令牌
+
+        Raises:
+            QinglongAuthError: 获取令牌失败
+        """
+        token = self._cached_token()
+        if token:
+            return token
+        with self._lock:
+            # 等锁期间其他线程可能已经刷新
+            token = self._cached_token()
+            if token:
+                return token
+            return self._refresh()
+
+    def _cached_token(self):
+        if self._token and time.time() < self._expires_at - self.EXPIRY_MARGIN:
+            self._count('cache_hits')
+            return self._token
+        return None
+
+    def _refresh(self):
+        self._count('token_requests')
+        try:
+            response = self.session.post(
+                f"{self.base_url}/open/auth/token",
+                json={'client_id': self.client_id, 'client_secret': self.client_secret},
+                timeout=self.timeout
+            )
+            result = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError) as e:
+            raise QinglongAuthError(f"获取令牌异常: {e}") from e
+
+        data = result.get('data') or {}
+        token = data.get('token')
+        if not token:
+            raise QinglongAuthError(f"获取令牌失败: {response.text}")
+
+        # expiration 为令牌过期的Unix时间戳（秒）
+        expiration = data.get('expiration')
+        self._token = token
+        self._expires_at = float(expiration) if expiration else time.time() + self.DEFAULT_TTL
+        return token
+
+    def invalidate(self, token):
+        """
+        作废令牌；只有与当前缓存的令牌相同时才清除，避免并发请求重复刷新
+
+        Args:
+            token: 被拒绝的令牌
+        """
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = 0
+
+    def request(self, method, path, **kwargs):
+        """
+        带令牌的API请求，令牌被拒绝（401）时刷新令牌并重试一次
+
+        Args:
+            method: HTTP方法
+            path: API路径，如 /open/crons
+            **kwargs: 传给 session.request 的参数
+
+        Returns:
+            Response对象
+
+        Raises:
+            QinglongAuthError: 获取令牌失败
+        """
+        extra_headers = kwargs.pop('headers', None) or {}
+        for attempt in range(2):
+            token = self.get_token()
+            headers = dict(extra_headers, Authorization=f'Bearer {token}')
+            response = self.session.request(method, f"{self.base_url}{path}", headers=headers,
+                                            timeout=self.timeout, **kwargs)
+            if not self._is_unauthorized(response) or attempt:
+                return response
+            self._count('unauthorized')
+            logger.info("青龙面板令牌已失效，重新获取")
+            self.invalidate(token)
+        return response
+
+    @staticmethod
+    def _is_unauthorized(response):
+        if response.status_code == 401:
+            return True
+        # 部分版本以HTTP 200返回 {"code": 401}
+        try:
+            return response.status_code == 200 and response.json().get('code') == 401
+        except ValueError:
+            return False
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        """
+        获取令牌缓存统计
+
+        Returns:
+            dict: token_requests/cache_hits/unauthorized 次数
+        """
+        with self._stats_lock:
+            return dict(self._stats)
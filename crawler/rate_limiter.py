@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按主机限速的令牌桶调度器 - 进程内共享，替代固定的 time.sleep 延时
+收到429/503时只降低对应主机的速率，并遵守Retry-After
+"""
+
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+def parse_retry_after(value, default=None):
+    """
+    解析Retry-After响应头
+
+    Args:
+        value: 响应头的值（秒数或HTTP日期）
+        default: 无法解析时的返回值
+
+    Returns:
+        float: 需要等待的秒数
+    """
+    if not value:
+        return default
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return default
+
+
+def host_of(url):
+    """从URL中取出小写主机名，传入主机名时原样返回"""
+    if '://' not in url:
+        return url.lower()
+    return urlparse(url).netloc.lower()
+
+
+class TokenBucket:
+    """单个主机的令牌桶"""
+
+    def __init__(self, rate, burst):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now):
+        """取走一个令牌，返回需要等待的秒数（令牌允许透支，形成排队）"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+
+class HostRateLimiter:
+    """按主机限速的调度器"""
+
+    # 触发限速时的最低速率（请求/秒）
+    MIN_RATE = 0.1
+
+    def __init__(self, default_rate=4.0, burst=4, host_rates=None):
+        """
+        Args:
+            default_rate: 默认每个主机每秒请求数
+            burst: 令牌桶容量，允许的突发请求数
+            host_rates: 指定主机的速率 {主机名: 每秒请求数}
+        """
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.default_rate = default_rate
+        self.burst = burst
+        self.host_rates = {}
+        self.configure(default_rate, burst, host_rates)
+
+    def configure(self, default_rate=None, burst=None, host_rates=None):
+        """
+        更新速率配置，已存在的令牌桶按新配置调整
+
+        Args:
+            default_rate: 默认每个主机每秒请求数
+            burst: 令牌桶容量
+            host_rates: 指定主机的速率 {主机名: 每秒请求数}
+        """
+        with self._lock:
+            if default_rate is not None:
+                self.default_rate = max(self.MIN_RATE, float(default_rate))
+            if burst is not None:
+                self.burst = max(1, int(burst))
+            if host_rates is not None:
+                self.host_rates = {host.lower(): max(self.MIN_RATE, float(rate))
+                                   for host, rate in host_rates.items()}
+            for host, bucket in self._buckets.items():
+                bucket.base_rate = self._configured_rate(host)
+                bucket.rate = min(bucket.rate, bucket.base_rate)
+                bucket.burst = self.burst
+
+    def _configured_rate(self, host):
+        return self.host_rates.get(host, self.default_rate)
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self._configured_rate(host), self.burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    def reserve(self, url):
+        """
+        预约一次请求，不阻塞
+
+        Args:
+            url: 请求URL或主机名
+
+        Returns:
+            float: 调用方需要等待的秒数
+        """
+        host = host_of(url)
+        with self._lock:
+            return self._bucket(host).reserve(time.monotonic())
+
+    def acquire(self, url):
+        """阻塞直到允许向该主机发起请求"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, url, retry_after=None):
+        """
+        主机返回429/503时调用：速率减半，并在Retry-After期间暂停该主机
+
+        Args:
+            url: 请求URL或主机名
+            retry_after: 服务器要求等待的秒数
+        """
+        host = host_of(url)
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.rate = max(self.MIN_RATE, bucket.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / bucket.rate
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+
+    def record_success(self, url):
+        """请求成功时调用：被降速的主机逐步恢复到配置速率"""
+        host = host_of(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket and bucket.rate < bucket.base_rate:
+                bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate * 0.1)
+
+    def observe(self, url, status_code, headers=None):
+        """
+        根据响应状态码调整主机速率
+
+        Args:
+            url: 请求URL
+            status_code: HTTP状态码
+            headers: 响应头
+        """
+        if status_code in (429, 503):
+            retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+            self.penalize(url, retry_after)
+        elif status_code < 400:
+            self.record_success(url)
+
+    def get_rates(self):
+        """
+        获取各主机当前速率
+
+        Returns:
+            dict: {主机名: 每秒请求数}
+        """
+        with self._lock:
+            return {host: bucket.rate for host, bucket in self._buckets.items()}
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter():
+    """获取进程内共享的限速调度器"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostRateLimiter()
+        return _shared_limiter
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务结果记录 - 保存在定长的Redis Stream中（XADD MAXLEN ~），结果先在内存中缓冲，批量通过管道写入
+
+每条记录只保存扁平的摘要字段，字段集合固定，Redis会在同一节点内共享字段名，
+比原来每个任务一条完整JSON（任务+结果）的有序集合占用更少内存，且写入无需单独裁剪
+"""
+
+import threading
+
+# 记录的字段，顺序固定
+RESULT_FIELDS = ('url', 'source', 'status', 'retries', 'title', 'found', 'downloaded', 'skipped', 'save_path', 'message')
+
+
+class ResultLog:
+    """任务结果记录"""
+
+    def __init__(self, redis_client, key='bbs_crawler_result_log', maxlen=1000, flush_size=50):
+        """
+        Args:
+            redis_client: Redis客户端（decode_responses=True）
+            key: 结果流键名
+            maxlen: 大约保留的记录数
+            flush_size: 缓冲达到多少条时立即写入
+        """
+        self.redis = redis_client
+        self.key = key
+        self.maxlen = maxlen
+        self.flush_size = flush_size
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compact(task_data, result, status):
+        """
+        将任务和结果压缩为扁平记录
+
+        Returns:
+            dict: 字段固定的记录，值均为字符串
+        """
+        record = {
+            'url': task_data.get('url') or result.get('url') or '',
+            'source': task_data.get('source', 'unknown'),
+            'status': status,
+            'retries': task_data.get('retry_count', 0),
+            'title': result.get('title') or '',
+            'found': result.get('total_found', result.get('count', 0)),
+            'downloaded': result.get('downloaded', 0),
+            'skipped': result.get('skipped', 0),
+            'save_path': result.get('save_path') or '',
+            # 成功时的消息可由下载数和保存路径还原，只保存失败原因
+            'message': '' if status == 'success' else result.get('message', ''),
+        }
+        return {field: str(record[field]) for field in RESULT_FIELDS}
+
+    def record(self, task_data, result, status):
+        """
+        记录一个任务结果，缓冲满时写入
+
+        Args:
+            task_data: 任务数据
+            result: 爬取结果
+            status: success / failed / error
+        """
+        with self._lock:
+            self._buffer.append(self.compact(task_data, result, status))
+            full = len(self._buffer) >= self.flush_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        将缓冲的记录通过一次管道写入
+
+        Returns:
+            int: 写入的记录数
+        """
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return 0
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for record in records:
+                pipe.xadd(self.key, record, maxlen=self.maxlen, approximate=True)
+            pipe.execute()
+        except Exception:
+            # 写入失败时放回缓冲，下次重试
+            with self._lock:
+                self._buffer[:0] = records
+            raise
+        return len(records)
+
+    def pending(self):
+        """尚未写入的记录数"""
+        with self._lock:
+            return len(self._buffer)
+
+    def count(self):
+        """已保存的记录数"""
+        return self.redis.xlen(self.key)
+
+    def recent(self, count=20, status=None):
+        """
+        查询最近的任务结果
+
+        Args:
+            count: 最多返回的条数
+            status: 只返回该状态的结果，None表示全部
+
+        Returns:
+            list: 结果字典，最新的在前，completed_at 为毫秒时间戳（取自记录ID）
+        """
+        results = []
+        last_id = '+'
+        while len(results) < count:
+            entries = self.redis.xrevrange(self.key, max=last_id, count=count if status is None else count * 4)
+            if last_id != '+':
+                # 除第一批外，每批的第一条是上一批的最后一条
+                entries = entries[1:]
+            if not entries:
+                break
+            for entry_id, fields in entries:
+                if status is None or fields.get('status') == status:
+                    results.append(dict(fields, id=entry_id, completed_at=int(entry_id.split('-')[0])))
+            last_id = entries[-1][0]
+        return results[:count]
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一重试策略 - 单任务重试预算 + 按主机熔断
+替代 urllib3 Retry 与 _safe_request / _safe_image_request 中层层嵌套的重试循环
+"""
+
+import time
+import asyncio
+import threading
+
+import requests
+
+from crawler.rate_limiter import host_of
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class CircuitOpenError(Exception):
+    """主机已熔断，请求被直接拒绝"""
+
+
+class RetryBudget:
+    """单个任务的重试预算，多个下载线程共享"""
+
+    def __init__(self, retries=10):
+        """
+        Args:
+            retries: 整个任务允许的重试总次数
+        """
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """
+        消耗一次重试机会
+
+        Returns:
+            bool: 预算未用完返回True
+        """
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class CircuitBreaker:
+    """按主机的熔断器"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后多少秒允许一次试探请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def allow(self, url):
+        """
+        检查是否允许向该主机发起请求
+
+        Returns:
+            bool: 熔断中返回False；熔断超时后只放行一个试探请求
+        """
+        host = host_of(url)
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_timeout or host in self._probing:
+                return False
+            self._probing.add(host)
+            return True
+
+    def record_success(self, url):
+        """请求成功，关闭熔断"""
+        host = host_of(url)
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.discard(host)
+
+    def release(self, url):
+        """请求结束但结果不反映主机是否可用（如404、SSL降级），结束试探，熔断状态不变"""
+        host = host_of(url)
+        with self._lock:
+            self._probing.discard(host)
+
+    def record_failure(self, url):
+        """请求失败，连续失败达到阈值时熔断"""
+        host = host_of(url)
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._probing or self._failures[host] >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+            self._probing.discard(host)
+
+    def get_open_hosts(self):
+        """
+        获取当前熔断中的主机
+
+        Returns:
+            list: 主机名列表
+        """
+        with self._lock:
+            return list(self._opened_at)
+
+
+class RetryPolicy:
+    """统一重试策略"""
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=4, breaker=None):
+        """
+        Args:
+            max_attempts: 单个请求的最大尝试次数
+            backoff: 指数退避的初始等待时间（秒）
+            max_backoff: 单次退避的最长等待时间（秒）
+            breaker: 按主机的熔断器（CircuitBreaker）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        # SSL校验失败过的主机，后续请求直接不校验证书
+        self._insecure_hosts = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _status_of(exc):
+        """取出HTTP错误的状态码"""
+        response = getattr(exc, 'response', None)
+        if response is not None and getattr(response, 'status_code', None):
+            return response.status_code
+        if aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+            return exc.status
+        return None
+
+    @staticmethod
+    def _is_ssl_error(exc):
+        if isinstance(exc, requests.exceptions.SSLError):
+            return True
+        return aiohttp is not None and isinstance(exc, aiohttp.ClientSSLError)
+
+    def classify(self, exc):
+        """
+        判断异常类型
+
+        Returns:
+            tuple: (是否可重试, 是否计为主机故障)
+        """
+        status = self._status_of(exc)
+        if status is not None:
+            if status in (429, 503):
+                return True, False
+            if status >= 500:
+                return True, True
+            return False, False
+        if isinstance(exc, (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                            requests.exceptions.InvalidSchema)):
+            return False, False
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                            TimeoutError)):
+            return True, True
+        if aiohttp is not None and isinstance(exc, (aiohttp.ClientConnectionError,
+                                                    aiohttp.ClientPayloadError)):
+            return True, True
+        return False, False
+
+    def _before_attempt(self, url):
+        if not self.breaker.allow(url):
+            raise CircuitOpenError(f"主机已熔断，跳过请求: {host_of(url)}")
+        with self._lock:
+            return host_of(url) not in self._insecure_hosts
+
+    def _after_error(self, url, exc, attempt, budget):
+        """
+        处理一次失败
+
+        Returns:
+            float: 重试前需要等待的秒数；SSL降级为0
+        """
+        if self._is_ssl_error(exc):
+            with self._lock:
+                downgrade = host_of(url) not in self._insecure_hosts
+                self._insecure_hosts.add(host_of(url))
+            if downgrade:
+                # SSL校验失败时立即改为不校验证书，不计入主机故障
+                self.breaker.release(url)
+                return 0.0
+
+        retryable, host_failure = self.classify(exc)
+        if host_failure:
+            self.breaker.record_failure(url)
+        elif self._status_of(exc) is not None:
+            # 主机返回了HTTP响应（404、429等），说明主机可用
+            self.breaker.record_success(url)
+        else:
+            # 其他错误（无效URL等）不反映主机状态，只结束试探，避免主机一直处于试探中
+            self.breaker.release(url)
+        if not retryable or attempt >= self.max_attempts:
+            raise exc
+        if budget is not None and not budget.consume():
+            raise exc
+        return min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+
+    def call(self, url, func, budget=None):
+        """
+        按策略执行请求
+
+        Args:
+            url: 请求URL，用于熔断判断
+            func: 请求函数 func(verify) -> Response，失败时抛出异常
+            budget: 任务的重试预算（RetryBudget）
+
+        Returns:
+            func的返回值
+        """
+        attempt = 0
+        while True:
+            verify = self._before_attempt(url)
+            attempt += 1
+            try:
+                result = func(verify)
+            except Exception as e:
+                delay = self._after_error(url, e, attempt, budget)
+                if delay:
+                    time.sleep(delay)
+                continue
+            self.breaker.record_success(url)
+            return result
+
+    async def acall(self, url, func, budget=None):
+        """call 的asyncio版本，func(verify) 返回协程"""
+        attempt = 0
+        while True:
+            verify = self._before_attempt(url)
+            attempt += 1
+            try:
+                result = await func(verify)
+            except Exception as e:
+                delay = self._after_error(url, e, attempt, budget)
+                if delay:
+                    await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success(url)
+            return result
+
+
+_shared_breaker = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_breaker():
+    """获取进程内共享的熔断器"""
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker()
+        return _shared_breaker
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已下载图片索引 - 持久化记录 规范化图片URL -> 本地文件路径，
+重新爬取同一帖子时在发起任何网络请求前跳过已下载的图片
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from crawler.url_utils import normalize_url
+
+
+class SeenIndex:
+    """已下载图片索引（SQLite）"""
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: 索引数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # 其他进程（如多个队列处理器）同时写入时等待锁，而不是立即报 database is locked
+        self._db.execute('PRAGMA busy_timeout=5000')
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS images ('
+            ' key TEXT PRIMARY KEY, url TEXT, path TEXT, size INTEGER, digest TEXT, created REAL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS threads ('
+            ' key TEXT PRIMARY KEY, url TEXT, folder TEXT, updated REAL)'
+        )
+        self._db.commit()
+
+    def lookup(self, image_url):
+        """
+        查询图片是否已下载
+
+        Args:
+            image_url: 图片URL
+
+        Returns:
+            str: 本地文件路径，未下载或文件已被删除返回None
+        """
+        key = normalize_url(image_url)
+        with self._lock:
+            row = self._db.execute('SELECT path FROM images WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if os.path.exists(row[0]):
+                return row[0]
+            # 文件已被删除，清理过期记录
+            self._db.execute('DELETE FROM images WHERE key = ?', (key,))
+            self._db.commit()
+            return None
+
+    def record(self, image_url, path, digest=None):
+        """
+        记录已下载的图片
+
+        Args:
+            image_url: 图片URL
+            path: 本地文件路径
+            digest: 文件内容哈希
+        """
+        key = normalize_url(image_url)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)',
+                (key, image_url, path, size, digest, time.time())
+            )
+            self._db.commit()
+
+    def thread_folder(self, thread_url):
+        """
+        获取帖子上次使用的保存目录名
+
+        Args:
+            thread_url: 帖子URL
+
+        Returns:
+            str: 目录名，没有记录返回None
+        """
+        key = normalize_url(thread_url)
+        with self._lock:
+            row = self._db.execute('SELECT folder FROM threads WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_thread_folder(self, thread_url, folder):
+        """
+        记录帖子的保存目录名，重新爬取时沿用同一目录
+
+        Args:
+            thread_url: 帖子URL
+            folder: 目录名
+        """
+        key = normalize_url(thread_url)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO threads VALUES (?, ?, ?, ?)',
+                (key, thread_url, folder, time.time())
+            )
+            self._db.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._db.close()
+
+
+_shared_indexes = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_index(db_path):
+    """
+    获取进程内共享的已下载图片索引，同一数据库文件只打开一个连接，多个爬虫实例共用一把锁
+
+    Args:
+        db_path: 索引数据库文件路径
+
+    Returns:
+        SeenIndex对象
+    """
+    db_path = os.path.abspath(db_path)
+    with _shared_lock:
+        index = _shared_indexes.get(db_path)
+        if index is None:
+            index = _shared_indexes[db_path] = SeenIndex(db_path)
+        return index
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内共享的HTTP连接池 - 多个爬取任务复用同一个requests.Session，
+同一主机的TCP/TLS连接在任务之间保持，不必重复握手
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 模拟浏览器的默认请求头
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+class StatsHTTPAdapter(HTTPAdapter):
+    """可统计连接复用情况的HTTPAdapter，被替换后等进行中的请求结束再关闭"""
+
+    def __init__(self, *args, **kwargs):
+        self._state_lock = threading.Lock()
+        self._in_flight = 0
+        self._retiring = False
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        with self._state_lock:
+            self._in_flight += 1
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._state_lock:
+                self._in_flight -= 1
+                idle = self._retiring and self._in_flight == 0
+            if idle:
+                self.close()
+
+    def retire(self):
+        """不再用于新请求：没有进行中的请求时立即关闭，否则由最后一个请求结束时关闭"""
+        with self._state_lock:
+            self._retiring = True
+            idle = self._in_flight == 0
+        if idle:
+            self.close()
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._retired = {'requests': 0, 'connections': 0}
+        pools = self.poolmanager.pools
+        dispose = pools.dispose_func
+
+        def retire(pool):
+            # 主机连接池被淘汰前保留它的统计数据
+            self._retired['requests'] += pool.num_requests
+            self._retired['connections'] += pool.num_connections
+            if dispose:
+                dispose(pool)
+
+        pools.dispose_func = retire
+
+    def get_stats(self):
+        """
+        获取连接统计
+
+        Returns:
+            dict: requests为请求总数，connections为新建连接数，hosts为当前保持的主机连接池数
+        """
+        pools = self.poolmanager.pools
+        stats = dict(self._retired)
+        keys = pools.keys()
+        for key in keys:
+            pool = pools.get(key)
+            if pool is not None:
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+        stats['hosts'] = len(keys)
+        return stats
+
+
+class SessionPool:
+    """进程内共享的Session和连接池"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+        self._pool_size = 0
+        self._retired = {'requests': 0, 'connections': 0}
+
+    def get_session(self, pool_size=10):
+        """
+        获取共享Session，连接池不小于pool_size
+
+        Args:
+            pool_size: 需要的连接池大小（pool_connections/pool_maxsize），通常等于下载并发数
+
+        Returns:
+            requests.Session
+        """
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                self._session.headers.update(DEFAULT_HEADERS)
+            if pool_size > self._pool_size:
+                # 只在需要更大的连接池时重建，保留旧连接池的统计；
+                # 其他任务可能正在使用旧连接池，先挂载新的，旧的等进行中的请求结束再关闭
+                old_adapter = self._adapter
+                self._adapter = StatsHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                self._session.mount("http://", self._adapter)
+                self._session.mount("https://", self._adapter)
+                self._pool_size = pool_size
+                if old_adapter is not None:
+                    old_stats = old_adapter.get_stats()
+                    self._retired['requests'] += old_stats['requests']
+                    self._retired['connections'] += old_stats['connections']
+                    old_adapter.retire()
+            return self._session
+
+    def get_stats(self):
+        """
+        获取连接池命中统计
+
+        Returns:
+            dict: hits为复用已有连接的请求数，misses为新建连接数
+        """
+        with self._lock:
+            requests_total = self._retired['requests']
+            connections = self._retired['connections']
+            hosts = 0
+            if self._adapter is not None:
+                stats = self._adapter.get_stats()
+                requests_total += stats['requests']
+                connections += stats['connections']
+                hosts = stats['hosts']
+        return {
+            'requests': requests_total,
+            'hits': max(0, requests_total - connections),
+            'misses': connections,
+            'hosts': hosts,
+            'pool_size': self._pool_size,
+        }
+
+
+_shared_pool = SessionPool()
+
+
+def get_shared_session(pool_size=10):
+    """获取进程内共享的Session"""
+    return _shared_pool.get_session(pool_size)
+
+
+def get_pool_stats():
+    """获取进程内共享连接池的命中统计"""
+    return _shared_pool.get_stats()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可靠任务队列 - 任务被领取后直到处理完成才删除，工作线程崩溃时任务会交给其他工作线程；
+失败任务进入延迟队列，到期后批量放回，等待重试期间工作线程继续处理其他任务
+
+两种后端：
+- list:   Redis列表，任务领取时原子地移入工作线程自己的处理中列表，心跳过期的工作线程的任务由回收器放回
+- stream: Redis Streams消费者组，完成后XACK，超时未确认的任务由其他工作线程通过XAUTOCLAIM接管，适合多节点部署
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+import redis
+
+# 任务队列后端
+QUEUE_BACKENDS = ('list', 'stream')
+
+
+class _TaskQueue(ABC):
+    """任务队列公共部分：入队和延迟重试，子类实现 _push"""
+
+    def __init__(self, redis_client, queue_name, visibility_timeout=120):
+        """
+        Args:
+            redis_client: Redis客户端（decode_responses=True）
+            queue_name: 任务队列键名
+            visibility_timeout: 已领取的任务超过多少秒没有心跳视为工作线程已死亡
+        """
+        self.redis = redis_client
+        self.queue_name = queue_name
+        self.visibility_timeout = visibility_timeout
+        self.delayed_key = f"{queue_name}:delayed"
+
+    def push(self, task_json):
+        """任务入队"""
+        self.push_many([task_json])
+
+    def push_many(self, tasks):
+        """
+        批量入队，一次往返
+
+        Args:
+            tasks: 任务JSON列表
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        self._push(pipe, tasks)
+        pipe.execute()
+
+    @abstractmethod
+    def _push(self, pipe, tasks):
+        """在管道中加入入队命令"""
+
+    def schedule(self, task_json, delay):
+        """
+        任务延迟一段时间后重新入队
+
+        Args:
+            task_json: 任务JSON
+            delay: 延迟秒数
+        """
+        self.redis.zadd(self.delayed_key, {task_json: time.time() + delay})
+
+    def promote_due(self, batch_size=100):
+        """
+        将到期的延迟任务批量放回队列，多个进程同时执行时每个任务只会放回一次
+
+        Args:
+            batch_size: 每次最多放回的任务数
+
+        Returns:
+            int: 放回的任务数
+        """
+        def move(pipe):
+            due = pipe.zrangebyscore(self.delayed_key, '-inf', time.time(), start=0, num=batch_size)
+            pipe.multi()
+            if due:
+                pipe.zrem(self.delayed_key, *due)
+                self._push(pipe, due)
+            return len(due)
+
+        # WATCH延迟队列，其他进程同时放回时事务失败并自动重试
+        return self.redis.transaction(move, self.delayed_key, value_from_callable=True)
+
+    def push_from(self, zset_key, make_task):
+        """
+        原子地取出有序集合中分数最高的成员并作为任务入队，中途崩溃不会丢失成员
+
+        Args:
+            zset_key: 有序集合键名（如待爬队列）
+            make_task: 将成员转换为任务JSON的函数
+
+        Returns:
+            str: 入队的成员，有序集合为空返回None
+        """
+        def move(pipe):
+            top = pipe.zrevrange(zset_key, 0, 0)
+            pipe.multi()
+            if top:
+                pipe.zrem(zset_key, top[0])
+                self._push(pipe, [make_task(top[0])])
+            return top[0] if top else None
+
+        # WATCH有序集合，多个工作线程同时取出时事务失败并自动重试，每个成员只入队一次
+        return self.redis.transaction(move, zset_key, value_from_callable=True)
+
+    def delayed_count(self):
+        """等待重试的任务数"""
+        return self.redis.zcard(self.delayed_key)
+
+
+class ReliableQueue(_TaskQueue):
+    """
+    基于Redis列表的可靠队列
+
+    - <queue>                       任务队列（lpush入队，从右侧取出）
+    - <queue>:processing:<worker>   工作线程的处理中列表
+    - <queue>:heartbeat:<worker>    工作线程心跳，过期时间为可见性超时
+    - <queue>:workers               已注册的工作线程集合
+    - <queue>:delayed               延迟重试的任务，有序集合，分数为到期时间
+    """
+
+    def __init__(self, redis_client, queue_name, visibility_timeout=120):
+        super().__init__(redis_client, queue_name, visibility_timeout)
+        self.workers_key = f"{queue_name}:workers"
+
+    def processing_key(self, worker_id):
+        """工作线程的处理中列表键名"""
+        return f"{self.queue_name}:processing:{worker_id}"
+
+    def heartbeat_key(self, worker_id):
+        """工作线程的心跳键名"""
+        return f"{self.queue_name}:heartbeat:{worker_id}"
+
+    def _push(self, pipe, tasks):
+        pipe.lpush(self.queue_name, *tasks)
+
+    def register(self, worker_id):
+        """注册工作线程并发送第一次心跳"""
+        self.redis.sadd(self.workers_key, worker_id)
+        self.heartbeat(worker_id)
+
+    def heartbeat(self, *worker_ids):
+        """
+        更新工作线程心跳
+
+        Args:
+            *worker_ids: 工作线程ID，同一进程的多个工作线程在一次往返中更新
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.set(self.heartbeat_key(worker_id), int(time.time()), ex=self.visibility_timeout)
+        pipe.execute()
+
+    def claim(self, worker_id, timeout=5):
+        """
+        阻塞取出一个任务，原子地移入工作线程的处理中列表
+
+        Args:
+            worker_id: 工作线程ID
+            timeout: 阻塞等待的秒数
+
+        Returns:
+            tuple: (任务ID, 任务JSON)，列表后端的任务ID即任务JSON；超时返回None
+        """
+        task_json = self.redis.blmove(self.queue_name, self.processing_key(worker_id), timeout, 'RIGHT', 'LEFT')
+        return (task_json, task_json) if task_json is not None else None
+
+    def ack(self, worker_id, task_id):
+        """任务处理完成，从处理中列表删除"""
+        self.redis.lrem(self.processing_key(worker_id), 1, task_id)
+
+    def requeue(self, worker_id):
+        """
+        将工作线程处理中列表的任务全部放回队列头部，优先处理
+
+        Returns:
+            int: 放回的任务数
+        """
+        processing_key = self.processing_key(worker_id)
+        count = 0
+        while self.redis.lmove(processing_key, self.queue_name, 'RIGHT', 'RIGHT') is not None:
+            count += 1
+        return count
+
+    def release(self, worker_id):
+        """
+        工作线程正常退出：放回未完成的任务并注销
+
+        Returns:
+            int: 放回的任务数
+        """
+        count = self.requeue(worker_id)
+        self.redis.delete(self.heartbeat_key(worker_id))
+        self.redis.srem(self.workers_key, worker_id)
+        return count
+
+    def reap(self):
+        """
+        回收心跳过期的工作线程的任务，多个进程同时回收也不会重复放回
+
+        Returns:
+            int: 放回的任务数
+        """
+        worker_ids = list(self.redis.smembers(self.workers_key))
+        if not worker_ids:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.exists(self.heartbeat_key(worker_id))
+        alive = pipe.execute()
+
+        count = 0
+        for worker_id, is_alive in zip(worker_ids, alive):
+            if not is_alive:
+                count += self.requeue(worker_id)
+                self.redis.srem(self.workers_key, worker_id)
+        return count
+
+    def length(self):
+        """等待处理的任务数"""
+        return self.redis.llen(self.queue_name)
+
+    def peek(self, count=10):
+        """最近入队的任务JSON"""
+        return self.redis.lrange(self.queue_name, 0, count - 1)
+
+    def clear(self):
+        """
+        清空队列和等待重试的任务
+
+        Returns:
+            int: 删除的键数
+        """
+        return self.redis.delete(self.queue_name, self.delayed_key)
+
+    def live_workers(self):
+        """心跳未过期的工作线程数"""
+        worker_ids = list(self.redis.smembers(self.workers_key))
+        if not worker_ids:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.exists(self.heartbeat_key(worker_id))
+        return sum(pipe.execute())
+
+    def processing_count(self):
+        """所有工作线程处理中的任务数"""
+        worker_ids = list(self.redis.smembers(self.workers_key))
+        if not worker_ids:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for worker_id in worker_ids:
+            pipe.llen(self.processing_key(worker_id))
+        return sum(pipe.execute())
+
+
+class StreamQueue(_TaskQueue):
+    """
+    基于Redis Streams消费者组的可靠队列（需要Redis 6.2+）
+
+    - <stream>           任务流，每条消息的task字段为任务JSON，确认后删除
+    - <stream>:delayed   延迟重试的任务，有序集合，分数为到期时间
+
+    每个工作线程是消费者组中的一个消费者；处理中的消息定期重新认领以刷新空闲时间（心跳），
+    空闲超过可见性超时的消息视为工作线程已死亡，由其他工作线程领取
+    """
+
+    def __init__(self, redis_client, stream_name, group='bbs_crawler_workers', visibility_timeout=120):
+        """
+        Args:
+            redis_client: Redis客户端（decode_responses=True）
+            stream_name: 任务流键名
+            group: 消费者组名
+            visibility_timeout: 已领取的消息超过多少秒没有心跳视为工作线程已死亡
+        """
+        super().__init__(redis_client, stream_name, visibility_timeout)
+        self.group = group
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.redis.xgroup_create(self.queue_name, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def _push(self, pipe, tasks):
+        for task_json in tasks:
+            pipe.xadd(self.queue_name, {'task': task_json})
+
+    def register(self, worker_id):
+        """创建消费者组，消费者在第一次读取时自动创建"""
+        self._ensure_group()
+
+    def heartbeat(self, *worker_ids):
+        """
+        重新认领工作线程处理中的消息，刷新空闲时间
+
+        Args:
+            *worker_ids: 工作线程（消费者）名称
+        """
+        for worker_id in worker_ids:
+            pending = self.redis.xpending_range(self.queue_name, self.group, '-', '+', 100, consumername=worker_id)
+            if pending:
+                message_ids = [entry['message_id'] for entry in pending]
+                self.redis.xclaim(self.queue_name, self.group, worker_id, 0, message_ids, justid=True)
+
+    def claim(self, worker_id, timeout=5):
+        """
+        领取一个任务：优先接管空闲超时的消息，没有时阻塞读取新消息
+
+        Args:
+            worker_id: 工作线程（消费者）名称
+            timeout: 阻塞等待的秒数
+
+        Returns:
+            tuple: (消息ID, 任务JSON)，超时返回None
+        """
+        self._ensure_group()
+        _, messages, *_ = self.redis.xautoclaim(
+            self.queue_name, self.group, worker_id, self.visibility_timeout * 1000, start_id='0-0', count=1
+        )
+        if not messages:
+            result = self.redis.xreadgroup(self.group, worker_id, {self.queue_name: '>'}, count=1,
+                                           block=int(timeout * 1000))
+            messages = result[0][1] if result else []
+        for message_id, fields in messages:
+            if fields:
+                return message_id, fields.get('task')
+            # 消息已被删除（如清空队列），只需确认
+            self.redis.xack(self.queue_name, self.group, message_id)
+        return None
+
+    def ack(self, worker_id, task_id):
+        """确认消息并从流中删除"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xack(self.queue_name, self.group, task_id)
+        pipe.xdel(self.queue_name, task_id)
+        pipe.execute()
+
+    def release(self, worker_id):
+        """
+        工作线程正常退出：没有未确认的消息时删除消费者；
+        有未确认的消息时保留，空闲超时后由其他工作线程接管
+
+        Returns:
+            int: 放回的任务数，流后端始终为0
+        """
+        pending = self.redis.xpending_range(self.queue_name, self.group, '-', '+', 1, consumername=worker_id)
+        if not pending:
+            self.redis.xgroup_delconsumer(self.queue_name, self.group, worker_id)
+        return 0
+
+    def reap(self):
+        """
+        空闲超时的消息在领取任务时通过XAUTOCLAIM接管，这里只删除已死亡且没有未确认消息的消费者
+
+        Returns:
+            int: 放回的任务数，流后端始终为0
+        """
+        self._ensure_group()
+        for consumer in self.redis.xinfo_consumers(self.queue_name, self.group):
+            if consumer['pending'] == 0 and consumer['idle'] >= self.visibility_timeout * 1000:
+                self.redis.xgroup_delconsumer(self.queue_name, self.group, consumer['name'])
+        return 0
+
+    def length(self):
+        """等待处理的任务数（已领取未确认的消息不计）"""
+        self._ensure_group()
+        return self.redis.xlen(self.queue_name) - self.processing_count()
+
+    def peek(self, count=10):
+        """最近入队的任务JSON"""
+        return [fields.get('task') for _, fields in self.redis.xrevrange(self.queue_name, count=count)]
+
+    def clear(self):
+        """
+        清空任务流（保留消费者组）和等待重试的任务
+
+        Returns:
+            int: 删除的消息数
+        """
+        self._ensure_group()
+        cleared = self.redis.xtrim(self.queue_name, maxlen=0)
+        self.redis.delete(self.delayed_key)
+        return cleared
+
+    def live_workers(self):
+        """最近一个可见性超时内活动过的消费者数"""
+        self._ensure_group()
+        consumers = self.redis.xinfo_consumers(self.queue_name, self.group)
+        return sum(1 for consumer in consumers if consumer['idle'] < self.visibility_timeout * 1000)
+
+    def processing_count(self):
+        """已领取但尚未确认的消息数"""
+        self._ensure_group()
+        return self.redis.xpending(self.queue_name, self.group)['pending']
+
+
+def create_task_queue(redis_client, backend='list', queue_name='bbs_crawler_queue',
+                      stream_name='bbs_crawler_stream', group='bbs_crawler_workers', visibility_timeout=120):
+    """
+    按配置创建任务队列，队列处理器和Webhook服务使用同一配置
+
+    Args:
+        redis_client: Redis客户端
+        backend: 队列后端，list 或 stream
+        queue_name: 列表后端的队列键名
+        stream_name: 流后端的任务流键名
+        group: 流后端的消费者组名
+        visibility_timeout: 可见性超时（秒）
+
+    Returns:
+        ReliableQueue 或 StreamQueue
+    """
+    if backend == 'stream':
+        return StreamQueue(redis_client, stream_name, group, visibility_timeout)
+    if backend != 'list':
+        raise ValueError(f"未知的任务队列后端: {backend}，可选 {', '.join(QUEUE_BACKENDS)}")
+    return ReliableQueue(redis_client, queue_name, visibility_timeout)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务登记 - 入队前按规范化URL去重，同一帖子在排队、处理中或刚完成时再次提交，
+直接返回已有任务的状态，不重复入队
+
+- <prefix>:url:<digest>   规范化URL -> 任务ID（SET NX EX），存在即视为重复提交
+- <prefix>:<task_id>      任务状态哈希表：url、status、source、submitted_at、updated_at、duplicates
+"""
+
+import time
+import uuid
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from crawler.url_utils import normalize_url
+
+# 任务状态
+PENDING = 'pending'
+PROCESSING = 'processing'
+RETRYING = 'retrying'
+SUCCESS = 'success'
+FAILED = 'failed'
+
+
+def dedupe_key(url):
+    """
+    去重用的URL：在 normalize_url 基础上忽略协议和 utm_* 跟踪参数，
+    同一帖子从不同设备分享时得到相同的键
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 去重键
+    """
+    parts = urlsplit(normalize_url(url))
+    query = urlencode([(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not name.lower().startswith('utm_')])
+    return urlunsplit(('', parts.netloc, parts.path, query, ''))
+
+
+class TaskRegistry:
+    """基于Redis的任务登记与去重"""
+
+    def __init__(self, redis_client, prefix='bbs_crawler_task', in_flight_ttl=86400, done_ttl=3600):
+        """
+        Args:
+            redis_client: Redis客户端（decode_responses=True）
+            prefix: 键名前缀
+            in_flight_ttl: 排队和处理中的任务的去重有效期（秒），防止任务丢失后URL永远无法再提交
+            done_ttl: 成功完成后多久内仍视为重复提交（秒）
+        """
+        self.redis = redis_client
+        self.prefix = prefix
+        self.in_flight_ttl = in_flight_ttl
+        self.done_ttl = done_ttl
+
+    def _url_key(self, url):
+        digest = hashlib.sha1(dedupe_key(url).encode('utf-8')).hexdigest()
+        return f"{self.prefix}:url:{digest}"
+
+    def _task_key(self, task_id):
+        return f"{self.prefix}:{task_id}"
+
+    def register(self, url, source='webhook'):
+        """
+        登记任务，同一URL已有未过期的任务时返回已有任务
+
+        Args:
+            url: 任务URL
+            source: 提交来源
+
+        Returns:
+            tuple: (task_id, created, status)，created为False表示重复提交，status为任务状态字典
+        """
+        return self.register_many([url], source)[0]
+
+    def register_many(self, urls, source='webhook'):
+        """
+        批量登记任务，固定几次管道往返，与URL数量无关；同一批中重复的URL也视为重复提交
+
+        Args:
+            urls: 任务URL列表
+            source: 提交来源
+
+        Returns:
+            list: 与urls一一对应的 (task_id, created, status)
+        """
+        url_keys = [self._url_key(url) for url in urls]
+        task_ids = [uuid.uuid4().hex[:16] for _ in urls]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for url_key, task_id in zip(url_keys, task_ids):
+            pipe.set(url_key, task_id, nx=True, ex=self.in_flight_ttl)
+        created = pipe.execute()
+
+        # 重复提交：查出已有任务ID
+        pipe = self.redis.pipeline(transaction=False)
+        for url_key, is_new in zip(url_keys, created):
+            if not is_new:
+                pipe.get(url_key)
+        existing_ids = iter(pipe.execute())
+
+        now = int(time.time())
+        results = [None] * len(urls)
+        # 重复提交的结果索引 -> (已有任务ID, HGETALL在第三次管道回复中的位置)
+        lookups = {}
+        # 已有任务恰好过期的结果索引，重新登记
+        expired = []
+        pipe = self.redis.pipeline(transaction=False)
+        for index, (url, task_id, is_new) in enumerate(zip(urls, task_ids, created)):
+            if is_new:
+                status = {
+                    'task_id': task_id,
+                    'url': url,
+                    'status': PENDING,
+                    'source': source,
+                    'submitted_at': now,
+                    'updated_at': now,
+                    'duplicates': 0,
+                }
+                pipe.hset(self._task_key(task_id), mapping=status)
+                pipe.expire(self._task_key(task_id), self.in_flight_ttl)
+                results[index] = (task_id, True, status)
+                continue
+            existing_id = next(existing_ids)
+            if existing_id is None:
+                expired.append(index)
+                continue
+            pipe.hincrby(self._task_key(existing_id), 'duplicates', 1)
+            lookups[index] = (existing_id, len(pipe))
+            pipe.hgetall(self._task_key(existing_id))
+        replies = pipe.execute()
+
+        for index, (existing_id, position) in lookups.items():
+            status = replies[position]
+            status['task_id'] = existing_id
+            results[index] = (existing_id, False, status)
+        if expired:
+            for index, result in zip(expired, self.register_many([urls[i] for i in expired], source)):
+                results[index] = result
+        return results
+
+    def update(self, task_id, status, url=None, **fields):
+        """
+        更新任务状态；成功的任务在 done_ttl 内仍然去重，失败的任务立即允许重新提交
+
+        Args:
+            task_id: 任务ID
+            status: 新状态
+            url: 任务URL，完成时用于更新去重键
+            **fields: 其他要记录的字段（如 message、downloaded）
+        """
+        task_key = self._task_key(task_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(task_key, mapping=dict(fields, status=status, updated_at=int(time.time())))
+        if status in (SUCCESS, FAILED):
+            pipe.expire(task_key, self.done_ttl)
+            if url:
+                if status == SUCCESS:
+                    pipe.expire(self._url_key(url), self.done_ttl)
+                else:
+                    pipe.delete(self._url_key(url))
+        else:
+            # 状态哈希已过期时HSET会重新创建，重新设置有效期避免它永久保留
+            pipe.expire(task_key, self.in_flight_ttl)
+        pipe.execute()
+
+    def get(self, task_id):
+        """
+        查询任务状态
+
+        Returns:
+            dict: 任务状态，不存在或已过期返回None
+        """
+        status = self.redis.hgetall(self._task_key(task_id))
+        if not status:
+            return None
+        status['task_id'] = task_id
+        return status
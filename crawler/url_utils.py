@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URL工具函数
+"""
+
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+def normalize_url(url):
+    """
+    规范化URL，用作缓存和去重的键
+    协议和主机名转小写，去掉默认端口和片段，查询参数按名称排序
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
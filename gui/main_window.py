@@ -14,6 +14,7 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt5.QtGui import QPixmap, QFont, QColor
 from crawler.image_crawler import ImageCrawler
+from crawler.session_pool import get_pool_stats
 from utils.file_manager import FileManager
 from utils.config_manager import ConfigManager
 from queue import Queue
@@ -30,13 +31,29 @@ class CrawlerThread(QThread):
         self.url = url
         self.save_path = save_path
         self.config_manager = config_manager
-        self.crawler = ImageCrawler()
+        self.crawler = ImageCrawler(
+            max_workers=config_manager.get_max_workers(),
+            per_host_limit=config_manager.get_per_host_concurrency(),
+            host_rate=config_manager.get_host_rate(),
+            host_rates=config_manager.get_host_rates(),
+            engine=config_manager.get_fetch_engine(),
+            http_cache_dir=config_manager.get_http_cache_dir(),
+            http_cache_mb=config_manager.get_http_cache_mb(),
+            content_dedupe=config_manager.get_content_dedupe(),
+            content_selector=config_manager.get_content_selector(),
+            streaming=config_manager.get_streaming_parse(),
+            paginate=config_manager.get_paginate(),
+            max_pages=config_manager.get_max_pages(),
+        )
         
     def run(self):
         """运行爬虫"""
         try:
             self.progress_updated.emit(f"开始处理: {self.url}")
             images = self.crawler.crawl_images(self.url, self.save_path, self.progress_callback)
+            stats = get_pool_stats()
+            self.progress_updated.emit(
+                f"连接池: 复用 {stats['hits']} 次, 新建连接 {stats['misses']} 个, 保持主机 {stats['hosts']} 个")
             self.finished_signal.emit(True, f"成功下载 {len(images)} 张图片", self.url)
         except Exception as e:
             self.finished_signal.emit(False, f"爬取失败: {str(e)}", self.url)
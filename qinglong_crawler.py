@@ -7,17 +7,16 @@
 
 import os
 import sys
+import signal
+import shutil
+import itertools
 import json
 import time
-import requests
 from datetime import datetime
 import re
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse, quote
 import logging
 import urllib3
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -25,34 +24,67 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # 添加项目路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from crawler.async_engine import AsyncFetchEngine, get_fetch_engine_name
+from crawler.rate_limiter import get_shared_limiter
+from crawler.charset import get_shared_resolver
+from crawler.session_pool import get_shared_session
+from crawler.http_cache import HttpCache, PageResponse, get_shared_cache
+from crawler.seen_index import get_shared_index
+from crawler.extractor import extract_page, DEFAULT_CONTENT_SELECTOR
+from crawler.pagination import thread_page_urls
+from crawler.download_pool import DownloadPool
+from crawler.url_utils import normalize_url
+from crawler.blob_store import get_shared_store, FileWriter
+from crawler.retry_policy import RetryPolicy, RetryBudget, get_shared_breaker
+from crawler.notifier import get_shared_dispatcher, get_shared_digest
+from crawler.crawl_daemon import CrawlDaemon, DEFAULT_ADDR
+
 class QinglongCrawler:
     """青龙面板版爬虫"""
     
     def __init__(self):
         self.setup_logging()
         self.load_config()
-        self.session = requests.Session()
-        
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+        # 进程内共享的Session，同一进程内的多个任务复用连接
+        self.session = get_shared_session(self.config['PER_HOST_LIMIT'])
+        
+        # 进程内共享的网页编码识别器，记住每个主机的编码
+        self.charset_resolver = get_shared_resolver()
+        # 进程内共享的按主机限速调度器
+        self.rate_limiter = get_shared_limiter()
+        self.rate_limiter.configure(
+            default_rate=self.config['HOST_RATE'],
+            burst=self.config['HOST_BURST'],
+            host_rates=self.config['HOST_RATES'],
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # 统一重试策略：单任务重试预算 + 进程内共享的按主机熔断器
+        self.retry_policy = RetryPolicy(max_attempts=self.config['MAX_ATTEMPTS'], breaker=get_shared_breaker())
+        self._retry_budget = None
+        # 连接超时较短，失效主机可以尽快触发熔断
+        self.timeout = (min(5, self.config['TIMEOUT']), self.config['TIMEOUT'])
+        
+        # 进程内共享的已下载图片索引，重新爬取时跳过已下载的图片
+        self._seen_index = get_shared_index(os.path.join(self.config['SAVE_PATH'], '.seen_index.db'))
+        self._seen_hits = set()
+        # 无扩展名的图片按时间戳生成文件名，并发下载时追加计数避免重名
+        self._name_counter = itertools.count()
+        
+        # 分页模式下并行获取帖子分页
+        self.page_pool = DownloadPool(self.config['PER_HOST_LIMIT'], self.config['PER_HOST_LIMIT'])
+        
+        # 进程内共享的内容寻址存储，相同图片只保存一份，帖子目录中为硬链接
+        self._blob_store = get_shared_store(self.config['SAVE_PATH']) if self.config['CONTENT_DEDUPE'] else None
+        
+        # 进程内共享的帖子页面磁盘HTTP缓存
+        self.http_cache = None
+        if self.config['HTTP_CACHE_MB'] > 0:
+            self.http_cache = get_shared_cache(self.config['HTTP_CACHE_DIR'], self.config['HTTP_CACHE_MB'] * 1024 * 1024)
         
-        # 设置请求头，模拟浏览器
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        # 通知：各渠道由共享的后台发送器并发发送，多个任务的结果按时间窗口汇总
+        self.notifier = get_shared_dispatcher()
+        self.digest = get_shared_digest(self.send_digest, self.config['NOTIFY_DIGEST_WINDOW'],
+                                        self.config['NOTIFY_DIGEST_MAX'])
         
         # 支持的图片格式
         self.image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'}
@@ -80,12 +112,43 @@ class QinglongCrawler:
             'MAX_IMAGES': int(os.getenv('BBS_MAX_IMAGES', '50')),
             'TIMEOUT': int(os.getenv('BBS_TIMEOUT', '30')),
             
+            # 抓取引擎配置
+            'FETCH_ENGINE': get_fetch_engine_name(),
+            'ASYNC_LIMIT': int(os.getenv('BBS_ASYNC_LIMIT', '200')),
+            'PER_HOST_LIMIT': int(os.getenv('BBS_PER_HOST_LIMIT', '8')),
+            
+            # 按主机限速配置，BBS_HOST_RATES 为JSON，如 {"img.example.com": 2}
+            'HOST_RATE': float(os.getenv('BBS_HOST_RATE', '4')),
+            'HOST_BURST': int(os.getenv('BBS_HOST_BURST', '4')),
+            'HOST_RATES': json.loads(os.getenv('BBS_HOST_RATES', '') or '{}'),
+            
+            # 重试与熔断配置
+            'MAX_ATTEMPTS': int(os.getenv('BBS_MAX_ATTEMPTS', '3')),
+            'RETRY_BUDGET': int(os.getenv('BBS_RETRY_BUDGET', '10')),
+            
+            # 帖子页面HTTP缓存配置，BBS_HTTP_CACHE_MB=0 时关闭
+            'HTTP_CACHE_DIR': os.getenv('BBS_HTTP_CACHE_DIR', ''),
+            'HTTP_CACHE_MB': int(os.getenv('BBS_HTTP_CACHE_MB', '200')),
+            
+            # 内容寻址存储（硬链接去重），BBS_CONTENT_DEDUPE=0 时关闭
+            'CONTENT_DEDUPE': os.getenv('BBS_CONTENT_DEDUPE', '1') == '1',
+            
+            # 帖子正文区域选择器（逗号分隔），设为空字符串时解析整个页面
+            'CONTENT_SELECTOR': os.getenv('BBS_CONTENT_SELECTOR', DEFAULT_CONTENT_SELECTOR),
+            
+            # 分页模式：从第一页找出帖子的其余分页并行获取，BBS_PAGINATE=1 时开启
+            'PAGINATE': os.getenv('BBS_PAGINATE', '0') == '1',
+            'MAX_PAGES': int(os.getenv('BBS_MAX_PAGES', '50')),
+            
             # 消息推送配置
             'PUSH_PLUS_TOKEN': os.getenv('PUSH_PLUS_TOKEN', ''),
             'BARK_URL': os.getenv('BARK_URL', ''),
             'TELEGRAM_BOT_TOKEN': os.getenv('TELEGRAM_BOT_TOKEN', ''),
             'TELEGRAM_CHAT_ID': os.getenv('TELEGRAM_CHAT_ID', ''),
             'DINGTALK_WEBHOOK': os.getenv('DINGTALK_WEBHOOK', ''),
+            # 通知汇总：发送后多少秒内的结果合并为一条（0为每个任务单独通知）和单条通知最多包含的任务数
+            'NOTIFY_DIGEST_WINDOW': int(os.getenv('NOTIFY_DIGEST_WINDOW', '30')),
+            'NOTIFY_DIGEST_MAX': int(os.getenv('NOTIFY_DIGEST_MAX', '20')),
             
             # 云存储配置
             'ALIYUN_OSS_ENDPOINT': os.getenv('ALIYUN_OSS_ENDPOINT', ''),
@@ -97,66 +160,93 @@ class QinglongCrawler:
             'REDIS_HOST': os.getenv('REDIS_HOST', ''),
             'REDIS_PORT': int(os.getenv('REDIS_PORT', '6379')),
             'REDIS_PASSWORD': os.getenv('REDIS_PASSWORD', ''),
+            
+            # 常驻模式配置：监听地址（建议只监听本机）、工作线程数
+            'DAEMON_ADDR': os.getenv('BBS_DAEMON_ADDR', DEFAULT_ADDR),
+            'DAEMON_WORKERS': int(os.getenv('BBS_DAEMON_WORKERS', '2')),
         }
         
         # 创建保存目录
         os.makedirs(self.config['SAVE_PATH'], exist_ok=True)
         
+        # HTTP缓存默认放在保存目录下
+        if not self.config['HTTP_CACHE_DIR']:
+            self.config['HTTP_CACHE_DIR'] = os.path.join(self.config['SAVE_PATH'], '.http_cache')
+        
     def crawl_images(self, url):
         """爬取图片"""
         self.logger.info(f"开始爬取: {url}")
         downloaded_images = []
+        # 每个任务使用独立的重试预算
+        self._retry_budget = RetryBudget(self.config['RETRY_BUDGET'])
+        self._seen_hits = set()
         
         try:
             self.logger.info("正在获取网页内容...")
             
-            # 获取网页内容，使用安全请求方法
-            response = self._safe_request(url)
-            
-            self.logger.info("正在解析网页...")
-            
-            # 解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            title = self.get_page_title(soup, url)
-            
-            # 查找所有图片链接，使用改进的提取方法
-            image_urls = self._extract_image_urls(soup, url, response.text)
-            
-            if not image_urls:
-                self.logger.warning("未找到图片链接")
-                return {'success': False, 'message': '未找到图片', 'count': 0}
-            
-            self.logger.info(f"找到 {len(image_urls)} 个图片链接，开始下载...")
-            
-            # 限制图片数量
-            if len(image_urls) > self.config['MAX_IMAGES']:
-                image_urls = image_urls[:self.config['MAX_IMAGES']]
-                self.logger.info(f"图片数量超限，只下载前{self.config['MAX_IMAGES']}张")
-            
-            # 创建保存目录 - 使用改进的文件夹名生成
-            folder_name = self._generate_folder_name(soup, url)
-            save_dir = os.path.join(self.config['SAVE_PATH'], folder_name)
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # 下载图片
-            for i, img_url in enumerate(image_urls, 1):
-                try:
-                    self.logger.info(f"正在下载第 {i}/{len(image_urls)} 张图片: {img_url}")
-                    
-                    image_path = self._download_image(img_url, save_dir)
+            # 有缓存时发送条件请求，页面未修改只需一次很小的往返
+            cached = self.http_cache.get(url) if self.http_cache else None
+            page_headers = HttpCache.conditional_headers(cached)
+            
+            if self._use_async_engine():
+                # asyncio引擎：页面和图片在同一个事件循环中获取
+                engine = AsyncFetchEngine(
+                    self.session.headers,
+                    timeout=self.config['TIMEOUT'],
+                    limit=self.config['ASYNC_LIMIT'],
+                    limit_per_host=self.config['PER_HOST_LIMIT'],
+                    rate_limiter=self.rate_limiter,
+                    retry_policy=self.retry_policy,
+                    retry_budget=self._retry_budget,
+                )
+                prepared, results = engine.crawl(
+                    url,
+                    lambda page: self._prepare_download(url, page, cached),
+                    (self._lookup_seen, self._resolve_image_path,
+                     self._open_image_writer, self._finalize_image),
+                    self._log_image_result,
+                    page_headers=page_headers,
+                )
+                if not prepared:
+                    return {'success': False, 'message': '未找到图片', 'count': 0}
+                
+                image_urls, save_dir, title = prepared
+                for img_url, image_path in zip(image_urls, results):
                     if image_path:
                         downloaded_images.append(image_path)
-                        self.logger.info(f"已下载: {os.path.basename(image_path)}")
+                        # 上传到云存储（如果配置了），已下载过的图片不重复上传
+                        if img_url not in self._seen_hits:
+                            self.upload_to_cloud(image_path, os.path.basename(image_path))
+            else:
+                # 获取网页内容，使用安全请求方法
+                response = self._safe_request(url, page_headers)
+                prepared = self._prepare_download(url, PageResponse(
+                    url, response.status_code, response.text, response.encoding,
+                    response.content, response.headers), cached)
+                if not prepared:
+                    return {'success': False, 'message': '未找到图片', 'count': 0}
+                
+                image_urls, save_dir, title = prepared
+                
+                # 下载图片
+                for i, img_url in enumerate(image_urls, 1):
+                    try:
+                        self.logger.info(f"正在下载第 {i}/{len(image_urls)} 张图片: {img_url}")
+                        
+                        image_path = self._download_image(img_url, save_dir)
+                        if image_path:
+                            downloaded_images.append(image_path)
+                            if img_url in self._seen_hits:
+                                self.logger.info(f"已存在，跳过: {os.path.basename(image_path)}")
+                                continue
+                            self.logger.info(f"已下载: {os.path.basename(image_path)}")
+                            
+                            # 上传到云存储（如果配置了）
+                            self.upload_to_cloud(image_path, os.path.basename(image_path))
                         
-                        # 上传到云存储（如果配置了）
-                        self.upload_to_cloud(image_path, os.path.basename(image_path))
-                    
-                    # 添加延时，避免请求过快
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    self.logger.error(f"下载图片失败: {str(e)}")
-                    continue
+                    except Exception as e:
+                        self.logger.error(f"下载图片失败: {str(e)}")
+                        continue
             
             result = {
                 'success': True,
@@ -164,6 +254,7 @@ class QinglongCrawler:
                 'url': url,
                 'total_found': len(image_urls),
                 'downloaded': len(downloaded_images),
+                'skipped': len(self._seen_hits),
                 'save_path': save_dir,
                 'message': f'成功下载 {len(downloaded_images)}/{len(image_urls)} 张图片到: {save_dir}'
             }
@@ -176,102 +267,211 @@ class QinglongCrawler:
             self.logger.error(error_msg)
             return {'success': False, 'message': error_msg, 'count': 0}
     
-    def _safe_request(self, url, max_retries=3):
+    def _prepare_download(self, url, page, cached=None):
         """
-        安全的网络请求，处理SSL错误和重试
+        解析网页，提取图片链接并创建保存目录
+        
+        Args:
+            url: 目标网址
+            page: 抓取到的页面（PageResponse）
+            cached: 页面的缓存条目（CacheEntry），没有缓存为None
+            
+        Returns:
+            tuple: (图片URL列表, 保存目录, 标题)，未找到图片返回None
+        """
+        if HttpCache.not_modified(page, cached):
+            # 页面未修改（304或正文哈希相同），直接使用缓存的解析结果
+            self.logger.info("页面未修改，使用缓存的解析结果")
+            title = cached.meta.get('title', '')
+            folder_title = cached.meta.get('folder_title', '')
+            image_urls = cached.meta.get('image_urls', [])
+            page_links = cached.meta.get('page_links', [])
+        else:
+            self.logger.info("正在解析网页...")
+            
+            # 解析HTML，一次遍历得到标题和所有图片链接
+            parsed = extract_page(page.text, url, self._is_valid_image_url, self.config['CONTENT_SELECTOR'])
+            title = self.get_page_title(parsed, url)
+            folder_title = self._page_title(parsed)
+            image_urls = parsed.image_urls
+            page_links = parsed.page_links
+            
+            if self.http_cache:
+                self.http_cache.put(
+                    url, page.content, page.encoding,
+                    etag=page.headers.get('ETag'),
+                    last_modified=page.headers.get('Last-Modified'),
+                    meta={'title': title, 'folder_title': folder_title, 'image_urls': image_urls,
+                          'page_links': page_links},
+                )
+        
+        if self.config['PAGINATE']:
+            image_urls = self._merge_thread_pages(url, image_urls, page_links)
+        
+        if not image_urls:
+            self.logger.warning("未找到图片链接")
+            return None
+        
+        self.logger.info(f"找到 {len(image_urls)} 个图片链接，开始下载...")
+        
+        # 限制图片数量
+        if len(image_urls) > self.config['MAX_IMAGES']:
+            image_urls = image_urls[:self.config['MAX_IMAGES']]
+            self.logger.info(f"图片数量超限，只下载前{self.config['MAX_IMAGES']}张")
+        
+        # 创建保存目录 - 使用改进的文件夹名生成，重新爬取时沿用上次的目录
+        folder_name = self._seen_index.thread_folder(url)
+        if not folder_name:
+            folder_name = self._generate_folder_name(folder_title, url)
+            self._seen_index.set_thread_folder(url, folder_name)
+        save_dir = os.path.join(self.config['SAVE_PATH'], folder_name)
+        os.makedirs(save_dir, exist_ok=True)
+        
+        return image_urls, save_dir, title
+    
+    def _merge_thread_pages(self, url, image_urls, page_links):
+        """
+        并行获取帖子的其余分页，按页码顺序合并图片链接
+        
+        Args:
+            url: 帖子第一页URL
+            image_urls: 第一页的图片链接
+            page_links: 第一页中的分页链接
+            
+        Returns:
+            list: 整个帖子的图片链接，按页码和文档顺序去重
+        """
+        key = normalize_url(url)
+        page_urls = [page_url for page_url in thread_page_urls(page_links, self.config['MAX_PAGES'])
+                     if normalize_url(page_url) != key]
+        if not page_urls:
+            return image_urls
+        
+        self.logger.info(f"帖子共 {len(page_urls) + 1} 页，正在并行获取其余页面...")
+        
+        pages = [[] for _ in page_urls]
+        for index, page_url, page_images, error in self.page_pool.run(self._fetch_thread_page, page_urls):
+            if error is not None:
+                self.logger.warning(f"获取分页失败: {page_url} - {str(error)}")
+                continue
+            pages[index] = page_images
+        
+        merged = dict.fromkeys(image_urls)
+        for page_images in pages:
+            merged.update(dict.fromkeys(page_images))
+        return list(merged)
+    
+    def _fetch_thread_page(self, page_url):
+        """
+        获取并解析帖子的一个分页
+        
+        Args:
+            page_url: 分页URL
+            
+        Returns:
+            list: 分页中的图片链接
+        """
+        cached = self.http_cache.get(page_url) if self.http_cache else None
+        response = self._safe_request(page_url, HttpCache.conditional_headers(cached))
+        if HttpCache.not_modified(PageResponse(page_url, response.status_code, None, None,
+                                               response.content, response.headers), cached):
+            return cached.meta.get('image_urls', [])
+        
+        parsed = extract_page(response.text, page_url, self._is_valid_image_url, self.config['CONTENT_SELECTOR'])
+        if self.http_cache:
+            self.http_cache.put(
+                page_url, response.content, response.encoding,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                meta={'title': self.get_page_title(parsed, page_url), 'folder_title': self._page_title(parsed),
+                      'image_urls': parsed.image_urls, 'page_links': parsed.page_links},
+            )
+        return parsed.image_urls
+    
+    def _use_async_engine(self):
+        """是否使用asyncio抓取引擎"""
+        if self.config['FETCH_ENGINE'] != 'async':
+            return False
+        if not AsyncFetchEngine.available():
+            self.logger.warning("未安装aiohttp，回退到requests抓取引擎")
+            return False
+        return True
+    
+    def _log_image_result(self, index, img_url, image_path, error):
+        """asyncio引擎的单张图片完成回调"""
+        if error is not None:
+            self.logger.error(f"下载图片失败: {img_url} - {str(error)}")
+        elif image_path:
+            self.logger.info(f"已下载: {os.path.basename(image_path)}")
+    
+    def _get(self, url, **kwargs):
+        """
+        经过主机限速调度器的GET请求
         
         Args:
             url: 请求URL
-            max_retries: 最大重试次数
+            **kwargs: 传给session.get的参数
             
         Returns:
             Response对象
         """
-        for attempt in range(max_retries):
-            try:
-                # 尝试正常请求
-                response = self.session.get(url, timeout=self.config['TIMEOUT'], verify=True)
-                response.raise_for_status()
-                response.encoding = response.apparent_encoding
-                return response
-                
-            except requests.exceptions.SSLError as e:
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"SSL错误，尝试使用不验证SSL的方式 (尝试 {attempt + 1}/{max_retries})")
-                    try:
-                        # 尝试不验证SSL
-                        response = self.session.get(url, timeout=self.config['TIMEOUT'], verify=False)
-                        response.raise_for_status()
-                        response.encoding = response.apparent_encoding
-                        return response
-                    except Exception as e2:
-                        self.logger.warning(f"不验证SSL也失败: {e2}")
-                        if attempt < max_retries - 1:
-                            time.sleep(2 ** attempt)  # 指数退避
-                            continue
-                        else:
-                            raise e2
-                else:
-                    raise e
-                    
-            except requests.exceptions.ConnectionError as e:
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"连接错误，重试中 (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(2 ** attempt)  # 指数退避
-                    continue
-                else:
-                    raise e
-                    
-            except requests.exceptions.Timeout as e:
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"请求超时，重试中 (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise e
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"其他错误，重试中 (尝试 {attempt + 1}/{max_retries}): {e}")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise e
-
-    def get_page_title(self, soup, url):
+        self.rate_limiter.acquire(url)
+        response = self.session.get(url, **kwargs)
+        self.rate_limiter.observe(url, response.status_code, response.headers)
+        return response
+    
+    def _safe_request(self, url, headers=None):
+        """
+        安全的网络请求，由统一重试策略处理SSL错误、重试和主机熔断
+        
+        Args:
+            url: 请求URL
+            headers: 额外的请求头（如条件请求头）
+            
+        Returns:
+            Response对象
+        """
+        def request(verify):
+            response = self._get(url, timeout=self.timeout, headers=headers, verify=verify)
+            response.raise_for_status()
+            return response
+        
+        response = self.retry_policy.call(url, request, self._retry_budget)
+        if response.status_code != 304:
+            # 优先使用声明的编码，只有无法确定时才做编码检测
+            response.encoding = self.charset_resolver.resolve(url, response.headers, response.content)
+        return response
+    
+    def get_page_title(self, parsed, url):
         """获取页面标题"""
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.get_text().strip()
-        else:
-            title = f"images_{urlparse(url).netloc}"
+        title = parsed.title or f"images_{urlparse(url).netloc}"
         
         return title[:50]  # 限制长度
     
-    def _generate_folder_name(self, soup, url):
+    def _page_title(self, parsed):
+        """
+        获取用于文件夹名的网页标题，没有title标签时使用h1标签
+        
+        Args:
+            parsed: 网页解析结果（ParsedPage）
+            
+        Returns:
+            str: 网页标题，找不到返回空字符串
+        """
+        return parsed.title or parsed.h1
+    
+    def _generate_folder_name(self, title, url):
         """
         生成文件夹名称，基于网页标题
         
         Args:
-            soup: BeautifulSoup对象
+            title: 网页标题
             url: 网页URL
             
         Returns:
             str: 清理后的文件夹名称
         """
-        # 尝试获取网页标题
-        title = ""
-        title_tag = soup.find('title')
-        if title_tag and title_tag.string:
-            title = title_tag.string.strip()
-        
-        # 如果没有标题，尝试获取h1标签
-        if not title:
-            h1_tag = soup.find('h1')
-            if h1_tag:
-                title = h1_tag.get_text().strip()
-        
-        # 如果还是没有标题，使用域名作为备选
+        # 如果没有标题，使用域名作为备选
         if not title:
             domain = urlparse(url).netloc
             title = f"images_from_{domain}"
@@ -296,81 +496,6 @@ class QinglongCrawler:
         
         return final_name
     
-    def _extract_image_urls(self, soup, base_url, page_content):
-        """
-        提取图片URL
-        
-        Args:
-            soup: BeautifulSoup对象
-            base_url: 基础URL
-            page_content: 网页原始内容
-            
-        Returns:
-            list: 图片URL列表
-        """
-        image_urls = set()
-        
-        # 方法1: 查找img标签
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            src = img.get('src') or img.get('data-src') or img.get('data-original') or img.get('data-lazy')
-            if src:
-                # 转换为绝对URL
-                absolute_url = urljoin(base_url, src)
-                if self._is_valid_image_url(absolute_url):
-                    image_urls.add(absolute_url)
-        
-        # 方法2: 查找a标签中的图片链接
-        a_tags = soup.find_all('a', href=True)
-        for a in a_tags:
-            href = a['href']
-            absolute_url = urljoin(base_url, href)
-            if self._is_valid_image_url(absolute_url):
-                image_urls.add(absolute_url)
-        
-        # 方法3: 查找CSS背景图片
-        style_tags = soup.find_all(['div', 'span', 'section'], style=True)
-        for tag in style_tags:
-            style = tag.get('style', '')
-            bg_images = re.findall(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style)
-            for bg_img in bg_images:
-                absolute_url = urljoin(base_url, bg_img)
-                if self._is_valid_image_url(absolute_url):
-                    image_urls.add(absolute_url)
-        
-        # 方法4: 使用正则表达式在整个页面内容中搜索图片URL
-        image_patterns = [
-            # 匹配完整的HTTP/HTTPS图片URL
-            r'https?://[^\s"\'<>]+\.(?:jpg|jpeg|png|gif|bmp|webp|svg)',
-            # 匹配src属性中的图片
-            r'src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配data-src属性中的图片
-            r'data-src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配data-original属性中的图片
-            r'data-original\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']',
-            # 匹配JavaScript中的图片URL
-            r'["\']([^"\']*(?:https?://)?[^"\']*\.(?:jpg|jpeg|png|gif|bmp|webp|svg))["\']'
-        ]
-        
-        for pattern in image_patterns:
-            matches = re.findall(pattern, page_content, re.IGNORECASE)
-            for match in matches:
-                # 处理元组结果（某些正则表达式会返回元组）
-                if isinstance(match, tuple):
-                    match = next((m for m in match if m), '')
-                
-                if match:
-                    # 转换为绝对URL
-                    if match.startswith(('http://', 'https://')):
-                        absolute_url = match
-                    else:
-                        absolute_url = urljoin(base_url, match)
-                    
-                    if self._is_valid_image_url(absolute_url):
-                        image_urls.add(absolute_url)
-        
-        return list(image_urls)
-    
     def _is_valid_image_url(self, url):
         """
         检查是否为有效的图片URL
@@ -421,6 +546,11 @@ class QinglongCrawler:
             str: 保存的文件路径，失败返回None
         """
         try:
+            # 已下载过的图片直接返回，不发起网络请求
+            seen_path = self._lookup_seen(url, save_dir)
+            if seen_path:
+                return seen_path
+            
             # 设置特殊的请求头，某些图片服务器需要Referer
             headers = self.session.headers.copy()
             headers.update({
@@ -431,75 +561,157 @@ class QinglongCrawler:
             # 获取图片，使用安全请求方法
             response = self._safe_image_request(url, headers)
             
-            # 检查内容类型
             content_type = response.headers.get('content-type', '').lower()
-            if not (content_type.startswith('image/') or 'image' in content_type):
-                # 如果Content-Type不是图片，但URL看起来像图片，仍然尝试下载
-                if not any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']):
-                    return None
-            
-            # 生成文件名
-            filename = self._generate_filename(url, content_type)
-            file_path = os.path.join(save_dir, filename)
+            file_path = self._resolve_image_path(url, content_type, save_dir)
+            if not file_path:
+                return None
             
             # 避免重复下载
             if os.path.exists(file_path):
-                return file_path
+                response.close()
+                return self._finalize_image(url, file_path)
             
-            # 保存图片
-            with open(file_path, 'wb') as f:
+            # 保存图片，边下载边计算哈希
+            writer = self._open_image_writer(file_path)
+            try:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
-                        f.write(chunk)
-            
-            # 验证文件大小
-            if os.path.getsize(file_path) < 500:  # 小于500字节的文件可能不是有效图片
-                os.remove(file_path)
-                return None
+                        writer.write(chunk)
+            except Exception:
+                writer.abort()
+                raise
+            digest = writer.commit()
             
-            return file_path
+            return self._finalize_image(url, file_path, digest)
             
         except Exception as e:
             self.logger.error(f"下载图片失败: {str(e)}")
             return None
     
-    def _safe_image_request(self, url, headers, max_retries=2):
+    def _resolve_image_path(self, url, content_type, save_dir):
+        """
+        根据内容类型确定图片保存路径
+        
+        Args:
+            url: 图片URL
+            content_type: 响应的Content-Type（小写）
+            save_dir: 保存目录
+            
+        Returns:
+            str: 文件路径，不是图片返回None
+        """
+        # 检查内容类型
+        if not (content_type.startswith('image/') or 'image' in content_type):
+            # 如果Content-Type不是图片，但URL看起来像图片，仍然尝试下载
+            if not any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']):
+                return None
+        
+        # 生成文件名
+        filename = self._generate_filename(url, content_type)
+        return os.path.join(save_dir, filename)
+    
+    def _open_image_writer(self, file_path):
+        """
+        创建图片写入器，启用内容寻址存储时写入blob并硬链接到帖子目录
+        
+        Args:
+            file_path: 帖子目录中的文件路径
+            
+        Returns:
+            BlobWriter或FileWriter对象
+        """
+        if self._blob_store is not None:
+            return self._blob_store.open_writer(file_path)
+        return FileWriter(file_path)
+    
+    def _finalize_image(self, url, file_path, digest=None):
+        """
+        校验已写入的图片文件，有效则记录到已下载图片索引
+        
+        Args:
+            url: 图片URL
+            file_path: 文件路径
+            digest: 文件内容的SHA-256
+            
+        Returns:
+            str: 有效则返回文件路径，否则删除文件并返回None
+        """
+        # 验证文件大小
+        if os.path.getsize(file_path) < 500:  # 小于500字节的文件可能不是有效图片
+            if self._blob_store is not None:
+                self._blob_store.release(file_path)
+            else:
+                os.remove(file_path)
+            return None
+        
+        if self._seen_index is not None:
+            self._seen_index.record(url, file_path, digest)
+        return file_path
+    
+    def _lookup_seen(self, url, save_dir):
+        """
+        在已下载图片索引中查找图片，图片在其他帖子目录中时链接（或复制）到当前目录
+        
+        Args:
+            url: 图片URL
+            save_dir: 当前帖子的保存目录
+            
+        Returns:
+            str: 当前目录中已下载的文件路径，没有返回None
+        """
+        if self._seen_index is None:
+            return None
+        path = self._seen_index.lookup(url)
+        if not path:
+            return None
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(save_dir):
+            path = self._link_seen(path, save_dir)
+        self._seen_hits.add(url)
+        return path
+    
+    def _link_seen(self, path, save_dir):
+        """
+        把其他帖子目录中已下载的图片放入当前帖子目录：优先通过内容寻址存储硬链接，否则硬链接或复制
+        
+        Args:
+            path: 已下载的文件路径
+            save_dir: 当前帖子的保存目录
+            
+        Returns:
+            str: 当前目录中的文件路径
+        """
+        dest_path = os.path.join(save_dir, os.path.basename(path))
+        if os.path.exists(dest_path):
+            return dest_path
+        if self._blob_store is not None and self._blob_store.link_existing(path, dest_path):
+            return dest_path
+        try:
+            os.link(path, dest_path)
+        except OSError:
+            shutil.copy2(path, dest_path)
+        return dest_path
+    
+    def _safe_image_request(self, url, headers):
         """
-        安全的图片请求
+        安全的图片请求，由统一重试策略处理SSL错误、重试和主机熔断
         
         Args:
             url: 图片URL
             headers: 请求头
-            max_retries: 最大重试次数
             
         Returns:
             Response对象
         """
-        for attempt in range(max_retries):
+        def request(verify):
+            response = self._get(url, timeout=self.timeout, stream=True, headers=headers, verify=verify)
             try:
-                response = self.session.get(url, timeout=self.config['TIMEOUT'], stream=True, headers=headers, verify=True)
                 response.raise_for_status()
-                return response
-                
-            except requests.exceptions.SSLError:
-                if attempt < max_retries - 1:
-                    try:
-                        # 尝试不验证SSL
-                        response = self.session.get(url, timeout=self.config['TIMEOUT'], stream=True, headers=headers, verify=False)
-                        response.raise_for_status()
-                        return response
-                    except Exception:
-                        time.sleep(1)
-                        continue
-                else:
-                    raise
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    raise e
+            except Exception:
+                response.close()
+                raise
+            return response
+        
+        return self.retry_policy.call(url, request, self._retry_budget)
     
     def _generate_filename(self, url, content_type):
         """
@@ -532,7 +744,7 @@ class QinglongCrawler:
                 'image/svg+xml': '.svg'
             }
             ext = ext_map.get(content_type, '.jpg')
-            filename = f"image_{int(time.time() * 1000)}{ext}"
+            filename = f"image_{int(time.time() * 1000)}_{next(self._name_counter)}{ext}"
         
         # 清理文件名
         filename = self._clean_filename(filename)
@@ -622,9 +834,30 @@ class QinglongCrawler:
             self.logger.error(f"云存储上传失败: {str(e)}")
     
     def send_notification(self, result):
-        """发送通知"""
-        title = "BBS图片爬虫完成"
-        content = f"""
+        """发送通知：加入汇总，时间窗口结束或数量达到上限时合并发送"""
+        self.digest.add(result)
+    
+    def flush_notifications(self, timeout=30):
+        """
+        立即发送汇总中的结果并等待发送完成（进程退出前调用）
+        
+        Args:
+            timeout: 最多等待的秒数
+        """
+        self.digest.flush()
+        self.notifier.wait(timeout)
+    
+    def send_digest(self, results):
+        """
+        发送汇总通知
+        
+        Args:
+            results: 任务结果列表
+        """
+        if len(results) == 1:
+            result = results[0]
+            title = "BBS图片爬虫完成"
+            content = f"""
 任务完成通知
 
 网址: {result.get('url', 'Unknown')}
@@ -632,6 +865,20 @@ class QinglongCrawler:
 结果: {result.get('message', 'Unknown')}
 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
+        else:
+            succeeded = sum(1 for result in results if result.get('success'))
+            downloaded = sum(result.get('downloaded', 0) for result in results)
+            title = f"BBS图片爬虫完成 {len(results)} 个任务"
+            lines = [
+                "",
+                f"成功: {succeeded}  失败: {len(results) - succeeded}  下载图片: {downloaded}",
+                f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                "",
+            ]
+            for result in results:
+                mark = '✓' if result.get('success') else '✗'
+                lines.append(f"{mark} {result.get('title') or result.get('url', 'Unknown')}: {result.get('message', 'Unknown')}")
+            content = "\n".join(lines)
         
         # Push Plus
         if self.config['PUSH_PLUS_TOKEN']:
@@ -651,57 +898,65 @@ class QinglongCrawler:
     
     def send_pushplus(self, title, content):
         """Push Plus推送"""
-        try:
-            url = "http://www.pushplus.plus/send"
-            data = {
-                "token": self.config['PUSH_PLUS_TOKEN'],
-                "title": title,
-                "content": content
-            }
-            response = requests.post(url, json=data, timeout=10)
-            self.logger.info("Push Plus通知发送成功")
-        except Exception as e:
-            self.logger.error(f"Push Plus通知发送失败: {str(e)}")
+        data = {
+            "token": self.config['PUSH_PLUS_TOKEN'],
+            "title": title,
+            "content": content
+        }
+        self.notifier.submit('Push Plus', 'POST', "http://www.pushplus.plus/send", json=data)
     
     def send_bark(self, title, content):
         """Bark推送"""
-        try:
-            url = f"{self.config['BARK_URL']}/{title}/{content}"
-            response = requests.get(url, timeout=10)
-            self.logger.info("Bark通知发送成功")
-        except Exception as e:
-            self.logger.error(f"Bark通知发送失败: {str(e)}")
+        url = f"{self.config['BARK_URL']}/{quote(title, safe='')}/{quote(content, safe='')}"
+        self.notifier.submit('Bark', 'GET', url)
     
     def send_telegram(self, title, content):
         """Telegram推送"""
-        try:
-            url = f"https://api.telegram.org/bot{self.config['TELEGRAM_BOT_TOKEN']}/sendMessage"
-            data = {
-                "chat_id": self.config['TELEGRAM_CHAT_ID'],
-                "text": f"{title}\n\n{content}",
-                "parse_mode": "HTML"
-            }
-            response = requests.post(url, json=data, timeout=10)
-            self.logger.info("Telegram通知发送成功")
-        except Exception as e:
-            self.logger.error(f"Telegram通知发送失败: {str(e)}")
+        url = f"https://api.telegram.org/bot{self.config['TELEGRAM_BOT_TOKEN']}/sendMessage"
+        data = {
+            "chat_id": self.config['TELEGRAM_CHAT_ID'],
+            "text": f"{title}\n\n{content}",
+            "parse_mode": "HTML"
+        }
+        self.notifier.submit('Telegram', 'POST', url, json=data)
     
     def send_dingtalk(self, title, content):
         """钉钉推送"""
-        try:
-            data = {
-                "msgtype": "text",
-                "text": {
-                    "content": f"{title}\n\n{content}"
-                }
+        data = {
+            "msgtype": "text",
+            "text": {
+                "content": f"{title}\n\n{content}"
             }
-            response = requests.post(self.config['DINGTALK_WEBHOOK'], json=data, timeout=10)
-            self.logger.info("钉钉通知发送成功")
-        except Exception as e:
-            self.logger.error(f"钉钉通知发送失败: {str(e)}")
+        }
+        self.notifier.submit('钉钉', 'POST', self.config['DINGTALK_WEBHOOK'], json=data)
+
+def run_daemon():
+    """常驻模式：在本地端口接收任务，每个工作线程保持一个已初始化的爬虫实例"""
+    # 青龙面板停止任务时发送SIGTERM，按Ctrl+C处理，处理完已接收的任务再退出
+    def handle_term(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle_term)
+    
+    def make_handler():
+        crawler = QinglongCrawler()
+        
+        def handle(task):
+            result = crawler.crawl_images(task['url'])
+            crawler.send_notification(result)
+        return handle
+    
+    # 主线程也创建一个实例，读取配置并预先建立共享的会话、缓存和索引
+    crawler = QinglongCrawler()
+    daemon = CrawlDaemon(make_handler, crawler.config['DAEMON_ADDR'], crawler.config['DAEMON_WORKERS'])
+    daemon.serve_forever()
+    crawler.flush_notifications()
 
 def main():
     """主函数"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--daemon':
+        run_daemon()
+        return
+    
     # 从环境变量或命令行参数获取URL
     url = os.getenv('BBS_URL') or (sys.argv[1] if len(sys.argv) > 1 else None)
     
@@ -712,6 +967,8 @@ def main():
         print("  python3 qinglong_crawler.py")
         print("或者:")
         print("  python3 qinglong_crawler.py 'https://example.com/thread/123'")
+        print("常驻模式（接收Webhook服务转交的任务）:")
+        print("  python3 qinglong_crawler.py --daemon")
         sys.exit(1)
     
     # 创建爬虫实例
@@ -722,6 +979,7 @@ def main():
     
     # 发送通知
     crawler.send_notification(result)
+    crawler.flush_notifications()
     
     # 输出结果
     print(json.dumps(result, ensure_ascii=False, indent=2))
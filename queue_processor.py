@@ -9,9 +9,16 @@ import sys
 import json
 import time
 import redis
+import socket
 import logging
+import threading
+from collections import deque
 from datetime import datetime
 from qinglong_crawler import QinglongCrawler
+from crawler.frontier import UrlFrontier
+from crawler.task_queue import create_task_queue
+from crawler.result_log import ResultLog
+from crawler.task_registry import TaskRegistry, PROCESSING, RETRYING, SUCCESS, FAILED
 
 class QueueProcessor:
     """队列处理器"""
@@ -20,7 +27,28 @@ class QueueProcessor:
         self.setup_logging()
         self.load_config()
         self.setup_redis()
+        # 可靠队列：任务处理完成后才删除，进程崩溃后由其他工作线程接管
+        self.queue = create_task_queue(
+            self.redis_client,
+            backend=self.config['QUEUE_BACKEND'],
+            queue_name=self.config['QUEUE_NAME'],
+            stream_name=self.config['QUEUE_STREAM'],
+            group=self.config['CONSUMER_GROUP'],
+            visibility_timeout=self.config['VISIBILITY_TIMEOUT'],
+        )
+        # 版块爬虫写入的待爬队列，手动提交的任务处理完后再处理
+        self.frontier = UrlFrontier(self.redis_client, self.config['FRONTIER_KEY'])
+        # 任务结果记录，批量写入定长的结果流
+        self.results = ResultLog(self.redis_client, self.config['RESULT_KEY'], self.config['RESULT_MAXLEN'])
+        # Webhook提交的任务的状态，与去重共用
+        self.registry = TaskRegistry(self.redis_client, self.config['TASK_PREFIX'],
+                                     self.config['IN_FLIGHT_TTL'], self.config['DEDUPE_TTL'])
         self.crawler = QinglongCrawler()
+        self._stop_event = threading.Event()
+        
+        # 领取延迟（入队到开始处理的秒数），保留最近1000个样本
+        self._pickup_latencies = deque(maxlen=1000)
+        self._metrics_lock = threading.Lock()
         
     def setup_logging(self):
         """设置日志"""
@@ -43,10 +71,26 @@ class QueueProcessor:
             'REDIS_DB': int(os.getenv('REDIS_DB', '0')),
             
             # 处理配置
+            # 队列后端：list（Redis列表）或 stream（Redis Streams消费者组，多节点部署时使用）
+            'QUEUE_BACKEND': os.getenv('QUEUE_BACKEND', 'list'),
             'QUEUE_NAME': os.getenv('QUEUE_NAME', 'bbs_crawler_queue'),
-            'PROCESS_INTERVAL': int(os.getenv('PROCESS_INTERVAL', '5')),  # 秒
+            'QUEUE_STREAM': os.getenv('QUEUE_STREAM', 'bbs_crawler_stream'),
+            'CONSUMER_GROUP': os.getenv('CONSUMER_GROUP', 'bbs_crawler_workers'),
+            'MAX_BACKOFF': int(os.getenv('MAX_BACKOFF', '30')),  # Redis异常时的最长退避时间，秒
             'MAX_RETRIES': int(os.getenv('MAX_RETRIES', '3')),
             'RETRY_DELAY': int(os.getenv('RETRY_DELAY', '60')),  # 秒
+            'FRONTIER_KEY': os.getenv('FRONTIER_KEY', 'bbs_crawler_frontier'),
+            'RESULT_KEY': os.getenv('RESULT_KEY', 'bbs_crawler_result_log'),
+            'RESULT_MAXLEN': int(os.getenv('RESULT_MAXLEN', '1000')),
+            
+            # 任务状态与去重配置，需与Webhook服务一致
+            'TASK_PREFIX': os.getenv('TASK_PREFIX', 'bbs_crawler_task'),
+            'IN_FLIGHT_TTL': int(os.getenv('IN_FLIGHT_TTL', '86400')),  # 秒
+            'DEDUPE_TTL': int(os.getenv('DEDUPE_TTL', '3600')),  # 秒
+            
+            # 并发配置：每个进程的工作线程数，心跳超时后任务被放回队列
+            'WORKERS': int(os.getenv('WORKERS', str(os.cpu_count() or 4))),
+            'VISIBILITY_TIMEOUT': int(os.getenv('VISIBILITY_TIMEOUT', '120')),  # 秒
         }
         
     def setup_redis(self):
@@ -66,31 +110,170 @@ class QueueProcessor:
             self.logger.error(f"Redis连接失败: {e}")
             sys.exit(1)
     
+    # 各进程的领取延迟统计
+    METRICS_KEY = 'bbs_crawler_metrics'
+    
     def process_queue(self):
-        """处理队列"""
-        self.logger.info("开始处理队列...")
+        """处理队列：启动多个工作线程和一个心跳/回收线程"""
+        self.logger.info(f"开始处理队列，工作线程数: {self.config['WORKERS']}")
+        
+        self.process_id = prefix = f"{socket.gethostname()}:{os.getpid()}"
+        worker_ids = [f"{prefix}:{index}" for index in range(self.config['WORKERS'])]
+        # 每个工作线程使用自己的爬虫实例，连接池、限速和编码识别在进程内共享
+        crawlers = [self.crawler] + [QinglongCrawler() for _ in worker_ids[1:]]
+        
+        # 先回收上次崩溃遗留的任务
+        reaped = self.queue.reap()
+        if reaped:
+            self.logger.info(f"回收了 {reaped} 个未完成的任务")
         
-        while True:
+        threads = [
+            threading.Thread(target=self._maintain, args=(worker_ids,), daemon=True),
+            threading.Thread(target=self._promote_retries, daemon=True),
+        ]
+        for worker_id, crawler in zip(worker_ids, crawlers):
+            self.queue.register(worker_id)
+            threads.append(threading.Thread(target=self._worker_loop, args=(worker_id, crawler), daemon=True))
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while any(thread.is_alive() for thread in threads[2:]):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.logger.info("收到中断信号，等待正在处理的任务完成（再次中断立即退出）")
+            self._stop_event.set()
+            # 再次中断时直接退出，未完成的任务在心跳过期后由其他进程回收
+            for thread in threads[2:]:
+                thread.join()
+        
+        for worker_id in worker_ids:
+            self.queue.release(worker_id)
+        self.results.flush()
+        self.crawler.flush_notifications()
+        self.redis_client.hdel(self.METRICS_KEY, prefix)
+        self.logger.info("队列处理已停止")
+    
+    def _worker_loop(self, worker_id, crawler):
+        """
+        工作线程：从队列领取任务执行，队列为空时处理待爬队列
+        
+        Args:
+            worker_id: 工作线程ID
+            crawler: 该线程使用的爬虫实例
+        """
+        backoff = 0
+        # 待爬队列可能有帖子：启动时和每次等待超时后检查，取空后只阻塞等待任务，不额外往返
+        check_frontier = True
+        while not self._stop_event.is_set():
             try:
-                # 从队列中取出任务（阻塞式，超时5秒）
-                result = self.redis_client.brpop(self.config['QUEUE_NAME'], timeout=5)
+                if check_frontier:
+                    # 从待爬队列取优先级最高的帖子放入队列，与其他任务一样可靠处理；
+                    # 每次只放入一个，先入队的手动任务仍然先处理
+                    check_frontier = self.frontier.pop_into(self.queue, self._frontier_task) is not None
                 
-                if result:
-                    queue_name, task_json = result
-                    self.process_task(task_json)
-                else:
-                    # 队列为空，等待一段时间
-                    time.sleep(self.config['PROCESS_INTERVAL'])
-                    
-            except KeyboardInterrupt:
-                self.logger.info("收到中断信号，停止处理队列")
-                break
+                # 阻塞等待任务，有任务入队时立即返回；超时用于检查停止信号和待爬队列
+                claimed = self.queue.claim(worker_id, timeout=5)
+                backoff = 0
+                if claimed is None:
+                    check_frontier = True
+                    continue
+                
+                task_id, task_json = claimed
+                self._record_pickup(task_json)
+                self.process_task(task_json, crawler)
+                self.queue.ack(worker_id, task_id)
+                
+            except redis.RedisError as e:
+                # 只有Redis异常时退避，避免Redis不可用时空转
+                backoff = min(backoff * 2 or 1, self.config['MAX_BACKOFF'])
+                self.logger.error(f"Redis异常，{backoff}秒后重试: {e}")
+                self._stop_event.wait(backoff)
             except Exception as e:
                 self.logger.error(f"处理队列异常: {e}")
-                time.sleep(self.config['PROCESS_INTERVAL'])
     
-    def process_task(self, task_json):
-        """处理单个任务"""
+    @staticmethod
+    def _frontier_task(url):
+        """待爬队列中的帖子转换为任务JSON"""
+        return json.dumps({
+            'url': url,
+            'source': 'frontier',
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    def _record_pickup(self, task_json):
+        """记录任务从入队到开始处理的延迟，重试任务不计"""
+        try:
+            task_data = json.loads(task_json)
+            if task_data.get('retry_count'):
+                return
+            latency = (datetime.now() - datetime.fromisoformat(task_data['timestamp'])).total_seconds()
+        except (ValueError, TypeError, KeyError):
+            return
+        with self._metrics_lock:
+            self._pickup_latencies.append(max(latency, 0))
+    
+    def get_pickup_stats(self):
+        """
+        获取本进程的领取延迟统计
+        
+        Returns:
+            dict: 样本数、平均值、P50、P95、最大值（秒）
+        """
+        with self._metrics_lock:
+            latencies = sorted(self._pickup_latencies)
+        if not latencies:
+            return {'count': 0}
+        return {
+            'count': len(latencies),
+            'avg': round(sum(latencies) / len(latencies), 3),
+            'p50': round(latencies[len(latencies) // 2], 3),
+            'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            'max': round(latencies[-1], 3),
+        }
+    
+    def _maintain(self, worker_ids):
+        """
+        心跳/回收线程：定期更新本进程工作线程的心跳和领取延迟统计，回收心跳过期的工作线程的任务
+        
+        Args:
+            worker_ids: 本进程的工作线程ID
+        """
+        interval = max(1, self.config['VISIBILITY_TIMEOUT'] // 3)
+        while not self._stop_event.wait(interval):
+            try:
+                self.queue.heartbeat(*worker_ids)
+                # 发布本进程的领取延迟统计，供 status 命令查看
+                stats = dict(self.get_pickup_stats(), updated_at=datetime.now().isoformat())
+                self.redis_client.hset(self.METRICS_KEY, self.process_id, json.dumps(stats))
+                reaped = self.queue.reap()
+                if reaped:
+                    self.logger.warning(f"回收了 {reaped} 个超时未完成的任务")
+            except Exception as e:
+                self.logger.error(f"心跳/回收失败: {e}")
+    
+    def _promote_retries(self):
+        """重试调度线程：每秒将到期的重试任务批量放回队列，并写入缓冲的任务结果"""
+        while not self._stop_event.wait(1):
+            try:
+                while self.queue.promote_due() > 0:
+                    pass
+            except Exception as e:
+                self.logger.error(f"放回重试任务失败: {e}")
+            try:
+                self.results.flush()
+            except Exception as e:
+                self.logger.error(f"写入任务结果失败: {e}")
+    
+    def process_task(self, task_json, crawler=None):
+        """
+        处理单个任务
+        
+        Args:
+            task_json: 任务JSON
+            crawler: 使用的爬虫实例，默认为 self.crawler
+        """
+        crawler = crawler or self.crawler
         try:
             # 解析任务数据
             task_data = json.loads(task_json)
@@ -100,9 +283,10 @@ class QueueProcessor:
             retry_count = task_data.get('retry_count', 0)
             
             self.logger.info(f"处理任务: {url} (来源: {source}, 重试: {retry_count})")
+            self._set_task_status(task_data, PROCESSING)
             
             # 执行爬虫任务
-            result = self.crawler.crawl_images(url)
+            result = crawler.crawl_images(url)
             
             if result['success']:
                 self.logger.info(f"任务完成: {result['message']}")
@@ -136,54 +320,73 @@ class QueueProcessor:
                 self.logger.error(f"无法解析任务数据: {task_json}")
     
     def retry_task(self, task_data, retry_count):
-        """重试任务"""
+        """重试任务：放入延迟队列，到期后由重试调度线程放回队列，不阻塞工作线程"""
         task_data['retry_count'] = retry_count
         task_data['retry_timestamp'] = datetime.now().isoformat()
+        self._set_task_status(task_data, RETRYING)
         
-        # 延迟重试
         delay = self.config['RETRY_DELAY'] * retry_count
-        self.logger.info(f"任务将在 {delay} 秒后重试: {task_data['url']}")
-        
-        # 添加到延迟队列（这里简化处理，直接延迟后重新加入队列）
-        time.sleep(delay)
-        
         try:
-            self.redis_client.lpush(self.config['QUEUE_NAME'], json.dumps(task_data))
-            self.logger.info(f"任务已重新加入队列: {task_data['url']}")
+            self.queue.schedule(json.dumps(task_data), delay)
+            self.logger.info(f"任务将在 {delay} 秒后重试: {task_data['url']}")
         except Exception as e:
-            self.logger.error(f"重新加入队列失败: {e}")
+            self.logger.error(f"加入重试队列失败: {e}")
     
     def record_task_result(self, task_data, result, status):
-        """记录任务结果"""
+        """记录任务结果，先缓冲在内存中，由重试调度线程每秒批量写入"""
+        self._set_task_status(task_data, SUCCESS if status == 'success' else FAILED, result)
+        # 通知按时间窗口汇总，所有工作线程共用一个汇总
+        self.crawler.send_notification(dict(result, url=result.get('url') or task_data.get('url')))
         try:
-            # 创建结果记录
-            record = {
-                'task': task_data,
-                'result': result,
-                'status': status,
-                'completed_at': datetime.now().isoformat()
-            }
-            
-            # 保存到Redis（使用有序集合，按时间排序）
-            score = int(time.time())
-            self.redis_client.zadd('bbs_crawler_results', {json.dumps(record): score})
-            
-            # 只保留最近1000条记录
-            self.redis_client.zremrangebyrank('bbs_crawler_results', 0, -1001)
-            
+            self.results.record(task_data, result, status)
             self.logger.info(f"任务结果已记录: {status}")
-            
         except Exception as e:
             self.logger.error(f"记录任务结果失败: {e}")
     
+    def _set_task_status(self, task_data, status, result=None):
+        """更新Webhook提交的任务的状态，其他来源的任务没有task_id，直接跳过"""
+        task_id = task_data.get('task_id')
+        if not task_id:
+            return
+        fields = {}
+        if result:
+            fields = {'message': result.get('message', ''), 'downloaded': result.get('downloaded', 0)}
+        try:
+            self.registry.update(task_id, status, task_data.get('url'), **fields)
+        except Exception as e:
+            self.logger.error(f"更新任务状态失败: {e}")
+    
+    def get_recent_results(self, count=20, status=None):
+        """
+        查询最近的任务结果
+        
+        Args:
+            count: 最多返回的条数
+            status: 只返回该状态（success/failed/error）的结果
+            
+        Returns:
+            list: 结果列表，最新的在前
+        """
+        self.results.flush()
+        return self.results.recent(count, status)
+    
     def get_queue_status(self):
         """获取队列状态"""
         try:
-            queue_length = self.redis_client.llen(self.config['QUEUE_NAME'])
-            result_count = self.redis_client.zcard('bbs_crawler_results')
+            queue_length = self.queue.length()
+            result_count = self.results.count()
             
             return {
                 'queue_length': queue_length,
+                'processing_count': self.queue.processing_count(),
+                'retry_count': self.queue.delayed_count(),
+                'live_workers': self.queue.live_workers(),
+                'frontier_length': self.frontier.size(),
+                'frontier_seen': self.frontier.seen_count(),
+                'pickup_latency': {
+                    process_id: json.loads(stats)
+                    for process_id, stats in self.redis_client.hgetall(self.METRICS_KEY).items()
+                },
                 'result_count': result_count,
                 'timestamp': datetime.now().isoformat()
             }
@@ -194,8 +397,8 @@ class QueueProcessor:
     def clear_queue(self):
         """清空队列"""
         try:
-            cleared = self.redis_client.delete(self.config['QUEUE_NAME'])
-            self.logger.info(f"队列已清空，删除了 {cleared} 个键")
+            cleared = self.queue.clear()
+            self.logger.info(f"队列已清空，删除了 {cleared} 项")
             return cleared
         except Exception as e:
             self.logger.error(f"清空队列失败: {e}")
@@ -224,11 +427,19 @@ def main():
             print(f"队列已清空，删除了 {cleared} 个任务")
             return
             
+        elif command == 'results':
+            # 查看最近的任务结果
+            count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+            status = sys.argv[3] if len(sys.argv) > 3 else None
+            print(json.dumps(processor.get_recent_results(count, status), ensure_ascii=False, indent=2))
+            return
+            
         elif command == 'help':
             print("队列处理器使用说明:")
             print("  python3 queue_processor.py          - 启动队列处理器")
             print("  python3 queue_processor.py status   - 查看队列状态")
             print("  python3 queue_processor.py clear    - 清空队列")
+            print("  python3 queue_processor.py results [N] [status] - 查看最近N条任务结果")
             print("  python3 queue_processor.py help     - 显示帮助")
             return
     
@@ -236,14 +447,15 @@ def main():
     try:
         processor.logger.info("队列处理器启动")
         processor.logger.info(f"Redis: {processor.config['REDIS_HOST']}:{processor.config['REDIS_PORT']}")
-        processor.logger.info(f"队列名称: {processor.config['QUEUE_NAME']}")
-        processor.logger.info(f"处理间隔: {processor.config['PROCESS_INTERVAL']}秒")
+        processor.logger.info(f"队列后端: {processor.config['QUEUE_BACKEND']} ({processor.queue.queue_name})")
+        processor.logger.info(f"工作线程: {processor.config['WORKERS']}")
         processor.logger.info(f"最大重试: {processor.config['MAX_RETRIES']}次")
         
         # 显示初始状态
         status = processor.get_queue_status()
         if status:
             processor.logger.info(f"当前队列长度: {status['queue_length']}")
+            processor.logger.info(f"待爬队列长度: {status['frontier_length']}")
             processor.logger.info(f"历史结果数: {status['result_count']}")
         
         # 开始处理队列
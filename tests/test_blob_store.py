@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""内容寻址存储引用计数测试"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from crawler.blob_store import BlobStore, FileWriter
+
+
+class BlobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = BlobStore(self.root)
+        self.dest = os.path.join(self.root, 'thread', 'a.jpg')
+        os.makedirs(os.path.dirname(self.dest))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _write(self, data):
+        writer = self.store.open_writer(self.dest)
+        writer.write(data)
+        return writer.commit()
+
+    def test_overwrite_moves_reference_to_new_blob(self):
+        old = self._write(b'A' * 600)
+        new = self._write(b'B' * 600)
+        refcounts = dict(self.store._db.execute('SELECT digest, refcount FROM blobs'))
+        self.assertEqual(refcounts, {old: 0, new: 1})
+
+        self.assertEqual(self.store.gc()['removed'], 1)
+        self.assertTrue(os.path.exists(self.store.blob_path(new)))
+        with open(self.dest, 'rb') as f:
+            self.assertEqual(f.read(1), b'B')
+
+    def test_dest_appears_only_on_commit(self):
+        for writer in (self.store.open_writer(self.dest), FileWriter(self.dest + '.png')):
+            writer.write(b'C' * 600)
+            self.assertFalse(os.path.exists(writer.dest_path))
+            writer.commit()
+            self.assertEqual(os.path.getsize(writer.dest_path), 600)
+
+    def test_file_writer_abort_leaves_nothing(self):
+        writer = FileWriter(self.dest)
+        writer.write(b'D' * 100)
+        writer.abort()
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
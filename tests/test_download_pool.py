@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""下载批次与分页任务共用线程池的测试"""
+
+import time
+import threading
+import unittest
+
+from crawler.download_pool import DownloadPool
+
+
+class DownloadBatchMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _work(self, url, delay):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(delay)
+        with self.lock:
+            self.active -= 1
+        return url.upper()
+
+    def test_map_shares_the_batch_worker_bound(self):
+        pool = DownloadPool(max_workers=2, per_host_limit=2)
+        downloads = []
+        with pool.batch(self._work) as batch:
+            batch.submit('http://a/1', 0.05)
+            batch.submit('http://b/1', 0.05)
+            pages = list(batch.map(self._work, ['http://c/1', 'http://d/1'], 0.1,
+                                   on_completed=lambda *item: downloads.append(item)))
+            remaining = list(batch.wait())
+
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(sorted(p[2] for p in pages), ['HTTP://C/1', 'HTTP://D/1'])
+        # 分页任务排在下载任务之后，等待期间下载已全部完成并交给回调
+        self.assertEqual(sorted(d[0] for d in downloads), [0, 1])
+        self.assertEqual(remaining, [])
+
+    def test_map_keeps_downloads_for_wait_without_callback(self):
+        pool = DownloadPool(max_workers=2, per_host_limit=2)
+        with pool.batch(self._work) as batch:
+            batch.submit('http://a/1', 0)
+            pages = list(batch.map(self._work, ['http://c/1'], 0.05))
+            remaining = list(batch.wait())
+        self.assertEqual(len(pages), 1)
+        self.assertEqual([(r[0], r[2], r[3]) for r in remaining], [(0, 'HTTP://A/1', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
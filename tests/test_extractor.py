@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""分块喂入与空页面解析测试"""
+
+import unittest
+
+from crawler.extractor import PageExtractor, extract_page
+from crawler.board import extract_threads
+
+HTML = ('<html><head><title>T</title><script>var a="http://x.com/a.jpg"; var b = "http://z.com/e.jpeg";'
+        '</script></head><body><p>see http://y.com/b.png</p><p>http://w.com/c.gif</p>'
+        '<div>x</div><div>http://v.com/d.png</div></body></html>')
+
+
+def accept(url):
+    return True
+
+
+class ExtractorTest(unittest.TestCase):
+
+    def test_chunked_feed_matches_single_parse(self):
+        expected = extract_page(HTML, 'http://a/', accept).image_urls
+        self.assertIn('http://z.com/e.jpeg', expected)
+        for size in (3, 7, 11, 20, 33):
+            extractor = PageExtractor('http://a/', accept)
+            for start in range(0, len(HTML), size):
+                extractor.feed(HTML[start:start + size])
+            self.assertEqual(extractor.close().image_urls, expected, f"chunk size {size}")
+
+    def test_text_nodes_are_not_joined_across_elements(self):
+        parsed = extract_page('<p>http://x.com/a</p><p>.jpg</p>', 'http://a/', accept)
+        self.assertEqual(parsed.image_urls, [])
+
+    def test_empty_page(self):
+        self.assertEqual(extract_page('', 'http://a/', accept).image_urls, [])
+        extractor = PageExtractor('http://a/', accept)
+        extractor.feed('')
+        self.assertEqual(extractor.close().image_urls, [])
+        self.assertEqual(extract_threads('', 'http://a/').threads, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""后台通知发送器测试"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from crawler.notifier import NotificationDispatcher, DigestNotifier
+
+
+class _Response:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _StubSession:
+    """前 failures 次请求失败（交替为连接错误和503），之后成功；release 未设置时阻塞"""
+
+    def __init__(self, failures=0, blocking=False):
+        self.failures = failures
+        self.calls = []
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.release.wait()
+        self.calls.append((method, url, kwargs))
+        if len(self.calls) <= self.failures:
+            if len(self.calls) % 2:
+                raise requests.ConnectionError('connection refused')
+            return _Response(503)
+        return _Response(200)
+
+
+class NotificationDispatcherTest(unittest.TestCase):
+
+    def _dispatcher(self, session, **kwargs):
+        dispatcher = NotificationDispatcher(retry_delay=0.01, **kwargs)
+        dispatcher.session = session
+        return dispatcher
+
+    def test_retries_with_backoff_until_sent(self):
+        session = _StubSession(failures=2)
+        dispatcher = self._dispatcher(session, workers=1, max_attempts=3)
+        self.assertTrue(dispatcher.submit('测试', 'POST', 'http://push', json={'a': 1}))
+        self.assertTrue(dispatcher.wait(5))
+
+        self.assertEqual(len(session.calls), 3)
+        self.assertEqual(session.calls[0], ('POST', 'http://push', {'json': {'a': 1}}))
+        stats = dispatcher.get_stats()
+        self.assertEqual((stats['sent'], stats['failed'], stats['pending']), (1, 0, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        session = _StubSession(failures=5)
+        dispatcher = self._dispatcher(session, workers=1, max_attempts=3)
+        dispatcher.submit('测试', 'POST', 'http://push')
+        self.assertTrue(dispatcher.wait(5))
+
+        self.assertEqual(len(session.calls), 3)
+        self.assertEqual(dispatcher.get_stats()['failed'], 1)
+
+    def test_drops_when_queue_is_full_and_drains_on_wait(self):
+        session = _StubSession(blocking=True)
+        dispatcher = self._dispatcher(session, workers=1, max_queue=1)
+        self.assertTrue(dispatcher.submit('测试', 'POST', 'http://push/1'))
+        # 等发送线程取走第一条并阻塞在请求上，第二条占满队列
+        while dispatcher._queue.qsize():
+            time.sleep(0.01)
+        self.assertTrue(dispatcher.submit('测试', 'POST', 'http://push/2'))
+        self.assertFalse(dispatcher.submit('测试', 'POST', 'http://push/3'))
+        self.assertFalse(dispatcher.wait(0.1))
+
+        session.release.set()
+        self.assertTrue(dispatcher.wait(5))
+        self.assertEqual([call[1] for call in session.calls], ['http://push/1', 'http://push/2'])
+        stats = dispatcher.get_stats()
+        self.assertEqual((stats['queued'], stats['sent'], stats['dropped']), (2, 2, 1))
+
+
+class DigestNotifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+
+    def test_single_result_is_sent_immediately(self):
+        digest = DigestNotifier(self.sent.append, window=30)
+        digest.add({'url': 'a'})
+        self.assertEqual(self.sent, [[{'url': 'a'}]])
+        self.assertIsNone(digest._timer)
+
+    def test_results_within_window_are_merged(self):
+        digest = DigestNotifier(self.sent.append, window=0.2)
+        digest.add('a')
+        digest.add('b')
+        digest.add('c')
+        self.assertEqual(self.sent, [['a']])
+        time.sleep(0.3)
+        self.assertEqual(self.sent, [['a'], ['b', 'c']])
+        # 窗口过去后的结果再次立即发送
+        time.sleep(0.25)
+        digest.add('d')
+        self.assertEqual(self.sent[-1], ['d'])
+
+    def test_max_items_flushes_early(self):
+        digest = DigestNotifier(self.sent.append, window=30, max_items=2)
+        for item in 'abc':
+            digest.add(item)
+        self.assertEqual(self.sent, [['a'], ['b', 'c']])
+
+
+class SingleTaskNotificationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_single_task_uses_the_per_task_format(self):
+        from qinglong_crawler import QinglongCrawler
+
+        with mock.patch.dict(os.environ, {'BBS_SAVE_PATH': self.root, 'PUSH_PLUS_TOKEN': 'token'}):
+            crawler = QinglongCrawler()
+        crawler.notifier = mock.Mock()
+        crawler.digest = DigestNotifier(crawler.send_digest, crawler.config['NOTIFY_DIGEST_WINDOW'])
+
+        crawler.send_notification({'url': 'https://t66y.com/1.html', 'title': '标题', 'message': '下载 3 张'})
+
+        crawler.notifier.submit.assert_called_once()
+        data = crawler.notifier.submit.call_args.kwargs['json']
+        self.assertEqual(data['title'], 'BBS图片爬虫完成')
+        self.assertIn('任务完成通知', data['content'])
+        self.assertIn('网址: https://t66y.com/1.html', data['content'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""青龙面板开放API客户端令牌缓存测试"""
+
+import time
+import threading
+import unittest
+
+from crawler.qinglong_api import QinglongClient
+
+
+class _Response:
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class _StubSession:
+    """模拟青龙面板：令牌请求较慢，便于并发调用同时等待；rejected 中的令牌返回401"""
+
+    def __init__(self, token_delay=0.1):
+        self.token_delay = token_delay
+        self.token_requests = 0
+        self.api_calls = []
+        self.rejected = set()
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self._lock:
+            self.token_requests += 1
+            token = f"token-{self.token_requests}"
+        time.sleep(self.token_delay)
+        return _Response(200, {'code': 200, 'data': {'token': token, 'expiration': time.time() + 3600}})
+
+    def request(self, method, url, headers=None, timeout=None, **kwargs):
+        token = headers['Authorization'].split(' ', 1)[1]
+        with self._lock:
+            self.api_calls.append((method, url, token))
+        if token in self.rejected:
+            return _Response(401, {'code': 401, 'message': 'UnauthorizedError'})
+        return _Response(200, {'code': 200, 'data': []})
+
+
+class QinglongClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = _StubSession()
+        self.client = QinglongClient('http://ql:5700/', 'id', 'secret', session=self.session)
+
+    def test_concurrent_callers_share_one_token_request(self):
+        barrier = threading.Barrier(20)
+        results = []
+
+        def call():
+            barrier.wait()
+            results.append(self.client.request('GET', '/open/crons').status_code)
+
+        threads = [threading.Thread(target=call) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [200] * 20)
+        self.assertEqual(self.session.token_requests, 1)
+        self.assertEqual({call[2] for call in self.session.api_calls}, {'token-1'})
+
+    def test_unauthorized_refreshes_token_and_retries_once(self):
+        self.client.get_token()
+        self.session.rejected.add('token-1')
+
+        response = self.client.request('PUT', '/open/crons/run', json=[1])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.token_requests, 2)
+        self.assertEqual([call[2] for call in self.session.api_calls], ['token-1', 'token-2'])
+        self.assertEqual(self.client.get_stats()['unauthorized'], 1)
+
+    def test_second_unauthorized_is_returned_without_another_retry(self):
+        self.session.rejected.update({'token-1', 'token-2'})
+
+        response = self.client.request('GET', '/open/crons')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(self.session.api_calls), 2)
+        self.assertEqual(self.session.token_requests, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
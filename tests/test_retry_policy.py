@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""熔断器试探请求测试"""
+
+import unittest
+
+import requests
+
+from crawler.retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError
+
+URL = 'http://h.com/a.jpg'
+
+
+def raise_(exc):
+    def func(verify):
+        raise exc
+    return func
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+class CircuitBreakerProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        # 失败一次即熔断，熔断后立即允许试探
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        self.policy = RetryPolicy(max_attempts=1, breaker=self.breaker)
+
+    def test_http_error_during_probe_closes_breaker(self):
+        with self.assertRaises(requests.ConnectionError):
+            self.policy.call(URL, raise_(requests.ConnectionError('refused')))
+        with self.assertRaises(requests.HTTPError):
+            self.policy.call(URL, raise_(http_error(404)))
+        self.assertEqual(self.policy.call(URL, lambda verify: 'ok'), 'ok')
+        self.assertEqual(self.policy.call(URL, lambda verify: 'ok'), 'ok')
+        self.assertEqual(self.breaker._probing, set())
+        self.assertEqual(self.breaker.get_open_hosts(), [])
+
+    def test_non_host_error_during_probe_releases_probe(self):
+        with self.assertRaises(requests.ConnectionError):
+            self.policy.call(URL, raise_(requests.ConnectionError('refused')))
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            self.policy.call(URL, raise_(requests.exceptions.InvalidURL('bad')))
+        self.assertEqual(self.breaker._probing, set())
+        # 主机仍处于熔断状态，下一次请求作为新的试探放行
+        self.assertEqual(self.policy.call(URL, lambda verify: 'ok'), 'ok')
+        self.assertEqual(self.breaker.get_open_hosts(), [])
+
+    def test_open_breaker_rejects_until_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        policy = RetryPolicy(max_attempts=1, breaker=breaker)
+        with self.assertRaises(requests.ConnectionError):
+            policy.call(URL, raise_(requests.ConnectionError('refused')))
+        with self.assertRaises(CircuitOpenError):
+            policy.call(URL, lambda verify: 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
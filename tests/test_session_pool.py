@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""共享连接池扩容测试"""
+
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawler.session_pool import SessionPool
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        time.sleep(0.3)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_growing_pool_keeps_old_adapter_until_requests_finish(self):
+        pool = SessionPool()
+        session = pool.get_session(2)
+        old_adapter = session.get_adapter(self.url)
+        closed = []
+        old_adapter.close = lambda: closed.append(True)
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(session.get(self.url, timeout=5).text))
+        thread.start()
+        time.sleep(0.1)
+
+        self.assertIs(pool.get_session(8), session)
+        self.assertIsNot(session.get_adapter(self.url), old_adapter)
+        # 旧连接池上还有进行中的请求，不能关闭
+        self.assertEqual(closed, [])
+
+        thread.join(5)
+        self.assertEqual(results, ['ok'])
+        self.assertEqual(closed, [True])
+        self.assertEqual(pool.get_stats()['pool_size'], 8)
+
+    def test_idle_old_adapter_is_closed_immediately(self):
+        pool = SessionPool()
+        session = pool.get_session(2)
+        old_adapter = session.get_adapter(self.url)
+        closed = []
+        old_adapter.close = lambda: closed.append(True)
+
+        pool.get_session(4)
+        self.assertEqual(closed, [True])
+        # 不需要更大的连接池时不重建
+        adapter = session.get_adapter(self.url)
+        pool.get_session(3)
+        self.assertIs(session.get_adapter(self.url), adapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""任务队列测试（fakeredis）"""
+
+import time
+import unittest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from crawler.task_queue import ReliableQueue, StreamQueue
+
+
+@unittest.skipUnless(fakeredis, '需要 fakeredis')
+class StreamQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.queue = StreamQueue(self.redis, 'test_stream', visibility_timeout=1)
+        self.queue.register('w1')
+
+    def test_claim_and_ack_removes_message(self):
+        self.queue.push_many(['{"url": "a"}', '{"url": "b"}'])
+        message_id, task = self.queue.claim('w1', timeout=0.1)
+        self.assertEqual(task, '{"url": "a"}')
+        self.assertEqual(self.queue.processing_count(), 1)
+        self.assertEqual(self.queue.length(), 1)
+
+        self.queue.ack('w1', message_id)
+        # XACK + XDEL：消息确认后从流中删除，不会无限增长
+        self.assertEqual(self.queue.processing_count(), 0)
+        self.assertEqual(self.redis.xlen('test_stream'), 1)
+        self.assertNotIn(message_id, [mid for mid, _ in self.redis.xrange('test_stream')])
+
+    def test_idle_message_is_taken_over_by_another_worker(self):
+        self.queue.push('{"url": "a"}')
+        message_id, _ = self.queue.claim('w1', timeout=0.1)
+        # 未超时前其他工作线程领不到
+        self.assertIsNone(self.queue.claim('w2', timeout=0.05))
+
+        time.sleep(1.05)
+        taken_id, task = self.queue.claim('w2', timeout=0.1)
+        self.assertEqual((taken_id, task), (message_id, '{"url": "a"}'))
+        pending = self.redis.xpending_range('test_stream', self.queue.group, '-', '+', 10)
+        self.assertEqual([entry['consumer'] for entry in pending], ['w2'])
+
+    def test_heartbeat_keeps_message_with_its_worker(self):
+        self.queue.push('{"url": "a"}')
+        self.queue.claim('w1', timeout=0.1)
+        time.sleep(0.6)
+        self.queue.heartbeat('w1')
+        time.sleep(0.6)
+        self.assertIsNone(self.queue.claim('w2', timeout=0.05))
+
+    def test_delayed_task_is_promoted_once(self):
+        self.queue.schedule('{"url": "a"}', 0)
+        self.assertEqual(self.queue.promote_due(), 1)
+        self.assertEqual(self.queue.promote_due(), 0)
+        self.assertEqual(self.queue.claim('w1', timeout=0.1)[1], '{"url": "a"}')
+
+
+@unittest.skipUnless(fakeredis, '需要 fakeredis')
+class ReliableQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.queue = ReliableQueue(self.redis, 'test_queue', visibility_timeout=60)
+
+    def test_claim_and_ack(self):
+        self.queue.register('w1')
+        self.queue.push_many(['a', 'b'])
+        task_id, task = self.queue.claim('w1', timeout=0.1)
+        # 先入队的先处理
+        self.assertEqual(task, 'a')
+        self.assertEqual(self.queue.processing_count(), 1)
+        self.queue.ack('w1', task_id)
+        self.assertEqual(self.queue.processing_count(), 0)
+        self.assertEqual(self.queue.length(), 1)
+
+    def test_reap_requeues_tasks_of_dead_worker(self):
+        self.queue.register('dead')
+        self.queue.register('alive')
+        self.queue.push_many(['a', 'b'])
+        self.queue.claim('dead', timeout=0.1)
+        self.queue.claim('alive', timeout=0.1)
+        # 心跳键过期，视为工作线程已死亡
+        self.redis.delete(self.queue.heartbeat_key('dead'))
+
+        self.assertEqual(self.queue.reap(), 1)
+        self.assertEqual(self.queue.peek(), ['a'])
+        self.assertEqual(self.redis.smembers(self.queue.workers_key), {'alive'})
+        self.assertEqual(self.redis.llen(self.queue.processing_key('alive')), 1)
+        # 再次回收不会重复放回
+        self.assertEqual(self.queue.reap(), 0)
+        self.assertEqual(self.queue.claim('alive', timeout=0.1)[1], 'a')
+
+    def test_push_from_moves_frontier_member_atomically(self):
+        self.redis.zadd('frontier', {'low': 1, 'high': 2})
+        self.assertEqual(self.queue.push_from('frontier', lambda member: f'task:{member}'), 'high')
+        self.assertEqual(self.queue.peek(), ['task:high'])
+        self.assertEqual(self.redis.zrange('frontier', 0, -1), ['low'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""任务登记去重测试（fakeredis）"""
+
+import unittest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from crawler.task_registry import TaskRegistry, PENDING, PROCESSING, SUCCESS, FAILED
+
+URL = 'https://t66y.com/htm_data/2401/7/123.html'
+
+
+@unittest.skipUnless(fakeredis, '需要 fakeredis')
+class TaskRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.registry = TaskRegistry(self.redis, in_flight_ttl=600, done_ttl=60)
+
+    def test_resubmission_returns_existing_task(self):
+        task_id, created, status = self.registry.register(URL)
+        self.assertTrue(created)
+        self.assertEqual(status['status'], PENDING)
+
+        # 协议和 utm_* 参数不同也视为同一帖子
+        again_id, created, status = self.registry.register(
+            URL.replace('https', 'http') + '?utm_source=share', source='batch')
+        self.assertEqual((again_id, created), (task_id, False))
+        self.assertEqual(status['task_id'], task_id)
+        self.assertEqual(status['duplicates'], '1')
+
+    def test_duplicates_within_one_batch(self):
+        other = URL.replace('123', '456')
+        results = self.registry.register_many([URL, other, URL, other, URL])
+
+        self.assertEqual([created for _, created, _ in results], [True, True, False, False, False])
+        self.assertEqual([task_id for task_id, _, _ in results],
+                         [results[i][0] for i in (0, 1, 0, 1, 0)])
+        self.assertEqual(results[2][2]['url'], URL)
+        self.assertEqual(results[3][2]['url'], other)
+        self.assertEqual(results[4][2]['duplicates'], '2')
+        self.assertEqual(self.registry.get(results[0][0])['duplicates'], '2')
+
+    def test_reregisters_when_existing_key_expires_mid_batch(self):
+        old_id, _, _ = self.registry.register(URL)
+        url_key = self.registry._url_key(URL)
+        pipeline = self.redis.pipeline
+        calls = []
+
+        def expiring_pipeline(*args, **kwargs):
+            # 第一次管道（SET NX）失败后、查询已有任务ID前，去重键恰好过期
+            calls.append(1)
+            if len(calls) == 2:
+                self.redis.delete(url_key)
+            return pipeline(*args, **kwargs)
+
+        self.redis.pipeline = expiring_pipeline
+        other = URL.replace('123', '456')
+        results = self.registry.register_many([other, URL])
+        del self.redis.pipeline
+
+        self.assertTrue(results[0][1])
+        task_id, created, status = results[1]
+        self.assertTrue(created)
+        self.assertNotEqual(task_id, old_id)
+        self.assertEqual(status['url'], URL)
+        self.assertEqual(self.redis.get(url_key), task_id)
+
+    def test_finished_tasks_update_dedupe_window(self):
+        task_id, _, _ = self.registry.register(URL)
+        self.registry.update(task_id, SUCCESS, URL)
+        self.assertLessEqual(self.redis.ttl(self.registry._url_key(URL)), 60)
+        self.assertFalse(self.registry.register(URL)[1])
+
+        other = URL.replace('123', '456')
+        task_id, _, _ = self.registry.register(other)
+        self.registry.update(task_id, FAILED, other, message='error')
+        self.assertTrue(self.registry.register(other)[1])
+
+    def test_update_after_expiry_does_not_leave_hash_without_ttl(self):
+        task_id, _, _ = self.registry.register(URL)
+        self.redis.delete(self.registry._task_key(task_id))
+
+        self.registry.update(task_id, PROCESSING, URL)
+
+        ttl = self.redis.ttl(self.registry._task_key(task_id))
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
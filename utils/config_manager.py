@@ -8,6 +8,8 @@ import os
 import json
 from pathlib import Path
 
+from crawler.constants import DEFAULT_CONTENT_SELECTOR
+
 class ConfigManager:
     """配置管理类"""
     
@@ -25,8 +27,18 @@ class ConfigManager:
                 'width': 1000,
                 'height': 700
             },
-            'download_delay': 0.5,
-            'timeout': 15
+            'timeout': 15,
+            'max_workers': 8,
+            'per_host_concurrency': 4,
+            'fetch_engine': 'requests',
+            'host_rate': 4.0,
+            'host_rates': {},
+            'http_cache_mb': 200,
+            'content_dedupe': True,
+            'content_selector': DEFAULT_CONTENT_SELECTOR,
+            'streaming_parse': False,
+            'paginate': False,
+            'max_pages': 50
         }
         
         # 确保配置目录存在
@@ -47,6 +59,11 @@ class ConfigManager:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                 
+                # 旧版本的固定下载延时改为按主机限速：延时d秒相当于每秒1/d个请求
+                delay = config.pop('download_delay', None)
+                if delay and 'host_rate' not in config:
+                    config['host_rate'] = round(1.0 / delay, 2)
+                
                 # 合并默认配置（确保新增的配置项有默认值）
                 merged_config = self.default_config.copy()
                 merged_config.update(config)
@@ -127,44 +144,213 @@ class ConfigManager:
         }
         self.save_config()
     
-    def get_download_delay(self):
+    def get_timeout(self):
         """
-        获取下载延时
+        获取网络超时时间
         
         Returns:
-            float: 下载延时（秒）
+            int: 超时时间（秒）
         """
-        return self.config.get('download_delay', 0.5)
+        return self.config.get('timeout', 15)
     
-    def set_download_delay(self, delay):
+    def set_timeout(self, timeout):
         """
-        设置下载延时
+        设置网络超时时间
         
         Args:
-            delay: 延时时间（秒）
+            timeout: 超时时间（秒）
         """
-        self.config['download_delay'] = delay
+        self.config['timeout'] = timeout
         self.save_config()
     
-    def get_timeout(self):
+    def get_max_workers(self):
         """
-        获取网络超时时间
+        获取图片下载总并发数
         
         Returns:
-            int: 超时时间（秒）
+            int: 总并发数
         """
-        return self.config.get('timeout', 15)
+        return self.config.get('max_workers', 8)
     
-    def set_timeout(self, timeout):
+    def set_max_workers(self, max_workers):
         """
-        设置网络超时时间
+        设置图片下载总并发数
         
         Args:
-            timeout: 超时时间（秒）
+            max_workers: 总并发数
         """
-        self.config['timeout'] = timeout
+        self.config['max_workers'] = max_workers
+        self.save_config()
+    
+    def get_per_host_concurrency(self):
+        """
+        获取单个主机的最大并发数
+        
+        Returns:
+            int: 单主机并发数
+        """
+        return self.config.get('per_host_concurrency', 4)
+    
+    def set_per_host_concurrency(self, per_host_concurrency):
+        """
+        设置单个主机的最大并发数
+        
+        Args:
+            per_host_concurrency: 单主机并发数
+        """
+        self.config['per_host_concurrency'] = per_host_concurrency
         self.save_config()
     
+    def get_fetch_engine(self):
+        """
+        获取抓取引擎
+        
+        Returns:
+            str: 'requests' 或 'async'
+        """
+        return self.config.get('fetch_engine', 'requests')
+    
+    def set_fetch_engine(self, engine):
+        """
+        设置抓取引擎
+        
+        Args:
+            engine: 'requests' 或 'async'（需要安装aiohttp）
+        """
+        self.config['fetch_engine'] = engine
+        self.save_config()
+    
+    def get_host_rate(self):
+        """
+        获取默认的单主机请求速率
+        
+        Returns:
+            float: 每个主机每秒请求数
+        """
+        return self.config.get('host_rate', 4.0)
+    
+    def set_host_rate(self, rate):
+        """
+        设置默认的单主机请求速率
+        
+        Args:
+            rate: 每个主机每秒请求数
+        """
+        self.config['host_rate'] = rate
+        self.save_config()
+    
+    def get_host_rates(self):
+        """
+        获取指定主机的请求速率
+        
+        Returns:
+            dict: {主机名: 每秒请求数}
+        """
+        return self.config.get('host_rates', {})
+    
+    def set_host_rates(self, host_rates):
+        """
+        设置指定主机的请求速率
+        
+        Args:
+            host_rates: {主机名: 每秒请求数}
+        """
+        self.config['host_rates'] = dict(host_rates)
+        self.save_config()
+    
+    def get_http_cache_dir(self):
+        """
+        获取帖子页面HTTP缓存目录
+        
+        Returns:
+            str: 缓存目录路径
+        """
+        return str(self.config_dir / 'http_cache')
+    
+    def get_http_cache_mb(self):
+        """
+        获取HTTP缓存大小上限
+        
+        Returns:
+            int: 缓存大小上限（MB），0表示不缓存
+        """
+        return self.config.get('http_cache_mb', 200)
+    
+    def get_content_dedupe(self):
+        """
+        是否使用内容寻址存储（相同图片只保存一份，帖子目录中为硬链接）
+        
+        Returns:
+            bool: 是否启用
+        """
+        return self.config.get('content_dedupe', True)
+    
+    def get_content_selector(self):
+        """
+        获取帖子正文区域选择器
+        
+        Returns:
+            str: 逗号分隔的选择器，为空时解析整个页面
+        """
+        return self.config.get('content_selector', DEFAULT_CONTENT_SELECTOR)
+    
+    def set_content_selector(self, selector):
+        """
+        设置帖子正文区域选择器
+        
+        Args:
+            selector: 逗号分隔的选择器，如 'div.tpc_content, td.t_f'
+        """
+        self.config['content_selector'] = selector
+        self.save_config()
+    
+    def get_streaming_parse(self):
+        """
+        是否流式解析网页（边接收边解析，找到图片立即开始下载）
+        
+        Returns:
+            bool: 是否启用
+        """
+        return self.config.get('streaming_parse', False)
+    
+    def set_streaming_parse(self, enabled):
+        """
+        设置是否流式解析网页
+        
+        Args:
+            enabled: 是否启用，仅对requests抓取引擎生效
+        """
+        self.config['streaming_parse'] = bool(enabled)
+        self.save_config()
+    
+    def get_paginate(self):
+        """
+        是否使用分页模式（自动获取帖子的所有分页）
+        
+        Returns:
+            bool: 是否启用
+        """
+        return self.config.get('paginate', False)
+    
+    def set_paginate(self, enabled):
+        """
+        设置是否使用分页模式
+        
+        Args:
+            enabled: 是否启用
+        """
+        self.config['paginate'] = bool(enabled)
+        self.save_config()
+    
+    def get_max_pages(self):
+        """
+        获取分页模式下最多获取的页数
+        
+        Returns:
+            int: 页数
+        """
+        return self.config.get('max_pages', 50)
+    
     def reset_config(self):
         """
         重置配置为默认值
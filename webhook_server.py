@@ -7,14 +7,19 @@ Webhook服务器 - 接收URL并触发青龙面板任务
 import os
 import json
 import time
-import requests
 from datetime import datetime
 from flask import Flask, request, jsonify
 import logging
 import hashlib
 import hmac
 import redis
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
+from crawler.task_queue import create_task_queue
+from crawler.result_log import ResultLog
+from crawler.task_registry import TaskRegistry, FAILED
+from crawler.notifier import NotificationDispatcher
+from crawler.qinglong_api import QinglongClient, QinglongAuthError
+from crawler.crawl_daemon import submit_to_daemon, get_daemon_status, DEFAULT_ADDR
 
 app = Flask(__name__)
 
@@ -31,6 +36,17 @@ class WebhookServer:
     def __init__(self):
         self.load_config()
         self.setup_redis()
+        # 通知由后台线程发送，接口不等待推送服务
+        self.notifier = NotificationDispatcher(
+            max_queue=self.config['NOTIFY_QUEUE_SIZE'],
+            max_attempts=self.config['NOTIFY_MAX_ATTEMPTS'],
+        )
+        # 青龙面板API客户端，访问令牌缓存到过期前
+        self.qinglong = QinglongClient(
+            self.config['QINGLONG_URL'],
+            self.config['QINGLONG_CLIENT_ID'],
+            self.config['QINGLONG_CLIENT_SECRET'],
+        )
         
     def load_config(self):
         """加载配置"""
@@ -45,15 +61,35 @@ class WebhookServer:
             'QINGLONG_CLIENT_ID': os.getenv('QINGLONG_CLIENT_ID', ''),
             'QINGLONG_CLIENT_SECRET': os.getenv('QINGLONG_CLIENT_SECRET', ''),
             
+            # 常驻爬虫进程地址（qinglong_crawler.py --daemon），Redis不可用时优先交给它，设为空字符串时关闭
+            'DAEMON_ADDR': os.getenv('BBS_DAEMON_ADDR', DEFAULT_ADDR),
+            
             # Redis配置（任务队列）
             'REDIS_HOST': os.getenv('REDIS_HOST', 'localhost'),
             'REDIS_PORT': int(os.getenv('REDIS_PORT', '6379')),
             'REDIS_PASSWORD': os.getenv('REDIS_PASSWORD', ''),
             'REDIS_DB': int(os.getenv('REDIS_DB', '0')),
             
+            # 任务队列后端，需与队列处理器一致：list 或 stream
+            'QUEUE_BACKEND': os.getenv('QUEUE_BACKEND', 'list'),
+            'QUEUE_NAME': os.getenv('QUEUE_NAME', 'bbs_crawler_queue'),
+            'QUEUE_STREAM': os.getenv('QUEUE_STREAM', 'bbs_crawler_stream'),
+            'CONSUMER_GROUP': os.getenv('CONSUMER_GROUP', 'bbs_crawler_workers'),
+            'RESULT_KEY': os.getenv('RESULT_KEY', 'bbs_crawler_result_log'),
+            
+            # 提交去重配置：排队/处理中的URL和 DEDUPE_TTL 秒内成功完成的URL不重复入队
+            'TASK_PREFIX': os.getenv('TASK_PREFIX', 'bbs_crawler_task'),
+            'IN_FLIGHT_TTL': int(os.getenv('IN_FLIGHT_TTL', '86400')),
+            'DEDUPE_TTL': int(os.getenv('DEDUPE_TTL', '3600')),
+            
+            # 批量提交一次最多的URL数
+            'BATCH_MAX': int(os.getenv('WEBHOOK_BATCH_MAX', '500')),
+            
             # 消息推送配置
             'PUSH_PLUS_TOKEN': os.getenv('PUSH_PLUS_TOKEN', ''),
             'BARK_URL': os.getenv('BARK_URL', ''),
+            'NOTIFY_QUEUE_SIZE': int(os.getenv('NOTIFY_QUEUE_SIZE', '100')),
+            'NOTIFY_MAX_ATTEMPTS': int(os.getenv('NOTIFY_MAX_ATTEMPTS', '3')),
         }
         
     def setup_redis(self):
@@ -68,10 +104,23 @@ class WebhookServer:
             )
             # 测试连接
             self.redis_client.ping()
+            self.task_queue = create_task_queue(
+                self.redis_client,
+                backend=self.config['QUEUE_BACKEND'],
+                queue_name=self.config['QUEUE_NAME'],
+                stream_name=self.config['QUEUE_STREAM'],
+                group=self.config['CONSUMER_GROUP'],
+            )
+            self.result_log = ResultLog(self.redis_client, self.config['RESULT_KEY'])
+            self.registry = TaskRegistry(self.redis_client, self.config['TASK_PREFIX'],
+                                         self.config['IN_FLIGHT_TTL'], self.config['DEDUPE_TTL'])
             logger.info("Redis连接成功")
         except Exception as e:
             logger.warning(f"Redis连接失败: {e}")
             self.redis_client = None
+            self.task_queue = None
+            self.result_log = None
+            self.registry = None
     
     def verify_signature(self, payload, signature):
         """验证签名"""
@@ -94,7 +143,83 @@ class WebhookServer:
         except:
             return False
     
-    def add_to_queue(self, url, source='webhook'):
+    def submit_url(self, url, source='webhook'):
+        """
+        提交URL：同一帖子已在排队、处理中或刚完成时不重复入队，返回已有任务的状态
+        
+        Args:
+            url: 帖子URL
+            source: 提交来源
+            
+        Returns:
+            dict: success、duplicate、task_id、status
+        """
+        return self.submit_urls([url], source)[0]
+    
+    def submit_urls(self, urls, source='webhook'):
+        """
+        批量提交URL：一次登记去重，新任务通过一次管道入队
+        
+        Args:
+            urls: 帖子URL列表（已校验）
+            source: 提交来源
+            
+        Returns:
+            list: 与urls一一对应的 dict(success、duplicate、task_id、status)
+        """
+        if self.registry:
+            try:
+                registered = self.registry.register_many(urls, source)
+            except Exception as e:
+                logger.error(f"任务登记失败: {e}")
+            else:
+                return self._enqueue_registered(urls, source, registered)
+        
+        return [{'success': self.add_to_queue(url, source), 'duplicate': False, 'task_id': None, 'status': None}
+                for url in urls]
+    
+    def _enqueue_registered(self, urls, source, registered):
+        """将登记为新任务的URL批量入队，重复提交的直接返回已有任务"""
+        results = []
+        tasks = []
+        timestamp = datetime.now().isoformat()
+        for url, (task_id, created, status) in zip(urls, registered):
+            if not created:
+                logger.info(f"重复提交，已有任务 {task_id} ({status.get('status')}): {url}")
+                results.append({'success': True, 'duplicate': True, 'task_id': task_id, 'status': status})
+                continue
+            results.append({'success': True, 'duplicate': False, 'task_id': task_id, 'status': status})
+            tasks.append({
+                'url': url,
+                'source': source,
+                'timestamp': timestamp,
+                'status': 'pending',
+                'task_id': task_id
+            })
+        if not tasks:
+            return results
+        
+        try:
+            self.task_queue.push_many([json.dumps(task_data) for task_data in tasks])
+            logger.info(f"{len(tasks)} 个任务已添加到队列")
+            return results
+        except Exception as e:
+            logger.error(f"添加到队列失败: {e}")
+        
+        # 入队失败：撤销登记，允许重新提交，并逐个直接触发任务
+        failed = {task_data['task_id']: task_data['url'] for task_data in tasks}
+        for result in results:
+            url = failed.get(result['task_id'])
+            if url is None or result['duplicate']:
+                continue
+            try:
+                self.registry.update(result['task_id'], FAILED, url, message='入队失败')
+            except Exception as e:
+                logger.error(f"撤销任务登记失败: {e}")
+            result.update(success=self.run_without_queue(url, source), task_id=None, status=None)
+        return results
+    
+    def add_to_queue(self, url, source='webhook', task_id=None):
         """添加URL到队列"""
         task_data = {
             'url': url,
@@ -102,28 +227,37 @@ class WebhookServer:
             'timestamp': datetime.now().isoformat(),
             'status': 'pending'
         }
+        if task_id:
+            task_data['task_id'] = task_id
         
         if self.redis_client:
             try:
                 # 添加到Redis队列
-                self.redis_client.lpush('bbs_crawler_queue', json.dumps(task_data))
+                self.task_queue.push(json.dumps(task_data))
                 logger.info(f"任务已添加到队列: {url}")
                 return True
             except Exception as e:
                 logger.error(f"添加到队列失败: {e}")
         
         # 如果Redis不可用，直接触发任务
+        return self.run_without_queue(url, source)
+    
+    def run_without_queue(self, url, source='webhook'):
+        """不经过队列执行任务：优先交给常驻爬虫进程，未运行时创建青龙面板任务"""
+        if self.config['DAEMON_ADDR']:
+            try:
+                reply = submit_to_daemon(self.config['DAEMON_ADDR'], url, source)
+                if reply.get('accepted'):
+                    logger.info(f"任务已交给常驻爬虫进程: {url}")
+                    return True
+                logger.warning(f"常驻爬虫进程拒绝任务: {reply.get('error')}")
+            except (OSError, ValueError) as e:
+                logger.debug(f"常驻爬虫进程不可用: {e}")
         return self.trigger_qinglong_task(url)
     
     def trigger_qinglong_task(self, url):
         """触发青龙面板任务"""
         try:
-            # 获取青龙面板访问令牌
-            token = self.get_qinglong_token()
-            if not token:
-                logger.error("无法获取青龙面板访问令牌")
-                return False
-            
             # 创建任务
             task_data = {
                 "name": f"BBS图片爬虫_{datetime.now().strftime('%m%d_%H%M')}",
@@ -132,17 +266,8 @@ class WebhookServer:
                 "saved": True
             }
             
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                f"{self.config['QINGLONG_URL']}/open/crons",
-                json=task_data,
-                headers=headers,
-                timeout=10
-            )
+            # 使用缓存的访问令牌，令牌失效时自动刷新重试
+            response = self.qinglong.request('POST', '/open/crons', json=task_data)
             
             if response.status_code == 200:
                 logger.info(f"青龙任务创建成功: {url}")
@@ -151,59 +276,36 @@ class WebhookServer:
                 logger.error(f"青龙任务创建失败: {response.text}")
                 return False
                 
+        except QinglongAuthError as e:
+            logger.error(f"无法获取青龙面板访问令牌: {e}")
+            return False
         except Exception as e:
             logger.error(f"触发青龙任务失败: {e}")
             return False
     
     def get_qinglong_token(self):
-        """获取青龙面板访问令牌"""
+        """获取青龙面板访问令牌（缓存到过期前）"""
         try:
-            auth_data = {
-                "client_id": self.config['QINGLONG_CLIENT_ID'],
-                "client_secret": self.config['QINGLONG_CLIENT_SECRET']
-            }
-            
-            response = requests.post(
-                f"{self.config['QINGLONG_URL']}/open/auth/token",
-                json=auth_data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('data', {}).get('token')
-            else:
-                logger.error(f"获取令牌失败: {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"获取令牌异常: {e}")
+            return self.qinglong.get_token()
+        except QinglongAuthError as e:
+            logger.error(str(e))
             return None
     
     def send_notification(self, message, title="BBS爬虫通知"):
-        """发送通知"""
+        """发送通知：交给后台发送线程，立即返回"""
         # Push Plus
         if self.config['PUSH_PLUS_TOKEN']:
-            try:
-                url = "http://www.pushplus.plus/send"
-                data = {
-                    "token": self.config['PUSH_PLUS_TOKEN'],
-                    "title": title,
-                    "content": message
-                }
-                requests.post(url, json=data, timeout=10)
-                logger.info("Push Plus通知发送成功")
-            except Exception as e:
-                logger.error(f"Push Plus通知发送失败: {e}")
+            data = {
+                "token": self.config['PUSH_PLUS_TOKEN'],
+                "title": title,
+                "content": message
+            }
+            self.notifier.submit('Push Plus', 'POST', "http://www.pushplus.plus/send", json=data)
         
         # Bark
         if self.config['BARK_URL']:
-            try:
-                url = f"{self.config['BARK_URL']}/{title}/{message}"
-                requests.get(url, timeout=10)
-                logger.info("Bark通知发送成功")
-            except Exception as e:
-                logger.error(f"Bark通知发送失败: {e}")
+            url = f"{self.config['BARK_URL']}/{quote(title, safe='')}/{quote(message, safe='')}"
+            self.notifier.submit('Bark', 'GET', url)
 
 # 创建服务器实例
 webhook_server = WebhookServer()
@@ -235,18 +337,31 @@ def webhook_bbs():
         if not webhook_server.is_valid_url(url):
             return jsonify({'error': '无效的URL格式'}), 400
         
-        # 添加到队列
-        success = webhook_server.add_to_queue(url, source)
+        # 添加到队列（重复提交时返回已有任务）
+        submitted = webhook_server.submit_url(url, source)
+        
+        if submitted['duplicate']:
+            return jsonify({
+                'success': True,
+                'duplicate': True,
+                'message': '任务已存在',
+                'url': url,
+                'task_id': submitted['task_id'],
+                'task_status': submitted['status'],
+                'timestamp': datetime.now().isoformat()
+            })
         
-        if success:
+        if submitted['success']:
             message = f"任务已接收: {url}"
             webhook_server.send_notification(message, "BBS爬虫任务接收")
             logger.info(message)
             
             return jsonify({
                 'success': True,
+                'duplicate': False,
                 'message': '任务已添加到队列',
                 'url': url,
+                'task_id': submitted['task_id'],
                 'timestamp': datetime.now().isoformat()
             })
         else:
@@ -256,6 +371,66 @@ def webhook_bbs():
         logger.error(f"Webhook处理失败: {e}")
         return jsonify({'error': '服务器内部错误'}), 500
 
+@app.route('/webhook/bbs/batch', methods=['POST'])
+def webhook_bbs_batch():
+    """批量接收BBS URL的Webhook，整个请求只验证一次签名"""
+    try:
+        payload = request.get_data()
+        signature = request.headers.get('X-Hub-Signature-256', '')
+        
+        if not webhook_server.verify_signature(payload, signature):
+            logger.warning("签名验证失败")
+            return jsonify({'error': '签名验证失败'}), 401
+        
+        data = request.get_json()
+        if not data or not isinstance(data.get('urls'), list):
+            return jsonify({'error': '无效的JSON数据，需要urls列表'}), 400
+        
+        if len(data['urls']) > webhook_server.config['BATCH_MAX']:
+            return jsonify({'error': f"一次最多提交 {webhook_server.config['BATCH_MAX']} 个URL"}), 413
+        
+        source = data.get('source', 'webhook_batch')
+        
+        # 一次遍历完成校验，无效的URL单独返回
+        items = []
+        valid_urls = []
+        for raw_url in data['urls']:
+            url = raw_url.strip() if isinstance(raw_url, str) else ''
+            if url and webhook_server.is_valid_url(url):
+                items.append({'url': url})
+                valid_urls.append(url)
+            else:
+                items.append({'url': raw_url, 'status': 'invalid'})
+        
+        submitted = iter(webhook_server.submit_urls(valid_urls, source) if valid_urls else [])
+        counts = {'queued': 0, 'duplicate': 0, 'invalid': 0, 'failed': 0}
+        for item in items:
+            if item.get('status') != 'invalid':
+                result = next(submitted)
+                if result['duplicate']:
+                    item['status'] = 'duplicate'
+                    item['task_status'] = result['status']
+                else:
+                    item['status'] = 'queued' if result['success'] else 'failed'
+                item['task_id'] = result['task_id']
+            counts[item['status']] += 1
+        
+        if counts['queued']:
+            message = f"批量任务已接收: {counts['queued']} 个"
+            webhook_server.send_notification(message, "BBS爬虫任务接收")
+            logger.info(message)
+        
+        return jsonify({
+            'success': counts['failed'] == 0,
+            'counts': counts,
+            'results': items,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"批量Webhook处理失败: {e}")
+        return jsonify({'error': '服务器内部错误'}), 500
+
 @app.route('/webhook/status', methods=['GET'])
 def webhook_status():
     """获取服务状态"""
@@ -264,13 +439,20 @@ def webhook_status():
         'status': 'running',
         'timestamp': datetime.now().isoformat(),
         'redis_connected': webhook_server.redis_client is not None,
-        'qinglong_configured': bool(webhook_server.config['QINGLONG_CLIENT_ID'])
+        'qinglong_configured': bool(webhook_server.config['QINGLONG_CLIENT_ID']),
+        'qinglong_api': webhook_server.qinglong.get_stats(),
+        'notifications': webhook_server.notifier.get_stats()
     }
     
+    if webhook_server.config['DAEMON_ADDR']:
+        try:
+            status['daemon'] = get_daemon_status(webhook_server.config['DAEMON_ADDR'])
+        except (OSError, ValueError):
+            status['daemon'] = None
+    
     if webhook_server.redis_client:
         try:
-            queue_length = webhook_server.redis_client.llen('bbs_crawler_queue')
-            status['queue_length'] = queue_length
+            status['queue_length'] = webhook_server.task_queue.length()
         except:
             status['queue_length'] = 'unknown'
     
@@ -284,11 +466,11 @@ def webhook_queue():
     
     try:
         # 获取队列长度
-        queue_length = webhook_server.redis_client.llen('bbs_crawler_queue')
+        queue_length = webhook_server.task_queue.length()
         
         # 获取最近的任务（最多10个）
         recent_tasks = []
-        tasks = webhook_server.redis_client.lrange('bbs_crawler_queue', 0, 9)
+        tasks = webhook_server.task_queue.peek(10)
         
         for task_json in tasks:
             try:
@@ -306,6 +488,37 @@ def webhook_queue():
         logger.error(f"获取队列状态失败: {e}")
         return jsonify({'error': '获取队列状态失败'}), 500
 
+@app.route('/webhook/task/<task_id>', methods=['GET'])
+def webhook_task(task_id):
+    """获取任务状态"""
+    if not webhook_server.registry:
+        return jsonify({'error': 'Redis未连接'}), 500
+    
+    status = webhook_server.registry.get(task_id)
+    if status is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify(status)
+
+@app.route('/webhook/results', methods=['GET'])
+def webhook_results():
+    """获取最近的任务结果"""
+    if not webhook_server.redis_client:
+        return jsonify({'error': 'Redis未连接'}), 500
+    
+    try:
+        count = min(int(request.args.get('count', 20)), 200)
+        status = request.args.get('status') or None
+        results = webhook_server.result_log.recent(count, status)
+        return jsonify({
+            'count': len(results),
+            'results': results
+        })
+    except ValueError:
+        return jsonify({'error': '无效的count参数'}), 400
+    except Exception as e:
+        logger.error(f"获取任务结果失败: {e}")
+        return jsonify({'error': '获取任务结果失败'}), 500
+
 @app.route('/webhook/test', methods=['POST'])
 def webhook_test():
     """测试接口"""
@@ -324,8 +537,11 @@ if __name__ == '__main__':
     logger.info(f"服务地址: http://{webhook_server.config['HOST']}:{webhook_server.config['PORT']}")
     logger.info("接口说明:")
     logger.info("  POST /webhook/bbs - 接收BBS URL")
+    logger.info("  POST /webhook/bbs/batch - 批量接收BBS URL")
     logger.info("  GET  /webhook/status - 获取服务状态")
     logger.info("  GET  /webhook/queue - 获取队列状态")
+    logger.info("  GET  /webhook/task/<task_id> - 获取任务状态")
+    logger.info("  GET  /webhook/results - 获取最近的任务结果")
     logger.info("  POST /webhook/test - 测试接口")
     
     app.run(